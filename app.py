@@ -1,18 +1,75 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import HTTPBasicCredentials
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
 from util.config import Env
-import secrets
+from util.auth import security, verify_credentials
+from contextlib import asynccontextmanager
+import asyncio
+import threading
+import time
 
 # 引入 Routers
-from routers import dashboard, crawler
+from routers import dashboard, crawler, insights
+from db.indexes import ensure_indexes, verify_query_plans
+from db.mongo import connect, close, connect_async, close_async, get_async_db
+from services.scheduler import crawl_scheduler
+from services.parse_pipeline import shutdown_process_pool
+from services.event_stream import event_hub
+from services.dedupe import title_index
+from services.search import search_index
+from services.retention import retention_scheduler
+from services.kpi_rollups import get_rollup_scheduler
+from services.metrics import render_metrics, observe_request, request_profiler
 
-# 初始化 HTTPBasic 認證
-security = HTTPBasic()
+# 背景初始化進度，/ready 會一併回傳
+startup_state = {"mongo": "pending", "indexes": "pending", "dedupe": "pending", "search": "pending"}
+
+def prepare_database():
+    """
+    建立同步 Mongo client -> 建立索引並用 explain() 檢查熱門查詢 -> 標題去重索引 warm load
+    (爬蟲開始前會再確認已載入) -> 全文檢索文件表 (第一次查詢時也會補載)；任一步失敗只記錄狀態，不影響 API 服務
+    """
+    steps = (("mongo", connect), ("indexes", lambda: (ensure_indexes(), verify_query_plans())),
+             ("dedupe", title_index.load), ("search", search_index.load))
+    for name, step in steps:
+        try:
+            step()
+            startup_state[name] = "ok"
+        except Exception as e:
+            startup_state[name] = f"error: {e}"
+            print(f"❌ [Startup] {name} 初始化失敗: {e}")
+            if name == "mongo":
+                return   # 連不上就不必再試後面的步驟 (索引 / warm load 由第一次使用時再處理)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 背景 daemon thread 執行，Atlas 連線較慢時不拖住啟動、/health 與關閉
+    threading.Thread(target=prepare_database, name="prepare-database", daemon=True).start()
+    # API handler 共用的非同步 Mongo client (建構時不連線，第一次查詢才會連)
+    connect_async()
+    # SSE 即時推播 (change stream 或爬蟲端 publish)
+    event_hub.start()
+    if Env.CRAWL_SCHEDULER_ENABLED:
+        crawl_scheduler.start()
+    if Env.RETENTION_ENABLED:
+        retention_scheduler.start()
+    if Env.KPI_ROLLUP_SCHEDULER_ENABLED:
+        get_rollup_scheduler().start()
+    yield
+    await crawl_scheduler.stop()
+    await retention_scheduler.stop()
+    if Env.KPI_ROLLUP_SCHEDULER_ENABLED:
+        await get_rollup_scheduler().stop()
+    await event_hub.stop()
+    await close_async()
+    close()
+    shutdown_process_pool()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="MediPoint API",
     description="[MediPoint] - ERP 智慧商情系統 API",
     docs_url=None,
@@ -20,22 +77,6 @@ app = FastAPI(
     openapi_url=None
 )
 
-# 從環境變數讀取 /docs 帳密
-DOCS_USERNAME = Env.DOCS_USERNAME
-DOCS_PASSWORD = Env.DOCS_PASSWORD
-
-# 驗證函數
-def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
-    correct_username = secrets.compare_digest(credentials.username, DOCS_USERNAME)
-    correct_password = secrets.compare_digest(credentials.password, DOCS_PASSWORD)
-    if not (correct_username and correct_password):
-        raise HTTPException(
-            status_code=401,
-            detail="無效的憑證",
-            headers={"WWW-Authenticate": "Basic"},
-        )
-    return credentials
-
 # 受保護的 OpenAPI schema
 @app.get("/openapi.json", include_in_schema=False)
 async def get_open_api_endpoint(credentials: HTTPBasicCredentials = Depends(verify_credentials)):
@@ -51,6 +92,33 @@ async def get_swagger_documentation(credentials: HTTPBasicCredentials = Depends(
 async def get_redoc_documentation(credentials: HTTPBasicCredentials = Depends(verify_credentials)):
     return get_redoc_html(openapi_url="/openapi.json", title="MediPoint API")
 
+# 受保護的 Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(credentials: HTTPBasicCredentials = Depends(verify_credentials)):
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# 請求耗時 (依路由樣板統計) + 選用的 pyinstrument profiler
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    if Env.PROFILING_ENABLED and request.headers.get("x-profile") == "1":
+        # 必須通過 /docs 帳密驗證，否則照常處理請求
+        try:
+            verify_credentials(await security(request))
+        except HTTPException:
+            pass
+        else:
+            with request_profiler() as report:
+                await call_next(request)
+            return HTMLResponse(report["html"], headers={"X-Profile-Seconds": f"{report['seconds']:.3f}"})
+
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    observe_request(request.method, route.path if route else "unmatched", response.status_code,
+                    time.perf_counter() - started)
+    return response
+
 # CORS 設定
 origins = [
     "http://localhost:5173",
@@ -74,12 +142,23 @@ def root():
 
 @app.get("/health")
 def health_check():
-    """健康檢查"""
+    """健康檢查 (liveness)：不碰資料庫，Atlas 還連不上時也會回 ok"""
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """就緒檢查 (readiness)：Mongo ping 成功才回 200，否則 503"""
+    try:
+        await asyncio.wait_for(get_async_db().command("ping"), timeout=Env.READY_TIMEOUT)
+    except Exception as e:
+        response.status_code = 503
+        return {"status": "unavailable", "ping": f"error: {e or type(e).__name__}", "startup": startup_state}
+    return {"status": "ready", "ping": "ok", "startup": startup_state}
+
 # 註冊路由
 app.include_router(dashboard.router)
 app.include_router(crawler.router)
+app.include_router(insights.router)
 
 if __name__ == '__main__':
     import uvicorn
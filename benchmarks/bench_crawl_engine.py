@@ -0,0 +1,81 @@
+"""
+爬蟲引擎 benchmark：逐一抓取 (舊做法) vs. 非同步並行抓取 (CrawlEngine)
+
+對本機 stub server 抓取假的 PTT / CDC / RSS 頁面 (不寫入 DB)，
+印出不同看板數量下的 wall-clock 時間。
+
+    python benchmarks/bench_crawl_engine.py --latency 0.05 --pages 2
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "benchmarks"))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from stub_server import StubServer
+from services.crawl_engine import CrawlEngine
+
+
+def make_engine(ptt, cdc, news, rate):
+    # stub server 在本機，禮貌限制放寬到只剩「每個 host 的上限」
+    policies = {
+        ptt.host: {"concurrency": 8, "rate": rate, "burst": 8},
+        cdc.host: {"concurrency": 1, "rate": rate, "burst": 1},
+        news.host: {"concurrency": 2, "rate": rate, "burst": 2},
+    }
+    return CrawlEngine(ptt_base_url=ptt.url, cdc_base_url=cdc.url,
+                       news_rss_url=news.url + "/rss/search", policies=policies, persist=False)
+
+
+async def run_serial(engine, boards, pages):
+    await engine.crawl_cdc()
+    await engine.crawl_dcard()
+    await engine.crawl_google_news()
+    for board in boards:
+        await engine.crawl_ptt(board, pages)
+
+
+async def run_concurrent(engine, boards, pages):
+    await engine.run(boards, pages)
+
+
+async def timed(runner, servers, boards, pages, rate):
+    async with make_engine(*servers, rate) as engine:
+        start = time.perf_counter()
+        await runner(engine, boards, pages)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server 每個 response 的延遲 (秒)")
+    parser.add_argument("--pages", type=int, default=2, help="每個看板抓幾頁")
+    parser.add_argument("--rate", type=float, default=100.0, help="每個 host 每秒請求上限")
+    parser.add_argument("--boards", default="1,2,4,8,16", help="看板數量列表")
+    args = parser.parse_args()
+
+    with StubServer(args.latency) as ptt, StubServer(args.latency) as cdc, StubServer(args.latency) as news:
+        servers = (ptt, cdc, news)
+        print(f"{'boards':>6} | {'serial (s)':>10} | {'engine (s)':>10} | {'speedup':>7}")
+        print("-" * 44)
+        for n in [int(x) for x in args.boards.split(",")]:
+            boards = [f"Board{i}" for i in range(n)]
+            # 關掉引擎內的 print，避免輸出干擾計時
+            sys.stdout = open(os.devnull, "w")
+            try:
+                serial = asyncio.run(timed(run_serial, servers, boards, args.pages, args.rate))
+                concurrent = asyncio.run(timed(run_concurrent, servers, boards, args.pages, args.rate))
+            finally:
+                sys.stdout.close()
+                sys.stdout = sys.__stdout__
+            print(f"{n:>6} | {serial:>10.3f} | {concurrent:>10.3f} | {serial / concurrent:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
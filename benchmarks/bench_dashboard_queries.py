@@ -0,0 +1,125 @@
+"""
+Dashboard 查詢 benchmark：舊版逐一查詢 vs. 合併查詢 (services/dashboard_queries.py)
+
+需要本機 mongod (預設 mongodb://localhost:27017)，資料寫在獨立的 medipoint_bench DB。
+用 pymongo CommandListener 計算每份週報實際送出的 DB 指令數 (= 往返次數)。
+
+    python benchmarks/bench_dashboard_queries.py --sources 3,6,12
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from pymongo import MongoClient, monitoring
+
+from services.dashboard_queries import fetch_store_snapshot, fetch_feed
+from services.kpi_rollups import refresh_rollups
+
+STORE_ID = "S001"
+DATE = "2025-10-30"
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in ("hello", "isMaster", "ping", "endSessions"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(database, sources, articles_per_source=200):
+    for name in ("daily_category_summary", "kpi_rollups", "inventory", "alerts", "raw_articles"):
+        database[name].drop()
+    database.daily_category_summary.insert_many([
+        {"date": DATE, "store_id": STORE_ID, "category": f"C{i}", "revenue": 1000 + i, "gross_profit": 100 + i}
+        for i in range(20)
+    ])
+    database.inventory.insert_many([
+        {"date": DATE, "store_id": STORE_ID, "sku_id": f"SKU{i:05d}", "closing_on_hand": random.randint(0, 200)}
+        for i in range(2000)
+    ])
+    now = datetime.now()
+    database.alerts.insert_many([
+        {"agency": "CDC", "type": "疫情速訊", "title": f"警示 {i}", "risk_level": "High", "crawled_at": now - timedelta(minutes=i)}
+        for i in range(50)
+    ])
+    database.raw_articles.insert_many([
+        {"source": s, "board": "b", "title": f"{s} 文章 {i}", "content": "內文" * 200, "url": f"https://x/{s}/{i}",
+         "crawled_at": now - timedelta(minutes=i)}
+        for s in sources for i in range(articles_per_source)
+    ])
+    database.raw_articles.create_index([("source", 1), ("crawled_at", -1)])
+    database.alerts.create_index([("crawled_at", -1)])
+    database.inventory.create_index([("date", 1), ("store_id", 1), ("closing_on_hand", 1)])
+    database.daily_category_summary.create_index([("date", 1), ("store_id", 1)])
+    refresh_rollups(database=database)
+
+
+def legacy_queries(database, sources):
+    """舊版 get_weekly_dashboard_data 的查詢方式"""
+    list(database.daily_category_summary.aggregate([
+        {"$match": {"date": DATE, "store_id": STORE_ID}},
+        {"$group": {"_id": None, "total_revenue": {"$sum": "$revenue"}, "total_gp": {"$sum": "$gross_profit"}}},
+    ]))
+    list(database.alerts.find().sort("crawled_at", -1).limit(5))
+    list(database.inventory.find({"date": DATE, "store_id": STORE_ID, "closing_on_hand": {"$lt": 30}}).limit(2))
+    list(database.inventory.find({"date": DATE, "store_id": STORE_ID, "closing_on_hand": {"$gt": 100}}).limit(1))
+    for source in sources:
+        list(database.raw_articles.find({"source": source}).sort("crawled_at", -1).limit(5))
+
+
+def combined_queries(database, sources):
+    fetch_store_snapshot(STORE_ID, DATE, database=database)
+    fetch_feed(sources, database=database)
+
+
+def measure(func, database, counter, sources, rounds):
+    func(database, sources)  # warm up
+    counter.count = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(database, sources)
+    elapsed = (time.perf_counter() - start) / rounds
+    return counter.count / rounds, elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--sources", default="3,6,12")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(args.uri, event_listeners=[counter])
+    database = client["medipoint_bench"]
+
+    print(f"{'sources':>7} | {'legacy cmds':>11} | {'legacy ms':>9} | {'combined cmds':>13} | {'combined ms':>11}")
+    print("-" * 64)
+    for n in [int(x) for x in args.sources.split(",")]:
+        sources = ["PTT", "Dcard", "GoogleNews"] + [f"Source{i}" for i in range(max(0, n - 3))]
+        seed(database, sources)
+        legacy_cmds, legacy_ms = measure(legacy_queries, database, counter, sources, args.rounds)
+        combined_cmds, combined_ms = measure(combined_queries, database, counter, sources, args.rounds)
+        print(f"{n:>7} | {legacy_cmds:>11.0f} | {legacy_ms:>9.2f} | {combined_cmds:>13.0f} | {combined_ms:>11.2f}")
+
+    client.drop_database("medipoint_bench")
+
+
+if __name__ == "__main__":
+    main()
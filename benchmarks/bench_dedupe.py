@@ -0,0 +1,97 @@
+"""
+標題去重 benchmark：LSH bucket 查詢 vs. 逐一比對全部群組 (services/dedupe.py)
+
+先放入 N 個不同話題的假標題，再用各話題的「變體」標題 (加 [問卦]、Re:、「 - 媒體名」、
+增減幾個字) 查詢，比較：
+  - 每次查詢的時間 (LSH 只比對同 bucket 的候選；線性掃描和每個群組都算一次相似度)
+  - 每次查詢實際比對的候選數
+  - 變體被歸回原話題的比例 (recall) 與誤併到其他話題的比例
+
+    python benchmarks/bench_dedupe.py --clusters 1000,10000,50000
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from services.dedupe import TitleIndex, band_keys, minhash, normalize_title, shingles, similarity
+
+CHARS = "流感疫苗發燒咳嗽喉嚨痛藥局缺貨退燒兒童寶寶過敏腸胃病毒確診診所醫院健保口罩快篩維他命益生菌疹癢"
+CONNECTORS = "的了嗎又在也都是被要"
+PREFIXES = ["[問卦] ", "Re: [問卦] ", "[新聞] ", "【爆料】", ""]
+SUFFIXES = [" - 聯合新聞網", " - 自由時報", " | ETtoday", "", "？"]
+
+
+def make_topic(rng):
+    return "".join(rng.choice(CHARS + CONNECTORS) for _ in range(rng.randint(10, 22)))
+
+
+def make_variant(rng, topic):
+    chars = list(topic)
+    # 小幅改寫：插入或刪掉 1 個字
+    if rng.random() < 0.5:
+        chars.insert(rng.randrange(len(chars)), rng.choice(CONNECTORS))
+    else:
+        del chars[rng.randrange(len(chars))]
+    return rng.choice(PREFIXES) + "".join(chars) + rng.choice(SUFFIXES)
+
+
+def build_index(topics):
+    index = TitleIndex(persist=False)
+    index.loaded = True
+    articles = [{"title": t, "source": "PTT"} for t in topics]
+    index.assign(articles)
+    return index, [a["cluster_id"] for a in articles]
+
+
+def linear_find(index, signature):
+    best, best_score = None, index.threshold
+    for cluster in index._clusters.values():
+        score = similarity(signature, cluster.signature)
+        if score >= best_score:
+            best, best_score = cluster, score
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clusters", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'clusters':>8} | {'lsh µs/q':>8} | {'linear µs/q':>11} | {'candidates':>10} | {'recall':>6} | {'wrong':>5}")
+    print("-" * 66)
+    for n in [int(x) for x in args.clusters.split(",")]:
+        rng = random.Random(n)
+        topics = [make_topic(rng) for _ in range(n)]
+        index, cluster_ids = build_index(topics)
+        picks = [rng.randrange(n) for _ in range(args.queries)]
+        signatures = [minhash(shingles(normalize_title(make_variant(rng, topics[i])))) for i in picks]
+
+        start = time.perf_counter()
+        found = [index._find(sig) for sig in signatures]
+        lsh_us = (time.perf_counter() - start) * 1e6 / len(signatures)
+
+        linear_queries = signatures[:max(1, min(len(signatures), 200_000 // n))]
+        start = time.perf_counter()
+        for sig in linear_queries:
+            linear_find(index, sig)
+        linear_us = (time.perf_counter() - start) * 1e6 / len(linear_queries)
+
+        candidates = sum(
+            len(set().union(*(index._buckets.get(k, ()) for k in band_keys(sig)))) for sig in signatures
+        ) / len(signatures)
+        hits = sum(1 for i, c in zip(picks, found) if c is not None and c.id == cluster_ids[i])
+        wrong = sum(1 for i, c in zip(picks, found) if c is not None and c.id != cluster_ids[i])
+        print(f"{n:>8} | {lsh_us:>8.0f} | {linear_us:>11.0f} | {candidates:>10.1f} | "
+              f"{hits / len(picks):>6.1%} | {wrong:>5}")
+
+
+if __name__ == "__main__":
+    main()
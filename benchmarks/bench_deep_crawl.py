@@ -0,0 +1,69 @@
+"""
+PTT 深度爬取 benchmark：列表 + 每篇文章內文，比較不同的單篇大小上限
+stub server 裡文章 ID 尾數為 0 的是推文 3000 則的超長討論串 (~500KB)。
+
+對每個上限回報：抓了幾篇、總 bytes、被截斷幾篇、平均每篇耗時、尖峰記憶體
+
+    python benchmarks/bench_deep_crawl.py --boards 4 --caps 32768,262144,0
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "benchmarks"))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from stub_server import StubServer
+from services.crawl_engine import CrawlEngine
+
+
+async def crawl(server, boards, cap, concurrency):
+    policies = {server.host: {"concurrency": 16, "rate": 1000.0, "burst": 16}}
+    async with CrawlEngine(ptt_base_url=server.url, policies=policies, persist=False, incremental=False,
+                           deep=True, article_concurrency=concurrency, max_body_bytes=cap or 1 << 40) as engine:
+        start = time.perf_counter()
+        results = await engine.run(boards, 1, sources=("ptt",))
+        results["seconds"] = time.perf_counter() - start
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boards", type=int, default=4)
+    parser.add_argument("--caps", default="32768,262144,0", help="單篇 bytes 上限，0 = 不限制")
+    parser.add_argument("--concurrency", type=int, default=2, help="每個看板同時抓幾篇")
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    boards = [f"Board{i}" for i in range(args.boards)]
+
+    print(f"{'cap':>10} | {'articles':>8} | {'bytes':>10} | {'truncated':>9} | {'avg ms':>7} | {'peak MB':>7} | {'sec':>6}")
+    print("-" * 76)
+    with StubServer(args.latency) as server:
+        # 暖機 (lazy import、連線建立) 不列入
+        sys.stdout = open(os.devnull, "w")
+        asyncio.run(crawl(server, boards[:1], 0, args.concurrency))
+        sys.stdout.close()
+        sys.stdout = sys.__stdout__
+        for cap in (int(c) for c in args.caps.split(",")):
+            sys.stdout = open(os.devnull, "w")
+            tracemalloc.start()
+            try:
+                r = asyncio.run(crawl(server, boards, cap, args.concurrency))
+            finally:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                sys.stdout.close()
+                sys.stdout = sys.__stdout__
+            a = r["articles"]
+            print(f"{cap or '∞':>10} | {a['fetched']:>8} | {a['bytes']:>10} | {a['truncated']:>9} | "
+                  f"{a['avg_ms']:>7} | {peak / 1e6:>7.1f} | {r['seconds']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
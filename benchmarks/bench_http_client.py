@@ -0,0 +1,115 @@
+"""
+爬蟲 HTTP client benchmark (services/http_client.py)
+
+對本機 stub server (會記錄建立過幾條 TCP 連線) 比較：
+  - 舊作法：每個請求各自 get (沒有共用 Session，每次都重新連線)
+  - HttpClient：同步、共用連線池
+  - AsyncHttpClient：並行請求，連線數受連線池上限約束
+  - CrawlEngine 整輪爬取實際開了幾條連線
+並驗證：503 會退避重試後成功、gzip 壓縮傳輸量、各階段計時 (connect / tls / wait / transfer)。
+
+    python benchmarks/bench_http_client.py --requests 200 --latency 0.005
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+
+import httpx
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "benchmarks"))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from stub_server import StubServer
+from services.crawl_engine import CrawlEngine
+from services.http_client import AsyncHttpClient, HttpClient, RetryPolicy
+
+
+def page_urls(server, n):
+    return [f"{server.url}/bbs/Health/index{i % 5 + 1}.html" for i in range(n)]
+
+
+def bench_legacy(server, n):
+    start = time.perf_counter()
+    for url in page_urls(server, n):
+        httpx.get(url)      # 等同舊的 requests.get：每次新建連線
+    return time.perf_counter() - start
+
+
+def bench_sync(server, n):
+    with HttpClient() as client:
+        start = time.perf_counter()
+        for url in page_urls(server, n):
+            client.get(url)
+        return time.perf_counter() - start, client.stats.snapshot()
+
+
+async def bench_async(server, n, concurrency):
+    client = AsyncHttpClient(max_connections=concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(client.get(url) for url in page_urls(server, n)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return elapsed, client.stats.snapshot()
+
+
+async def bench_engine(server):
+    policies = {server.host: {"concurrency": 8, "rate": 1000, "burst": 8}}
+    async with CrawlEngine(ptt_base_url=server.url, cdc_base_url=server.url,
+                           news_rss_url=server.url + "/rss/search", policies=policies,
+                           persist=False, incremental=False) as engine:
+        results = await engine.run(ptt_pages=3)
+    return results["http"]["transport"]
+
+
+def run(label, server, func):
+    before_conn, before_req = server.connections, server.requests
+    result = func()
+    print(f"{label:<28} | {server.requests - before_req:>8} | {server.connections - before_conn:>11}", end="")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        print(f"{'client':<28} | {'requests':>8} | {'connections':>11} | {'seconds':>7}")
+        print("-" * 64)
+        elapsed = run("get() per request (legacy)", server, lambda: bench_legacy(server, args.requests))
+        print(f" | {elapsed:>7.2f}")
+        elapsed, sync_stats = run("HttpClient", server, lambda: bench_sync(server, args.requests))
+        print(f" | {elapsed:>7.2f}")
+        elapsed, _ = run(f"AsyncHttpClient (x{args.concurrency})", server,
+                         lambda: asyncio.run(bench_async(server, args.requests, args.concurrency)))
+        print(f" | {elapsed:>7.2f}")
+        transport = run("CrawlEngine.run()", server, lambda: asyncio.run(bench_engine(server)))
+        print(f" |   (client 統計連線 {transport['connections']})")
+        print(f"\nHttpClient 各階段累計 ms: {sync_stats['ms']}")
+
+        # 重試：接下來 2 個請求回 503 (Retry-After: 0)
+        server.fail_next = 2
+        with HttpClient(retry=RetryPolicy(max_retries=3, backoff=0.01)) as client:
+            resp = client.get(page_urls(server, 1)[0])
+            stats = client.stats.snapshot()
+        assert resp.status_code == 200 and stats["retries"] == 2, stats
+        print(f"503 x2 -> 重試 {stats['retries']} 次後 {resp.status_code}，狀態碼統計 {stats['status']} ✓")
+
+    with StubServer(latency=0, compress=True) as server:
+        with HttpClient() as client:
+            for url in page_urls(server, 20):
+                client.get(url)
+            stats = client.stats.snapshot()
+        print(f"gzip：傳輸 {stats['wire_bytes']:,} bytes / 解壓後 {stats['bytes']:,} bytes "
+              f"({stats['wire_bytes'] / stats['bytes']:.0%})；Accept-Encoding: {client.client.headers['Accept-Encoding']}")
+
+
+if __name__ == "__main__":
+    main()
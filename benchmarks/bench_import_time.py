@@ -0,0 +1,79 @@
+"""
+App 啟動 import 時間檢查 (python -X importtime)
+
+在子行程執行 `python -X importtime -c "import app"`，解析每個模組的累計 import 時間：
+  - 列出最慢的頂層模組
+  - 總時間超過 --budget-ms 時以非 0 結束 (可放進 CI 當回歸檢查)
+  - 重量級 SDK (Gemini、HTML parser、爬蟲引擎) 不應在 import 時載入，否則同樣視為失敗
+  - import 完成後不應已建立同步 MongoClient (mongodb+srv 會在建構時查 DNS)
+
+    python benchmarks/bench_import_time.py --budget-ms 1500 --repeat 3
+"""
+import argparse
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+# 這些模組只在第一次使用時才 import
+LAZY_MODULES = ("google.generativeai", "bs4", "lxml", "feedparser", "services.crawl_engine", "services.crawlers",
+                "pyinstrument")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+CHECK = "import app, sys, db.mongo as m; print('CLIENT', m.client is not None)"
+
+
+def measure():
+    env = {**os.environ, "PYTHONPATH": str(BASE_DIR)}
+    env.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHECK], cwd=BASE_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            modules[name] = (int(cumulative), len(indent) // 2)
+    return modules, "CLIENT True" in proc.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 1500)))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # 取最快的一次 (第一次可能還沒有 .pyc / 檔案快取)
+    runs = [measure() for _ in range(args.repeat)]
+    modules, client_created = min(runs, key=lambda run: run[0].get("app", (0,))[0])
+    total_ms = modules["app"][0] / 1000
+
+    print(f"{'module':<44} | {'cumulative ms':>13}")
+    print("-" * 60)
+    top_level = sorted(((us, name) for name, (us, depth) in modules.items() if depth <= 1), reverse=True)
+    for us, name in top_level[:args.top]:
+        print(f"{name:<44} | {us / 1000:>13.1f}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import app 花了 {total_ms:.0f} ms，超過預算 {args.budget_ms:.0f} ms")
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    if loaded:
+        failures.append(f"import 時不應載入：{', '.join(loaded)}")
+    if client_created:
+        failures.append("import 時就建立了同步 MongoClient")
+
+    print(f"\nimport app：{total_ms:.0f} ms (預算 {args.budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ 在預算內，延遲載入的模組都沒有在 import 時載入")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+增量爬取 benchmark：對支援條件式請求的本機 stub server 連續爬三次
+  1. 冷啟動 (沒有 crawl_state)
+  2. 內容完全沒變 (應該全部 304)
+  3. 每個看板多一頁新文章 (只抓新的那頁、只寫入新文章)
+
+    python benchmarks/bench_incremental_crawl.py --boards 8 --pages 3
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "benchmarks"))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from stub_server import StubServer
+from services.crawl_engine import CrawlEngine
+from services.crawl_state import CrawlStateStore
+
+
+async def crawl(server, state, boards, pages, incremental):
+    policies = {server.host: {"concurrency": 16, "rate": 1000.0, "burst": 16}}
+    async with CrawlEngine(ptt_base_url=server.url, cdc_base_url=server.url,
+                           news_rss_url=server.url + "/rss/search", policies=policies,
+                           persist=False, incremental=incremental, state=state) as engine:
+        start = time.perf_counter()
+        results = await engine.run(boards, pages)
+        results["seconds"] = time.perf_counter() - start
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boards", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    boards = [f"Board{i}" for i in range(args.boards)]
+
+    print(f"{'mode':<12} {'run':<10} | {'requests':>8} | {'304':>4} | {'bytes':>8} | {'new ptt':>7} | {'sec':>6}")
+    print("-" * 66)
+    for incremental in (False, True):
+        state = CrawlStateStore(persist=False)
+        with StubServer(args.latency, pages=5) as server:
+            for label in ("cold", "unchanged", "new page"):
+                if label == "new page":
+                    server.pages += 1
+                sys.stdout = open(os.devnull, "w")
+                try:
+                    r = asyncio.run(crawl(server, state, boards, args.pages, incremental))
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = sys.__stdout__
+                http = r["http"]
+                mode = "incremental" if incremental else "full"
+                print(f"{mode:<12} {label:<10} | {http['requests']:>8} | {http['not_modified']:>4} | "
+                      f"{http['bytes']:>8} | {r['ptt']:>7} | {r['seconds']:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+索引 benchmark：在本機 mongod 灌入 1M 筆 raw_articles，
+比較建立索引前後 Dashboard 熱門查詢的耗時，並跑 explain() 自我檢查。
+
+    python benchmarks/bench_indexes.py --articles 1000000
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from pymongo import MongoClient
+
+from db.indexes import ensure_indexes, verify_query_plans
+from services.dashboard_queries import fetch_feed
+
+SOURCES = ["PTT", "Dcard", "GoogleNews"]
+
+
+def seed(database, total, batch=10000):
+    database.raw_articles.drop()
+    database.alerts.drop()
+    now = datetime.now()
+    for start in range(0, total, batch):
+        database.raw_articles.insert_many([
+            {"source": random.choice(SOURCES), "board": "Health", "title": f"文章標題 {i}",
+             "content": "內文" * 50, "url": f"https://www.ptt.cc/bbs/Health/M.{i}.A.html",
+             "crawled_at": now - timedelta(seconds=i)}
+            for i in range(start, min(start + batch, total))
+        ], ordered=False)
+    database.alerts.insert_many([
+        {"agency": "CDC", "title": f"警示 {i}", "risk_level": "High", "crawled_at": now - timedelta(minutes=i)}
+        for i in range(1000)
+    ])
+
+
+def time_queries(database, total, rounds):
+    timings = {}
+
+    def timed(name, func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        timings[name] = (time.perf_counter() - start) / rounds * 1000
+
+    timed("fetch_feed", lambda: fetch_feed(SOURCES, database=database))
+    timed("upsert lookup (url)", lambda: database.raw_articles.find_one(
+        {"url": f"https://www.ptt.cc/bbs/Health/M.{random.randrange(total)}.A.html"}))
+    timed("upsert lookup (title)", lambda: database.raw_articles.find_one({"title": f"文章標題 {random.randrange(total)}"}))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--articles", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    database = client["medipoint_bench"]
+
+    print(f"🚀 灌入 {args.articles:,} 筆 raw_articles...")
+    seed(database, args.articles)
+
+    before = time_queries(database, args.articles, args.rounds)
+    ensure_indexes(database)
+    after = time_queries(database, args.articles, args.rounds)
+
+    print(f"{'query':<24} | {'no index (ms)':>13} | {'indexed (ms)':>12}")
+    print("-" * 56)
+    for name in before:
+        print(f"{name:<24} | {before[name]:>13.2f} | {after[name]:>12.2f}")
+
+    verify_query_plans(database)
+    client.drop_database("medipoint_bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+輿情分頁 benchmark (GET /api/dashboard/insights)
+
+1. 序列化：一頁 --items 筆 (預設 1k) 的 InsightsPage，比較
+     - jsonable_encoder + json.dumps (週報快照 / SSE 目前的做法)
+     - pydantic 驗證 + model_dump_json (route 改用 response_model 並回傳 dict 時 FastAPI 做的事；目前 InsightsPage 只用於文件)
+     - orjson (util/responses.json_response)
+   以及 gzip / br 壓縮後的大小與耗時 (util/responses 的壓縮等級)
+2. 指定 --uri 時 (本機 mongod，資料寫在 medipoint_bench DB)：灌入 --articles 篇文章後，
+   比較 keyset 分頁 (fetch_insights_page) 與 skip 分頁在第 1 / 第 N 頁的延遲
+
+    python benchmarks/bench_insights_serialization.py
+    python benchmarks/bench_insights_serialization.py --uri mongodb://localhost:27017 --articles 1000000
+"""
+import argparse
+import json
+import os
+import pathlib
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TLS", "false")
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from routers.dashboard import InsightsPage
+from services.dashboard_queries import (
+    CONTENT_PREVIEW_LENGTH, INSIGHTS_PROJECTION, INSIGHTS_SORT, _shape_insights_page, fetch_insights_page,
+)
+from util.responses import ENCODERS
+
+WORDS = ["流感", "感冒", "普拿疼", "缺貨", "疫苗", "發燒", "咳嗽", "喉嚨痛", "退燒藥", "益生菌", "維他命", "口罩",
+         "快篩", "過敏", "藥局", "診所", "推薦", "請問", "副作用", "漲價"]
+SOURCES = ["PTT", "Dcard", "GoogleNews"]
+BOARDS = {"PTT": ["BabyMother", "Health"], "Dcard": ["parenting", "health"], "GoogleNews": ["News"]}
+
+
+def make_articles(total, rng, content_chars=400):
+    now = datetime.now().replace(microsecond=0)
+    docs = []
+    for i in range(total):
+        source = rng.choice(SOURCES)
+        docs.append({
+            "_id": ObjectId(), "source": source, "board": rng.choice(BOARDS[source]),
+            "title": "".join(rng.choices(WORDS, k=rng.randint(3, 7))),
+            "content": "".join(rng.choices(WORDS, k=content_chars // 2))[:content_chars],
+            "url": f"https://example.com/{source}/{i}",
+            # 每 2 篇同一秒，確認 (crawled_at, _id) 相同時間點的分頁
+            "crawled_at": now - timedelta(seconds=i // 2),
+            "cluster_id": ObjectId(), "keywords": rng.sample(WORDS, rng.randint(1, 3)), "status": "new",
+        })
+    return docs
+
+
+def timed(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_serialization(items, rounds):
+    rng = random.Random(0)
+    docs = make_articles(items, rng)
+    for doc in docs:
+        doc["content"] = doc["content"][:CONTENT_PREVIEW_LENGTH]   # DB 端投影後的樣子
+    docs.append(docs[-1])   # 多取的一筆 (有下一頁)
+    page = _shape_insights_page(docs, items)
+
+    encoders = {
+        "jsonable_encoder + json": lambda: json.dumps(jsonable_encoder(page), ensure_ascii=False).encode("utf-8"),
+        "pydantic dump_json": lambda: InsightsPage.model_validate(page).model_dump_json().encode(),
+        "orjson": lambda: orjson.dumps(page),
+    }
+    print(f"\n🧾 序列化一頁 {items:,} 筆 (median of {rounds})")
+    print(f"{'encoder':<24} | {'ms':>7} | {'bytes':>9}")
+    print("-" * 46)
+    body = b""
+    for name, encode in encoders.items():
+        body = encode()
+        print(f"{name:<24} | {timed(encode, rounds):>7.2f} | {len(body):>9,}")
+    print(f"{'shape (doc -> dict)':<24} | {timed(lambda: _shape_insights_page(docs, items), rounds):>7.2f} |")
+
+    body = orjson.dumps(page)
+    print(f"\n🗜️ 壓縮 orjson 輸出 ({len(body):,} bytes)")
+    print(f"{'encoding':<24} | {'ms':>7} | {'bytes':>9} | {'ratio':>5}")
+    print("-" * 54)
+    for name, compress in ENCODERS.items():
+        size = len(compress(body))
+        print(f"{name:<24} | {timed(lambda: compress(body), rounds):>7.2f} | {size:>9,} | {len(body) / size:>5.1f}")
+
+
+def bench_pagination(uri, total, limit, pages, rounds):
+    from pymongo import MongoClient
+    from db.indexes import INDEXES
+
+    database = MongoClient(uri)["medipoint_bench"]
+    database.raw_articles.drop()
+    database.raw_articles.create_indexes(INDEXES["raw_articles"])
+    rng = random.Random(1)
+    print(f"\n🚀 灌入 {total:,} 篇 raw_articles...")
+    for start in range(0, total, 20000):
+        database.raw_articles.insert_many(make_articles(min(20000, total - start), rng), ordered=False)
+
+    # 先走到第 N 頁，記下那一頁的 cursor
+    cursors = {1: None}
+    cursor = None
+    for number in range(2, pages + 1):
+        cursor = fetch_insights_page(cursor=cursor, limit=limit, database=database)["next_cursor"]
+        cursors[number] = cursor
+
+    def skip_page(number):
+        found = (database.raw_articles.find({}, INSIGHTS_PROJECTION).sort(INSIGHTS_SORT)
+                 .skip((number - 1) * limit).limit(limit + 1))
+        return _shape_insights_page(list(found), limit)
+
+    print(f"\n📄 每頁 {limit} 筆 (median of {rounds})")
+    print(f"{'page':>6} | {'keyset ms':>9} | {'skip ms':>8}")
+    print("-" * 30)
+    for number in (1, pages):
+        keyset = timed(lambda: fetch_insights_page(cursor=cursors[number], limit=limit, database=database), rounds)
+        skip = timed(lambda: skip_page(number), rounds)
+        print(f"{number:>6} | {keyset:>9.2f} | {skip:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--uri", default=None, help="指定時另外量測 keyset / skip 分頁 (medipoint_bench DB)")
+    parser.add_argument("--articles", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    bench_serialization(args.items, args.rounds)
+    if args.uri:
+        bench_pagination(args.uri, args.articles, args.limit, args.pages, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+關鍵字比對 microbenchmark：舊版逐一 `in` 掃描 vs. KeywordMatcher (單一編譯 regex)
+
+產生 100k 筆假標題，比較：
+  - 篩選 (is_health_related)
+  - 找出全部命中關鍵字 (舊版需 [kw for kw in HEALTH_KEYWORDS if kw in text])
+
+    python benchmarks/bench_keyword_matcher.py --titles 100000
+"""
+import argparse
+import pathlib
+import random
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from services.keywords import HEALTH_KEYWORDS, keyword_matcher
+
+FILLER = "今天天氣真好大家晚餐吃什麼有沒有八卦問卦請益心得分享新聞閒聊討論公司同事老闆捷運"
+
+
+def legacy_is_health_related(text):
+    if not text:
+        return False
+    return any(keyword in text for keyword in HEALTH_KEYWORDS)
+
+
+def legacy_find_all(text):
+    return sorted(kw for kw in HEALTH_KEYWORDS if kw in text)
+
+
+def make_titles(n, hit_ratio=0.3, seed=42):
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(8, 24))]
+        if rng.random() < hit_ratio:
+            for _ in range(rng.randint(1, 3)):
+                words.insert(rng.randrange(len(words)), rng.choice(HEALTH_KEYWORDS))
+        titles.append("[" + rng.choice(["問卦", "請益", "新聞"]) + "] " + "".join(words))
+    return titles
+
+
+def timed(func, titles):
+    start = time.perf_counter()
+    result = [func(t) for t in titles]
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=100_000)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles)
+
+    legacy_filter_s, legacy_filter = timed(legacy_is_health_related, titles)
+    new_filter_s, new_filter = timed(keyword_matcher.is_health_related, titles)
+    legacy_all_s, legacy_all = timed(legacy_find_all, titles)
+    new_all_s, new_all = timed(lambda t: keyword_matcher.match(t).keywords, titles)
+
+    assert legacy_filter == new_filter, "篩選結果不一致"
+    assert legacy_all == new_all, "命中關鍵字不一致"
+
+    print(f"{args.titles:,} 筆標題，命中 {sum(new_filter):,} 筆")
+    print(f"{'task':<12} | {'legacy (s)':>10} | {'matcher (s)':>11} | {'speedup':>7}")
+    print("-" * 50)
+    print(f"{'filter':<12} | {legacy_filter_s:>10.3f} | {new_filter_s:>11.3f} | {legacy_filter_s / new_filter_s:>6.1f}x")
+    print(f"{'find all':<12} | {legacy_all_s:>10.3f} | {new_all_s:>11.3f} | {legacy_all_s / new_all_s:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+KPI 彙總 benchmark：即時加總一週 daily_category_summary vs. 讀取 kpi_rollups 的週彙總
+
+需要本機 mongod (預設 mongodb://localhost:27017)，資料寫在獨立的 medipoint_bench DB。
+每個規模 (門市數 x 天數，每天 20 個分類) 回報：
+  - live ms：每次請求都重新加總該週 (舊作法，延伸到一週)
+  - rollup ms：讀一份 weekly 文件 (應該不隨資料量變化)
+  - rebuild s：全量重建 kpi_rollups
+  - refresh ms：新進一天一間門市的資料後，增量更新 ($merge)
+
+    python benchmarks/bench_kpi_rollups.py --sizes 10x30,100x90,500x180
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from pymongo import MongoClient
+
+from db.indexes import INDEXES
+from services.kpi_rollups import (
+    ROLLUP_COLLECTION, refresh_rollups, weekly_rollup_id, KPI_PROJECTION, fetch_live_kpi,
+)
+
+CATEGORIES = [f"C{i:02d}" for i in range(20)]
+LAST_DAY = date(2025, 10, 30)
+
+
+def seed(database, stores, days, batch=50000):
+    database.daily_category_summary.drop()
+    database[ROLLUP_COLLECTION].drop()
+    for name in ("daily_category_summary", ROLLUP_COLLECTION):
+        database[name].create_indexes(INDEXES[name])
+    rows = []
+    for d in range(days):
+        day = (LAST_DAY - timedelta(days=d)).isoformat()
+        for s in range(stores):
+            for c in CATEGORIES:
+                revenue = random.randint(100, 5000)
+                rows.append({"date": day, "store_id": f"S{s:04d}", "category": c,
+                             "revenue": revenue, "gross_profit": int(revenue * random.uniform(0.05, 0.4))})
+                if len(rows) >= batch:
+                    database.daily_category_summary.insert_many(rows)
+                    rows = []
+    if rows:
+        database.daily_category_summary.insert_many(rows)
+
+
+def timed_ms(func, rounds):
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--sizes", default="10x30,100x90,500x180", help="門市數x天數，逗號分隔")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    database = client["medipoint_bench"]
+    store_id, day = "S0000", LAST_DAY.isoformat()
+
+    print(f"{'stores x days':>13} | {'rows':>9} | {'live ms':>8} | {'rollup ms':>9} | {'rebuild s':>9} | {'refresh ms':>10}")
+    print("-" * 74)
+    for size in args.sizes.split(","):
+        stores, days = (int(x) for x in size.split("x"))
+        seed(database, stores, days)
+
+        start = time.perf_counter()
+        refresh_rollups(database=database)
+        rebuild_s = time.perf_counter() - start
+
+        live_ms = timed_ms(lambda: fetch_live_kpi(store_id, day, database), args.rounds)
+        rollup_ms = timed_ms(lambda: database[ROLLUP_COLLECTION].find_one(
+            {"_id": weekly_rollup_id(store_id, day)}, KPI_PROJECTION), args.rounds)
+        # 增量：同一間門市同一天補一筆資料
+        database.daily_category_summary.insert_one(
+            {"date": day, "store_id": store_id, "category": "C00", "revenue": 100, "gross_profit": 10})
+        refresh_ms = timed_ms(lambda: refresh_rollups([store_id], [day], database), 5)
+
+        rows = stores * days * len(CATEGORIES)
+        print(f"{size:>13} | {rows:>9} | {live_ms:>8.2f} | {rollup_ms:>9.2f} | {rebuild_s:>9.2f} | {refresh_ms:>10.2f}")
+
+    client.drop_database("medipoint_bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+解析階段 benchmark：每秒可解析幾頁 PTT 列表 / RSS，隨 process pool worker 數的變化
+
+  - 先比較單執行緒下 bs4 與 lxml (XPath) 兩種 PTT 解析器，並確認輸出相同
+  - 再把 N 頁交給 ParseStage，workers = 0 (thread), 1, 2, 4 ... 比較 pages/sec
+
+fixtures：預設依真實 PTT 列表結構 (r-ent / nrec / meta / 置底文) 產生，
+也可用 --fixtures 指定存好的頁面目錄 (*.html 當 PTT 列表、*.xml 當 RSS)。
+
+    python benchmarks/bench_parse_pipeline.py --pages 400 --workers 0,1,2,4
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from stub_server import PTT_TITLES
+from services.crawlers import PTT_PARSERS, parse_ptt_index, parse_ptt_index_lxml, parse_google_news
+from services.parse_pipeline import ParseStage, shutdown_process_pool
+
+
+def ptt_fixture(board, page, rows=20):
+    """接近真實 PTT 列表頁的 HTML (約 15KB)"""
+    ents = "".join(
+        f'<div class="r-ent"><div class="nrec"><span class="hl f3">{i}</span></div>'
+        f'<div class="title"><a href="/bbs/{board}/M.{1700000000 + page * 100 + i}.A.{i:03X}.html">'
+        f'{PTT_TITLES[(page + i) % len(PTT_TITLES)]}</a></div>'
+        f'<div class="meta"><div class="author">user{i}</div>'
+        f'<div class="article-menu"><div class="trigger">&#x22ef;</div><div class="dropdown">'
+        f'<div class="item"><a href="/bbs/{board}/search?q=thread">搜尋同標題文章</a></div></div></div>'
+        f'<div class="date">10/30</div><div class="mark"></div></div></div>'
+        for i in range(rows)
+    )
+    pinned = '<div class="r-list-sep"></div><div class="r-ent"><div class="title"><a href="/bbs/x/M.1.A.html">[公告] 板規</a></div></div>'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>看板</title>'
+        + '<link rel="stylesheet" href="//images.ptt.cc/bbs/v2.27/bbs-common.css">' * 5
+        + '</head><body><div id="topbar-container"><div id="topbar" class="bbs-content">批踢踢實業坊</div></div>'
+        f'<div id="action-bar-container"><div class="action-bar"><div class="btn-group btn-group-paging">'
+        f'<a class="btn wide" href="/bbs/{board}/index1.html">最舊</a>'
+        f'<a class="btn wide" href="/bbs/{board}/index{page - 1}.html">‹ 上頁</a>'
+        f'<a class="btn wide disabled">下頁 ›</a><a class="btn wide" href="/bbs/{board}/index.html">最新</a></div></div></div>'
+        f'<div id="main-container"><div class="r-list-container action-bar-margin bbs-screen">{ents}{pinned}</div></div>'
+        '<script>' + 'var x = 1;' * 200 + '</script></body></html>'
+    ).encode()
+
+
+def rss_fixture(items=30):
+    body = "".join(
+        f"<item><title>{PTT_TITLES[i % len(PTT_TITLES)]} - 新聞</title><link>https://news.example.com/{i}</link>"
+        f"<pubDate>Thu, 30 Oct 2025 08:{i % 60:02d}:00 GMT</pubDate><description>{'內文' * 80}</description></item>"
+        for i in range(items)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss><channel>{body}</channel></rss>'.encode()
+
+
+def load_fixtures(directory, pages, ptt_parser=parse_ptt_index):
+    if directory:
+        path = pathlib.Path(directory)
+        ptt = [p.read_bytes() for p in sorted(path.glob("*.html"))]
+        rss = [p.read_bytes() for p in sorted(path.glob("*.xml"))]
+    else:
+        ptt = [ptt_fixture("Gossiping", p) for p in range(2, 52)]
+        rss = [rss_fixture()]
+    # 重複使用 fixtures 湊滿 pages 頁，PTT : RSS 約 9 : 1
+    jobs = []
+    for i in range(pages):
+        if rss and i % 10 == 9:
+            jobs.append((parse_google_news, rss[i % len(rss)]))
+        else:
+            jobs.append((ptt_parser, ptt[i % len(ptt)], "Gossiping"))
+    return ptt, jobs
+
+
+def strip_time(result):
+    articles, prev_url = result
+    return [{k: v for k, v in a.items() if k != "crawled_at"} for a in articles], prev_url
+
+
+def bench_parsers(ptt, rounds=3):
+    print("PTT 列表解析器 (單執行緒)")
+    for page in ptt:
+        assert strip_time(parse_ptt_index(page, "Gossiping")) == strip_time(parse_ptt_index_lxml(page, "Gossiping"))
+    for name, func in [("bs4", parse_ptt_index), ("lxml", parse_ptt_index_lxml)]:
+        best = float("inf")
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for page in ptt:
+                func(page, "Gossiping")
+            best = min(best, time.perf_counter() - started)
+        print(f"  {name:<5} {len(ptt) / best:8.0f} pages/s")
+    print("  輸出一致 ✓")
+
+
+async def run_stage(jobs, workers, max_pending):
+    stage = ParseStage(workers, max_pending)
+    started = time.perf_counter()
+    await asyncio.gather(*(stage.run(func, *args) for func, *args in jobs))
+    return time.perf_counter() - started
+
+
+def bench_stage(jobs, worker_counts, max_pending):
+    print(f"\nParseStage：{len(jobs)} 頁 (CPU 核心數 {os.cpu_count()})")
+    for workers in worker_counts:
+        if workers > 0:
+            # 先暖機，不把子 process 啟動與 import 的時間算進去
+            asyncio.run(run_stage(jobs[:workers * 2], workers, max_pending))
+        seconds = asyncio.run(run_stage(jobs, workers, max_pending))
+        label = "thread" if workers == 0 else f"{workers} proc"
+        print(f"  {label:<7} {len(jobs) / seconds:8.0f} pages/s  ({seconds:.2f}s)")
+        shutdown_process_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", default="0,1,2,4")
+    parser.add_argument("--max-pending", type=int, default=16)
+    parser.add_argument("--ptt-parser", choices=["bs4", "lxml"], default="bs4", help="ParseStage 使用的 PTT 解析器")
+    parser.add_argument("--fixtures", help="存好的 PTT (*.html) / RSS (*.xml) 頁面目錄")
+    args = parser.parse_args()
+
+    ptt, jobs = load_fixtures(args.fixtures, args.pages, PTT_PARSERS[args.ptt_parser])
+    bench_parsers(ptt)
+    bench_stage(jobs, [int(w) for w in args.workers.split(",")], args.max_pending)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+保存分層 benchmark (services/retention.py)：10M 筆 raw_articles 的最新 N 筆查詢與儲存大小
+
+需要本機 mongod (預設 mongodb://localhost:27017)，資料寫在獨立的 medipoint_bench DB。
+  1. 灌入 --articles 筆、平均分散在 --days 天的文章 (模擬一直沒有清理的 raw_articles)
+  2. 量測：各來源最新 5 筆 (fetch_feed) 與單一來源 find().sort().limit() 的延遲，
+          以及 raw_articles 的資料 / 索引大小
+  3. 執行封存 (等同 db/migrate_retention.py)，並直接刪掉 expires_at 已過的文件
+     (TTL monitor 做的事，這裡不等它每 60 秒一輪)
+  4. 再量一次：熱層只剩 HOT_RETENTION_DAYS 天；歷史層 (time-series) 與彙總層的大小一併列出
+
+    python benchmarks/bench_retention.py --articles 10000000 --days 365
+"""
+import argparse
+import os
+import pathlib
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TLS", "false")
+
+from pymongo import MongoClient
+
+from db.indexes import INDEXES
+from services.dashboard_queries import fetch_feed
+from services.retention import (
+    HISTORY_COLLECTION, HOT_COLLECTIONS, STATE_COLLECTION, SUMMARY_COLLECTION, ensure_history_collection,
+    run_retention,
+)
+from util.config import env
+
+SOURCES = ["PTT", "Dcard", "GoogleNews"]
+BOARDS = {"PTT": ["BabyMother", "Health"], "Dcard": ["parenting", "health"], "GoogleNews": ["News"]}
+KEYWORDS = ["流感", "感冒", "發燒", "咳嗽", "喉嚨痛", "過敏", "益生菌", "維他命", "口罩", "快篩"]
+CATEGORIES = ["感冒用藥", "保健食品", "防疫用品", "皮膚用藥"]
+
+
+def seed(database, total, days, batch=20000):
+    for name in (*HOT_COLLECTIONS, HISTORY_COLLECTION, SUMMARY_COLLECTION, STATE_COLLECTION):
+        database[name].drop()
+    for name in HOT_COLLECTIONS:
+        database[name].create_indexes(INDEXES[name])
+
+    rng = random.Random(0)
+    now = datetime.now()
+    step = days * 86400 / total
+    started = time.perf_counter()
+    for start in range(0, total, batch):
+        docs = []
+        for i in range(start, min(start + batch, total)):
+            source = rng.choice(SOURCES)
+            docs.append({
+                "source": source, "board": rng.choice(BOARDS[source]),
+                "title": f"文章標題 {i} {rng.choice(KEYWORDS)}", "content": "內文" * 40,
+                "url": f"https://example.com/{source}/{i}",
+                "keywords": rng.sample(KEYWORDS, rng.randint(1, 3)), "categories": rng.sample(CATEGORIES, 1),
+                "crawled_at": now - timedelta(seconds=i * step), "status": "new",
+            })
+        database.raw_articles.insert_many(docs, ordered=False)
+        if start // batch % 50 == 0:
+            print(f"   {start + len(docs):,} / {total:,} ({time.perf_counter() - started:.0f}s)", flush=True)
+    database.alerts.insert_many([
+        {"agency": "CDC", "type": "疫情速訊", "title": f"警示 {i}", "url": f"https://example.com/cdc/{i}",
+         "risk_level": rng.choice(["High", "Medium"]), "crawled_at": now - timedelta(hours=i)}
+        for i in range(days * 24)
+    ])
+
+
+def latest_n(database, rounds):
+    def timed(func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        return (time.perf_counter() - start) / rounds * 1000
+
+    return {
+        "fetch_feed (3 來源 x 5)": timed(lambda: fetch_feed(SOURCES, database=database)),
+        "find PTT 最新 5 筆": timed(lambda: list(database.raw_articles.find({"source": "PTT"})
+                                                .sort("crawled_at", -1).limit(5))),
+    }
+
+
+def sizes(database):
+    result = {}
+    for name in (*HOT_COLLECTIONS, HISTORY_COLLECTION, SUMMARY_COLLECTION):
+        if name not in database.list_collection_names():
+            continue
+        stats = database.command("collStats", name)
+        result[name] = {"count": stats.get("count", 0), "storage_mb": stats.get("storageSize", 0) / 2**20,
+                        "index_mb": stats.get("totalIndexSize", 0) / 2**20}
+    return result
+
+
+def print_sizes(label, stats):
+    print(f"\n{label}")
+    print(f"{'collection':<22} | {'documents':>12} | {'storage MB':>10} | {'index MB':>8}")
+    print("-" * 62)
+    for name, s in stats.items():
+        print(f"{name:<22} | {s['count']:>12,} | {s['storage_mb']:>10.1f} | {s['index_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--articles", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--hot-days", type=int, default=env.HOT_RETENTION_DAYS)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    env.HOT_RETENTION_DAYS = args.hot_days
+
+    database = MongoClient(args.uri)["medipoint_bench"]
+    print(f"🚀 灌入 {args.articles:,} 筆 raw_articles ({args.days} 天)...")
+    seed(database, args.articles, args.days)
+
+    before = latest_n(database, args.rounds)
+    before_sizes = sizes(database)
+
+    start = time.perf_counter()
+    ensure_history_collection(database)
+    for name in HOT_COLLECTIONS:
+        database[name].create_indexes(INDEXES[name])
+    database[SUMMARY_COLLECTION].create_indexes(INDEXES[SUMMARY_COLLECTION])
+    results = run_retention(database)
+    rolled = time.perf_counter() - start
+    # TTL monitor 會做的事：刪掉 expires_at 已過的文件
+    start = time.perf_counter()
+    deleted = {name: database[name].delete_many({"expires_at": {"$lte": datetime.now()}}).deleted_count
+               for name in HOT_COLLECTIONS}
+    expired = time.perf_counter() - start
+    database.command("compact", "raw_articles")   # 釋放刪除後的空間，storageSize 才看得出差異
+
+    after = latest_n(database, args.rounds)
+    after_sizes = sizes(database)
+
+    print(f"\n封存 {results['raw_articles']['days']} 天：{rolled:.1f}s；刪除過期 {deleted}：{expired:.1f}s")
+    print(f"\n{'latest-N query':<24} | {'unbounded ms':>12} | {'tiered ms':>9}")
+    print("-" * 52)
+    for name in before:
+        print(f"{name:<24} | {before[name]:>12.2f} | {after[name]:>9.2f}")
+    print_sizes(f"儲存大小：封存前 (單一集合，{args.days} 天)", before_sizes)
+    print_sizes(f"儲存大小：封存後 (熱層 {args.hot_days} 天 + 歷史層 + 彙總層)", after_sizes)
+
+
+if __name__ == "__main__":
+    main()
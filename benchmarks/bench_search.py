@@ -0,0 +1,119 @@
+"""
+全文檢索 benchmark (services/search.py)
+
+灌入 N 篇假文章 (健康詞彙依 Zipf 分布組成標題與內文) 後比較：
+  - 建索引的速度 (斷詞 + 寫入 postings，每 10k 篇 flush 一次，模擬多輪爬取)
+  - 各查詢的延遲 p50 / p95 (BM25 前 20 筆、加上來源 + 日期篩選、第 2 頁 keyset 分頁)
+  - 逐篇做子字串比對 (等同對 raw_articles 下 $regex 的全表掃描) 的延遲
+預設在記憶體建索引 (SearchIndex(persist=False))；--uri 指定本機 mongod 時改用 Mongo 版 postings。
+
+    python benchmarks/bench_search.py --articles 100000,1000000
+    python benchmarks/bench_search.py --articles 1000000 --uri mongodb://localhost:27017
+"""
+import argparse
+import os
+import pathlib
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from bson import ObjectId
+
+from services.search import DOCS_COLLECTION, POSTINGS_COLLECTION, STATE_COLLECTION, SearchIndex
+
+WORDS = ["流感", "感冒", "普拿疼", "缺貨", "疫苗", "發燒", "咳嗽", "喉嚨痛", "退燒藥", "益生菌", "維他命", "口罩",
+         "快篩", "過敏", "皮膚癢", "腸胃炎", "藥局", "診所", "健保", "寶寶", "小孩", "推薦", "請問", "有效",
+         "副作用", "普篩", "鼻塞", "頭痛", "止痛藥", "胃藥", "葉黃素", "魚油", "鈣片", "保健食品", "中藥", "漲價"]
+FILLER = "的了嗎又在也都是被要我你他有沒"
+SOURCES = ["PTT", "Dcard", "GoogleNews"]
+QUERIES = ["普拿疼 缺貨", "流感 疫苗", "喉嚨痛", "益生菌 推薦", "葉黃素 魚油 漲價"]
+
+
+def make_text(rng, weights, words):
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choices(WORDS, weights)[0])
+        parts.append(rng.choice(FILLER))
+    return "".join(parts)
+
+
+def build(index, total, rng, batch=10000):
+    weights = [1 / (i + 1) for i in range(len(WORDS))]      # Zipf
+    now = datetime.now()
+    titles = []
+    started = time.perf_counter()
+    for start in range(0, total, batch):
+        docs = []
+        for i in range(start, min(start + batch, total)):
+            title = make_text(rng, weights, rng.randint(3, 6))
+            docs.append({"_id": ObjectId(), "title": title, "content": make_text(rng, weights, rng.randint(6, 15)),
+                         "source": rng.choice(SOURCES), "crawled_at": now - timedelta(seconds=i * 2)})
+            titles.append(title + docs[-1]["content"])
+        index.index_inserted(docs)
+        index.flush()
+    return time.perf_counter() - started, titles
+
+
+def timed(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def scan(texts, query):
+    words = query.split()
+    return sum(1 for text in texts if all(w in text for w in words))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", default="100000,1000000")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--uri", default=None, help="指定時使用 Mongo 版 postings (medipoint_bench DB)")
+    args = parser.parse_args()
+
+    for total in [int(x) for x in args.articles.split(",")]:
+        rng = random.Random(total)
+        if args.uri:
+            from pymongo import MongoClient
+            from db.indexes import INDEXES
+            database = MongoClient(args.uri)["medipoint_bench"]
+            for name in (POSTINGS_COLLECTION, DOCS_COLLECTION, STATE_COLLECTION):
+                database[name].drop()
+                database[name].create_indexes(INDEXES.get(name, []))
+            index = SearchIndex(database)
+            index.loaded = True
+        else:
+            index = SearchIndex(persist=False)
+        seconds, texts = build(index, total, rng)
+        print(f"\n📚 {total:,} 篇：建索引 {seconds:.1f}s ({total / seconds:,.0f} 篇/s)")
+        print(f"{'query':<18} | {'matches':>8} | {'top20 p50':>9} | {'p95':>6} | {'filtered':>8} | "
+              f"{'page 2':>6} | {'scan ms':>8}")
+        print("-" * 82)
+        since = datetime.now() - timedelta(seconds=total)   # 約最近一半的文章
+        for query in QUERIES:
+            first = index.search(query)
+            p50, p95 = timed(lambda: index.search(query), args.rounds)
+            filtered, _ = timed(lambda: index.search(query, sources=["PTT"], since=since), args.rounds)
+            cursor = first["next_cursor"]
+            page2, _ = timed(lambda: index.search(query, cursor=cursor), args.rounds) if cursor else (0.0, 0)
+            sample = texts[:max(1, len(texts) // 10)]
+            start = time.perf_counter()
+            scan(sample, query)
+            scan_ms = (time.perf_counter() - start) * 1000 * len(texts) / len(sample)
+            print(f"{query:<18} | {first['total']:>8,} | {p50:>9.1f} | {p95:>6.1f} | {filtered:>8.1f} | "
+                  f"{page2:>6.1f} | {scan_ms:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
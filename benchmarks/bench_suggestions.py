@@ -0,0 +1,115 @@
+"""
+建議引擎 benchmark：逐筆 Python 迴圈 vs. NumPy 向量化評分 (services/suggestions.py)
+
+產生 N 個假 SKU (庫存、7 日銷量、售價、成本、分類)，比較：
+  - 舊作法：每個 SKU 一個 dict，逐筆計算後 heapq 取前 k 名
+  - 欄位式資料 (與 sku_window_stages 的回傳相同) 轉成陣列 (SkuArrays) 的時間
+  - 全部評分 + 取前 k 名的時間
+並確認兩種做法選出的補貨 / 促銷 SKU 相同。
+
+    python benchmarks/bench_suggestions.py --skus 1000,10000,50000
+"""
+import argparse
+import heapq
+import math
+import os
+import pathlib
+import random
+import sys
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+
+from services.dashboard_queries import SKU_COLUMNS
+from services.suggestions import (
+    SKU_CATEGORY_TERMS, SkuArrays, SkuScores, top_k, suggest, sku_category,
+    RESTOCK_COVER_DAYS, PROMO_COVER_DAYS, LOW_STOCK_THRESHOLD, HIGH_STOCK_THRESHOLD, DEFAULT_MARGIN,
+)
+
+WINDOW_DAYS = 7
+LIFT = {"感冒": 1.6, "婦嬰": 1.3, "保健": 1.1}
+
+
+def make_skus(n, seed=42):
+    rng = random.Random(seed)
+    categories = list(SKU_CATEGORY_TERMS)
+    skus = []
+    for i in range(n):
+        price = rng.choice([None, rng.uniform(50, 800)])
+        skus.append({
+            "sku_id": f"SKU{i:06d}",
+            "category": rng.choice(categories),
+            "on_hand": rng.randint(0, 300),
+            "sold": rng.choice([0, rng.randint(1, 200)]),
+            "unit_price": price,
+            "unit_cost": price * rng.uniform(0.5, 0.9) if price else None,
+        })
+    return skus
+
+
+def to_columns(skus):
+    return {
+        column: [(s[column] or 0) if column in ("unit_price", "unit_cost") else s.get(column, "") for s in skus]
+        for column in SKU_COLUMNS
+    }
+
+
+def legacy_suggest(skus, lift, restock_k=5, promotion_k=3):
+    """同樣的公式，逐筆計算後用 heapq 取前 k 名"""
+    restock, promotion = [], []
+    for i, s in enumerate(skus):
+        on_hand, sold = s["on_hand"] or 0, s["sold"] or 0
+        lf = lift.get(sku_category(s["sku_id"], s["category"]), 1.0)
+        demand = sold / WINDOW_DAYS * lf
+        cover = on_hand / demand if demand > 0 else math.inf
+        price, cost = s["unit_price"], s["unit_cost"]
+        margin = (price - cost) / price if price and cost else DEFAULT_MARGIN
+        if demand > 0 and cover < RESTOCK_COVER_DAYS:
+            restock.append(((1 - cover / RESTOCK_COVER_DAYS) * demand * (0.5 + margin), -i))
+        elif demand == 0 and on_hand < LOW_STOCK_THRESHOLD:
+            restock.append(((1 - on_hand / LOW_STOCK_THRESHOLD) * lf * 1e-6, -i))
+        excess = on_hand - demand * PROMO_COVER_DAYS
+        if excess > 0 and on_hand > HIGH_STOCK_THRESHOLD:
+            promotion.append((excess * (cost or 1.0) * lf, -i))
+    return ([-i for _, i in heapq.nlargest(restock_k, restock)],
+            [-i for _, i in heapq.nlargest(promotion_k, promotion)])
+
+
+def best_of(func, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", default="1000,10000,50000")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'skus':>7} | {'legacy ms':>9} | {'to arrays ms':>12} | {'score+topk ms':>13} | {'suggest() ms':>12}")
+    print("-" * 66)
+    for n in [int(x) for x in args.skus.split(",")]:
+        skus = make_skus(n)
+        columns = to_columns(skus)
+        legacy_ms, (legacy_restock, legacy_promo) = best_of(lambda: legacy_suggest(skus, LIFT), args.rounds)
+        arrays_ms, arrays = best_of(lambda: SkuArrays(columns, LIFT), args.rounds)
+
+        def score():
+            scores = SkuScores(arrays, WINDOW_DAYS)
+            return list(top_k(scores.restock, 5)), list(top_k(scores.promotion, 3))
+
+        score_ms, (restock, promo) = best_of(score, args.rounds)
+        total_ms, _ = best_of(lambda: suggest(columns, LIFT), args.rounds)
+        assert (restock, promo) == (legacy_restock, legacy_promo), "向量化結果與逐筆計算不同"
+        print(f"{n:>7} | {legacy_ms:>9.2f} | {arrays_ms:>12.2f} | {score_ms:>13.2f} | {total_ms:>12.2f}")
+    print("選出的 SKU 與逐筆計算一致 ✓")
+
+
+if __name__ == "__main__":
+    main()
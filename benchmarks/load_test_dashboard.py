@@ -0,0 +1,125 @@
+"""
+Dashboard 壓力測試：同步 handler (threadpool) vs. 非同步 handler (AsyncMongoClient)
+
+需要本機 mongod；Gemini 以固定延遲的假 model 取代 (每次都重新生成，不走快取)。
+兩個版本都繞過週報快照快取，直接量測組報表的成本。
+
+    MongoDB_URL=mongodb://localhost:27017 python benchmarks/load_test_dashboard.py --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import pathlib
+import statistics
+import sys
+import threading
+import time
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TLS", "false")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+import services.dashboard as dashboard
+from services.talking_points import TalkingPointService
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    latency = 0.2
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.latency)
+        return FakeResponse("流感季建議提前備貨退燒藥。")
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_report():
+        return dashboard.get_weekly_dashboard_data()
+
+    @app.get("/async")
+    async def async_report():
+        return await dashboard.get_weekly_dashboard_data_async()
+
+    return app
+
+
+def start_server(port):
+    config = uvicorn.Config(build_app(), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+async def hammer(url, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(url)
+                    resp.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except Exception:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else float("nan")
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": p(0.50),
+        "p99": p(0.99),
+        "mean": statistics.mean(latencies) * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="假 Gemini 的回應延遲 (秒)")
+    args = parser.parse_args()
+
+    FakeModel.latency = args.llm_latency
+    # ttl=0：每次都打一次假 model，模擬沒有快取時的最壞情況
+    dashboard.talking_points = TalkingPointService(model_factory=FakeModel, persist=False, ttl=0, timeout=5)
+
+    server, thread = start_server(args.port)
+    try:
+        print(f"{'handler':>8} | {'req/s':>8} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'errors':>6}")
+        print("-" * 54)
+        for name in ("sync", "async"):
+            r = asyncio.run(hammer(f"http://127.0.0.1:{args.port}/{name}", args.concurrency, args.duration))
+            print(f"{name:>8} | {r['rps']:>8.1f} | {r['p50']:>9.1f} | {r['p99']:>9.1f} | {r['errors']:>6}")
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+本機 stub HTTP server，提供假的 PTT / CDC / Google News 頁面給 benchmark 使用。
+每個 response 會故意延遲 latency 秒，模擬真實網路往返。
+
+回應帶 ETag / Last-Modified，並支援 If-None-Match / If-Modified-Since (回 304)。
+把 server.pages 加 1 就等於 PTT 各看板都多了一頁新文章。
+
+server.connections 記錄建立過的 TCP 連線數 (驗證連線重用)；
+compress=True 時依 Accept-Encoding 回傳 gzip；
+server.fail_next = n 讓接下來 n 個請求回 503 (驗證重試)。
+"""
+import gzip
+import hashlib
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PTT_TITLES = [
+    "[問卦] 最近流感是不是很嚴重", "[心情] 寶寶發燒整晚沒睡", "[閒聊] 今天天氣真好",
+    "[請益] 普拿疼跟斯斯差在哪", "[新聞] 藥局退燒藥缺貨", "[討論] 益生菌有用嗎",
+    "[問題] 喉嚨痛要看哪科", "[閒聊] 晚餐吃什麼", "[請益] 過敏鼻炎推薦噴劑",
+    "[心得] 健檢報告出爐", "[問卦] 有沒有颱風假的八卦", "[分享] 葉黃素挑選心得",
+]
+
+
+def ptt_index_html(board, page, pages=5):
+    rows = "".join(
+        f'<div class="r-ent"><div class="title"><a href="/bbs/{board}/M.{page}{i:03d}.A.html">{title}</a></div>'
+        f'<div class="date">10/30</div></div>'
+        for i, title in enumerate(PTT_TITLES)
+    )
+    prev_link = f'<a href="/bbs/{board}/index{page - 1}.html">‹ 上頁</a>' if page > 1 else '<a class="disabled">‹ 上頁</a>'
+    return (
+        f'<html><body><div class="btn-group-paging"><a href="/bbs/{board}/index1.html">最舊</a>{prev_link}</div>'
+        f'{rows}</body></html>'
+    )
+
+
+def ptt_article_html(board, name, pushes=20):
+    """PTT 文章頁；文章 ID 尾數為 0 的是推文上千則的超長討論串"""
+    if name.split(".")[1].endswith("0"):
+        pushes = 3000
+    push_rows = "".join(
+        f'<div class="push"><span class="hl push-tag">{"推噓→"[i % 3]} </span><span class="f3 hl push-userid">user{i}</span>'
+        f'<span class="f3 push-content">: 我也是這樣{i}</span><span class="push-ipdatetime"> 10/30 12:00</span></div>'
+        for i in range(pushes)
+    )
+    return (
+        f'<html><body><div id="main-content" class="bbs-screen bbs-content">'
+        f'<div class="article-metaline"><span class="article-meta-tag">作者</span><span class="article-meta-value">someone</span></div>'
+        f'<div class="article-metaline-right"><span class="article-meta-tag">看板</span><span class="article-meta-value">{board}</span></div>'
+        f'寶寶這兩天發燒，吃了退燒藥還是沒退，請問要去醫院掛急診嗎？\n' + "補充說明。" * 50 +
+        f'\n--\n<span class="f2">※ 發信站: 批踢踢實業坊(ptt.cc)</span>\n{push_rows}</div></body></html>'
+    )
+
+
+def cdc_list_html():
+    links = "".join(
+        f'<a href="/Bulletin/Detail/{i}" title="{title}">{title}</a>'
+        for i, title in enumerate(["流感進入流行高峰", "腸病毒疫情上升", "登革熱境外移入", "新冠疫苗接種開放", "國際旅遊疫情"])
+    )
+    return f'<html><body><div class="content-boxes-v3">{links}</div></body></html>'
+
+
+def news_rss_xml():
+    items = "".join(
+        f"<item><title>{title}</title><link>https://news.example.com/{i}</link><pubDate>Thu, 30 Oct 2025 08:00:00 GMT</pubDate></item>"
+        for i, title in enumerate(["流感疫苗開打", "兒童退燒藥缺藥", "腸病毒重症", "股市大漲", "腸胃炎就醫人次增加"])
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss><channel>{items}</channel></rss>'
+
+
+def route(path, pages=5):
+    """依路徑回傳 (content_type, body_bytes)，找不到回傳 None"""
+    path = path.split("?", 1)[0]
+    if path.startswith("/bbs/"):
+        _, _, board, name = path.split("/", 3)
+        if name.startswith("M."):
+            return "text/html; charset=utf-8", ptt_article_html(board, name).encode()
+        page = pages if name == "index.html" else int(name[len("index"):-len(".html")] or pages)
+        return "text/html; charset=utf-8", ptt_index_html(board, page, pages).encode()
+    if path.startswith("/Bulletin/List/"):
+        return "text/html; charset=utf-8", cdc_list_html().encode()
+    if path.startswith("/rss/search"):
+        return "application/rss+xml; charset=utf-8", news_rss_xml().encode()
+    return None
+
+
+class StubServer:
+    """在背景 thread 啟動一個 ThreadingHTTPServer；可用 with 語法"""
+
+    def __init__(self, latency=0.05, pages=5, compress=False):
+        self.latency = latency
+        self.pages = pages
+        self.compress = compress
+        self.requests = 0
+        self.connections = 0
+        self.fail_next = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.last_modified = "Thu, 30 Oct 2025 08:00:00 GMT"
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # header 與 body 分兩次寫出，不關 Nagle 會卡在 delayed ACK (每個 keep-alive 請求 +40ms)
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                with server._lock:
+                    fail = server.fail_next > 0
+                    if fail:
+                        server.fail_next -= 1
+                        server.failed += 1
+                if fail:
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                result = route(self.path, server.pages)
+                if result is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                content_type, body = result
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", server.last_modified)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 128
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def host(self):
+        return f"127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def url(self):
+        return f"http://{self.host}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
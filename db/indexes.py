@@ -0,0 +1,159 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from db.mongo import db
+from services.search import retention_seconds as search_retention_seconds
+
+# ==========================================
+# 索引註冊表
+#   所有熱門查詢會用到的索引都集中宣告在這裡，App 啟動時建立 (create_index 本身是冪等的)。
+# ==========================================
+INDEXES = {
+    "daily_category_summary": [
+        IndexModel([("date", ASCENDING), ("store_id", ASCENDING)], name="date_store"),
+    ],
+    "inventory": [
+        IndexModel([("date", ASCENDING), ("store_id", ASCENDING), ("closing_on_hand", ASCENDING)],
+                   name="date_store_on_hand"),
+    ],
+    "raw_articles": [
+        # 各來源最新 N 篇 + 輿情分頁的 keyset (_id 是同一時間點的次序)
+        IndexModel([("source", ASCENDING), ("crawled_at", DESCENDING), ("_id", DESCENDING)],
+                   name="source_crawled_at_id"),
+        # PTT / News 以 url upsert
+        IndexModel([("url", ASCENDING)], name="url_unique", unique=True),
+        # Dcard 以 title upsert (不同來源可能同標題，因此不設 unique)
+        IndexModel([("title", ASCENDING)], name="title"),
+        # 保存分層：逐日封存掃描 + 封存後的 TTL (沒有 expires_at 的文件不會過期)；不分來源的輿情分頁
+        IndexModel([("crawled_at", ASCENDING), ("_id", ASCENDING)], name="crawled_at_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "alerts": [
+        IndexModel([("crawled_at", DESCENDING)], name="crawled_at"),
+        IndexModel([("title", ASCENDING)], name="title_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "crawl_daily_summary": [
+        # 長期趨勢：某集合某 kind 的多個 term 在一段日期區間的彙總
+        IndexModel([("collection", ASCENDING), ("kind", ASCENDING), ("term", ASCENDING), ("day", ASCENDING)],
+                   name="collection_kind_term_day"),
+    ],
+    "kpi_rollups": [
+        # 由 daily 文件重算 weekly 時用 (weekly 文件本身以 _id 讀取)
+        IndexModel([("period", ASCENDING), ("week", ASCENDING), ("store_id", ASCENDING)], name="period_week_store"),
+    ],
+    "title_clusters": [
+        # 啟動時 warm load 最近 7 天的標題群組
+        IndexModel([("last_seen", DESCENDING)], name="last_seen"),
+    ],
+    "topic_heat": [
+        # 趨勢查詢：kind + term $in + 日期區間
+        IndexModel([("kind", ASCENDING), ("term", ASCENDING), ("day", ASCENDING)], name="kind_term_day"),
+    ],
+    "search_postings": [
+        # 查詢讀 term $in 的 bucket _id / n (涵蓋查詢)；寫入追加到該 term 還沒滿的 bucket
+        IndexModel([("term", ASCENDING), ("n", ASCENDING), ("_id", ASCENDING)], name="term_n_id"),
+        # 最後一次追加超過保留期的 bucket，裡面的文件都已過期
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=search_retention_seconds()),
+    ],
+    "search_docs": [
+        IndexModel([("t", ASCENDING)], name="crawled_at_ttl", expireAfterSeconds=search_retention_seconds()),
+    ],
+    "talking_point_cache": [
+        # TTL index：過期的話術快取由 Mongo 自動刪除
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# ==========================================
+# 熱門查詢清單 (給 explain() 自我檢查用)
+#   (名稱, collection, filter, sort)
+# ==========================================
+HOT_QUERIES = [
+    ("kpi_summary", "daily_category_summary", {"date": "2025-10-30", "store_id": "S001"}, None),
+    ("sku_window", "inventory", {"date": {"$in": ["2025-10-30", "2025-10-29"]}, "store_id": {"$in": ["S001"]}}, None),
+    ("weekly_rollup_source", "kpi_rollups", {"period": "daily", "week": {"$in": ["2025-W44"]}, "store_id": {"$in": ["S001"]}}, None),
+    ("latest_articles", "raw_articles", {"source": "PTT"}, [("crawled_at", DESCENDING)]),
+    ("topic_heat_trend", "topic_heat", {"kind": "keyword", "term": {"$in": ["流感", "感冒"]}, "day": {"$gte": "2025-10-17", "$lte": "2025-10-30"}}, None),
+    ("title_clusters_warm_load", "title_clusters", {"last_seen": {"$gte": "2025-10-23"}}, None),
+    ("article_upsert_url", "raw_articles", {"url": "https://www.ptt.cc/bbs/Health/M.0.A.html"}, None),
+    ("article_upsert_title", "raw_articles", {"title": "範例標題"}, None),
+    ("latest_alerts", "alerts", {}, [("crawled_at", DESCENDING)]),
+    ("alert_upsert_title", "alerts", {"title": "範例標題"}, None),
+    ("search_postings", "search_postings", {"term": {"$in": ["缺貨", "普拿"]}}, None),
+    ("insights_page", "raw_articles", {"crawled_at": {"$lte": datetime(2025, 10, 30)}, "$or": [{"crawled_at": {"$lt": datetime(2025, 10, 30)}}, {"_id": {"$lt": ObjectId("6900000000000000000000ff")}}]}, [("crawled_at", DESCENDING), ("_id", DESCENDING)]),
+    ("insights_page_source", "raw_articles", {"source": {"$in": ["PTT", "Dcard"]}}, [("crawled_at", DESCENDING), ("_id", DESCENDING)]),
+    ("retention_day_scan", "raw_articles", {"crawled_at": {"$gte": datetime(2025, 10, 30), "$lt": datetime(2025, 10, 31)}}, None),
+]
+
+# 已被上面的複合索引取代 (是新索引的前綴)；新索引建好後刪除，避免每次寫入多維護一份
+REPLACED_INDEXES = {
+    "raw_articles": ["source_crawled_at", "crawled_at"],
+}
+
+
+def ensure_indexes(database=None):
+    """建立註冊表中所有索引；單一索引失敗 (例如舊資料有重複值) 只印警告，不中斷啟動"""
+    database = database if database is not None else db
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                database[collection].create_indexes([model])
+            except ConnectionFailure:
+                # 連不上 DB 就不用一個一個試了
+                raise
+            except PyMongoError as e:
+                print(f"⚠️ [Index] {collection}.{model.document['name']} 建立失敗: {e}")
+    for collection, names in REPLACED_INDEXES.items():
+        existing = set(database[collection].index_information())
+        if any(model.document["name"] not in existing for model in INDEXES[collection]):
+            continue    # 新索引沒建成功時保留舊的
+        for name in set(names) & existing:
+            try:
+                database[collection].drop_index(name)
+                print(f"🗑️ [Index] 已移除被取代的索引 {collection}.{name}")
+            except PyMongoError as e:
+                print(f"⚠️ [Index] {collection}.{name} 移除失敗: {e}")
+    print("✅ [Index] 索引檢查完成")
+
+
+def _plan_stages(plan):
+    """遞迴收集 winningPlan 內所有 stage 名稱"""
+    stages = [plan.get("stage")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages += _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return [s for s in stages if s]
+
+
+def verify_query_plans(database=None):
+    """
+    對每個熱門查詢執行 explain()，回傳未走索引 (沒有 IXSCAN 或含 COLLSCAN) 的查詢清單。
+    回傳 [{"name", "collection", "stages"}]
+    """
+    database = database if database is not None else db
+    problems = []
+    for name, collection, filter, sort in HOT_QUERIES:
+        cursor = database[collection].find(filter).limit(5)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = cursor.explain()
+        except ConnectionFailure:
+            raise
+        except PyMongoError as e:
+            print(f"⚠️ [Index] {name} explain 失敗: {e}")
+            continue
+
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages or "IXSCAN" not in stages:
+            problems.append({"name": name, "collection": collection, "stages": stages})
+            print(f"⚠️ [Index] {name} 未使用索引: {' <- '.join(stages)}")
+    if not problems:
+        print("✅ [Index] 熱門查詢皆使用 IXSCAN")
+    return problems
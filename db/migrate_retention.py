@@ -0,0 +1,78 @@
+"""
+保存分層遷移：把既有的 raw_articles / alerts 接上 services/retention.py 的熱層 / 歷史層 / 彙總層
+
+步驟：
+  1. 沒有 crawled_at 的舊文件以 ObjectId 的建立時間補上 (否則永遠不會被封存、也不會過期)
+  2. 建立 crawl_history time-series 集合與索引 (含 raw_articles / alerts 的 crawled_at、expires_at TTL)
+  3. 從最舊的一天封存到 today - ROLLUP_AFTER_DAYS：寫歷史層、算每日彙總、蓋上 expires_at
+     早於 HOT_RETENTION_DAYS 的文件 expires_at 已經過去，TTL monitor (約每 60 秒一輪) 會陸續刪除
+
+可重複執行：已封存的日期會從 retention_state 的進度之後接著做。
+完成後設定 RETENTION_ENABLED=true，由排程每 6 小時封存新的日期。
+
+    python db/migrate_retention.py --dry-run
+    python db/migrate_retention.py --hot-days 30 --history-days 365
+"""
+import argparse
+import pathlib
+import sys
+from datetime import datetime, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from db.indexes import ensure_indexes
+from db.mongo import db
+from services.retention import HOT_COLLECTIONS, days_to_roll, ensure_history_collection, run_retention
+from util.config import env
+
+
+def report(database):
+    """各集合目前的文件數、時間範圍，以及遷移後會立刻過期的筆數"""
+    cutoff = datetime.now() - timedelta(days=env.HOT_RETENTION_DAYS)
+    for name in HOT_COLLECTIONS:
+        collection = database[name]
+        total = collection.estimated_document_count()
+        missing = collection.count_documents({"crawled_at": {"$not": {"$type": "date"}}})
+        expired = collection.count_documents({"crawled_at": {"$lt": cutoff}})
+        days = days_to_roll(database, name)
+        span = f"{days[0]} ~ {days[-1]}" if days else "無"
+        print(f"📦 {name}: {total:,} 筆，沒有 crawled_at {missing:,} 筆，"
+              f"早於熱層保留期 ({env.HOT_RETENTION_DAYS} 天) {expired:,} 筆；待封存日期 {len(days)} 天 ({span})")
+
+
+def backfill_crawled_at(database):
+    for name in HOT_COLLECTIONS:
+        result = database[name].update_many(
+            {"crawled_at": {"$not": {"$type": "date"}}},
+            [{"$set": {"crawled_at": {"$toDate": "$_id"}}}],
+        )
+        print(f"🕒 {name}: 補上 crawled_at {result.modified_count:,} 筆")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="只列出各集合狀態，不寫入")
+    parser.add_argument("--hot-days", type=int, help="覆寫 HOT_RETENTION_DAYS")
+    parser.add_argument("--history-days", type=int, help="覆寫 HISTORY_RETENTION_DAYS (0 = 不寫歷史層)")
+    args = parser.parse_args()
+
+    if args.hot_days is not None:
+        env.HOT_RETENTION_DAYS = args.hot_days
+    if args.history_days is not None:
+        env.HISTORY_RETENTION_DAYS = args.history_days
+
+    report(db)
+    if args.dry_run:
+        return
+
+    backfill_crawled_at(db)
+    if ensure_history_collection(db):
+        print(f"🗄️ 已建立 time-series 集合 crawl_history (保留 {env.HISTORY_RETENTION_DAYS} 天)")
+    ensure_indexes(db)
+    run_retention(db, verbose=True)
+    print("✅ 遷移完成；設定 RETENTION_ENABLED=true 讓排程接手之後的封存")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
+from pymongo.database import Database
 from pymongo.server_api import ServerApi
 import sys
+import threading
 import pathlib
 import certifi
 
@@ -8,15 +10,109 @@ BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 from util.config import env
+from services.metrics import mongo_command_metrics
 
 MONGO_URI = env.MongoDB_URL
+DB_NAME = "medipoint"
 
-client = MongoClient(
-    MONGO_URI,
+# 連線池大小與各項逾時 (同步 / 非同步 client 共用)
+MONGO_OPTIONS = dict(
     server_api=ServerApi("1"),
-    tls=True,
-    tlsCAFile=certifi.where(),
-    tlsAllowInvalidCertificates=True,
+    maxPoolSize=env.MONGO_MAX_POOL_SIZE,
+    minPoolSize=env.MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=env.MONGO_TIMEOUT_MS,
+    connectTimeoutMS=env.MONGO_TIMEOUT_MS,
+    socketTimeoutMS=env.MONGO_SOCKET_TIMEOUT_MS,
+    waitQueueTimeoutMS=env.MONGO_TIMEOUT_MS,
+    # 每個指令的耗時 -> /metrics
+    event_listeners=[mongo_command_metrics],
 )
+if env.MONGO_TLS:
+    MONGO_OPTIONS.update(
+        tls=True,
+        tlsCAFile=certifi.where(),
+        tlsAllowInvalidCertificates=True,
+    )
 
-db = client["medipoint"]
\ No newline at end of file
+# ==========================================
+# 同步 client：爬蟲、背景工作等在 thread 內執行的程式使用
+#   不在 import 時建立 (mongodb+srv 會先查 DNS、TLS client 也要載入憑證)：
+#   App 啟動時由 lifespan 的背景 thread 呼叫 connect()；腳本 / benchmark 則在第一次使用時建立。
+#   db 是延遲解析的代理：db.raw_articles、db["inventory"] 回傳的集合代理要到真正呼叫方法時才連線，
+#   因此模組層級的 singleton 可以在 import 時就把集合存起來。
+# ==========================================
+client = None
+_client_lock = threading.Lock()
+
+def connect():
+    global client
+    with _client_lock:
+        if client is None:
+            client = MongoClient(MONGO_URI, **MONGO_OPTIONS)
+    return client[DB_NAME]
+
+def close():
+    global client
+    with _client_lock:
+        if client is not None:
+            client.close()
+        client = None
+
+def get_db():
+    return client[DB_NAME] if client is not None else connect()
+
+
+class LazyCollection:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self._name], attr)
+
+    def __getitem__(self, key):
+        return get_db()[self._name][key]
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+class LazyDatabase:
+    """Database 的方法 (command、watch...) 直接轉給真正的 Database；其餘名稱視為集合"""
+
+    def __getattr__(self, name):
+        if name.startswith("_") or hasattr(Database, name):
+            return getattr(get_db(), name)
+        return LazyCollection(name)
+
+    def __getitem__(self, name):
+        return LazyCollection(name)
+
+    def __repr__(self):
+        return f"LazyDatabase({DB_NAME!r})"
+
+
+db = LazyDatabase()
+
+# ==========================================
+# 非同步 client：API handler 使用 (由 FastAPI lifespan 建立與關閉)
+# ==========================================
+async_client = None
+async_db = None
+
+def connect_async():
+    global async_client, async_db
+    if async_client is None:
+        async_client = AsyncMongoClient(MONGO_URI, **MONGO_OPTIONS)
+        async_db = async_client[DB_NAME]
+    return async_db
+
+async def close_async():
+    global async_client, async_db
+    if async_client is not None:
+        await async_client.close()
+    async_client = None
+    async_db = None
+
+def get_async_db():
+    """取得非同步 DB；尚未在 lifespan 建立時 (例如 benchmark) 就地建立"""
+    return async_db if async_db is not None else connect_async()
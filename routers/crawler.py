@@ -1,13 +1,29 @@
-from fastapi import APIRouter, BackgroundTasks
-# 注意這裡改成 services.crawlers
-from services.crawlers import run_all_crawlers
+import asyncio
+from fastapi import APIRouter
+from services.scheduler import crawl_scheduler
+from services.retention import retention_status
 
 router = APIRouter(prefix="/api/crawler", tags=["Crawler"])
 
 @router.post("/run")
-async def run_crawlers_background(background_tasks: BackgroundTasks):
+async def run_crawlers_background():
     """
-    手動觸發全平台爬蟲 (PTT, Dcard, Google News)
+    手動觸發全平台爬蟲 (PTT, Dcard, Google News, CDC)
+    與排程共用 single-flight 鎖，已在執行中的來源不會重複啟動
     """
-    background_tasks.add_task(run_all_crawlers)
-    return {"message": "全平台爬蟲任務已啟動", "status": "processing"}
+    started = await crawl_scheduler.trigger()
+    return {"message": "全平台爬蟲任務已啟動", "status": "processing", "started": started}
+
+@router.get("/status")
+async def get_crawler_status():
+    """
+    各來源的排程狀態：上次執行時間、耗時、筆數、錯誤與下次執行時間
+    """
+    return await asyncio.to_thread(crawl_scheduler.status)
+
+@router.get("/retention")
+async def get_retention_status():
+    """
+    保存分層狀態：熱層 / 歷史層保留天數、各集合封存到哪一天、封存排程
+    """
+    return await asyncio.to_thread(retention_status)
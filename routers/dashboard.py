@@ -1,12 +1,174 @@
-from fastapi import APIRouter
-from services.dashboard import get_weekly_dashboard_data
+import asyncio
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from services.dashboard import TARGET_DATE, STORE_ID, stream_weekly_reports
+from services.dashboard_queries import fetch_insights_page_async
+from services.report_cache import report_cache
+from services.kpi_rollups import refresh_rollups
+from services.event_stream import event_hub
+from services.topic_heat import KINDS, SPARKLINE_DAYS, fetch_heat_trends_async
+from util.auth import verify_credentials
+from util.responses import json_response
 
 router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
 
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+STREAM_HEARTBEAT_SECONDS = 15
+MAX_BATCH_STORES = 500
+MAX_HEAT_TERMS = 50
+MAX_INSIGHTS_PAGE = 1000
+
+class WeeklyReportBatchRequest(BaseModel):
+    store_ids: list[str] = Field(min_length=1, max_length=MAX_BATCH_STORES)
+    date: str = Field(TARGET_DATE, pattern=DATE_PATTERN)
+
+class InsightItem(BaseModel):
+    id: str
+    source: str | None = None
+    board: str | None = None
+    title: str = ""
+    content: str = Field("", description="內文前 60 字")
+    url: str | None = None
+    crawled_at: datetime | None = None
+    cluster_id: str | None = None
+    keywords: list[str] = []
+
+class InsightsPage(BaseModel):
+    items: list[InsightItem]
+    next_cursor: str | None = Field(None, description="下一頁的 cursor，null 表示沒有更多資料")
+
 @router.get("/weekly-report")
-def get_weekly_report():
+async def get_weekly_report(
+    request: Request,
+    store_id: str = STORE_ID,
+    date: str = Query(TARGET_DATE, pattern=DATE_PATTERN),
+):
     """
     取得本週戰情摘要 (包含 KPI, 建議, 輿情)
+    KPI 為 date 所在 ISO 週的彙總；回傳快取的快照，帶 If-None-Match 且內容未變時回 304。
+    """
+    snapshot = await report_cache.get(store_id, date)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.post("/weekly-report/batch")
+async def get_weekly_report_batch(body: WeeklyReportBatchRequest):
+    """
+    多門市批次週報，以 NDJSON 串流回傳：每完成一間門市送出一行 {"store_id", "report"}
+    (共用區塊只算一次、門市資料一次查完，詳見 services.dashboard.stream_weekly_reports)
+    該門市失敗時那一行是 {"store_id", "error"}；共用查詢失敗時只有一行 {"error"}
+    (串流已經以 200 開始，無法再改狀態碼)
+    """
+    store_ids = list(dict.fromkeys(body.store_ids))  # 去除重複，保留順序
+
+    def encode(line):
+        return json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    async def lines():
+        try:
+            async for store_id, report, error in stream_weekly_reports(store_ids, body.date):
+                if error is not None:
+                    yield encode({"store_id": store_id, "error": str(error)})
+                else:
+                    yield encode({"store_id": store_id, "report": jsonable_encoder(report)})
+        except Exception as e:
+            print(f"❌ [Dashboard] 批次週報失敗: {e}")
+            yield encode({"error": str(e)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# 回應由 orjson 直接序列化 (不經過 pydantic)，InsightsPage 只用於 OpenAPI 文件；
+# 欄位與 dashboard_queries._shape_insights_page 一致 (tests/test_insights_page.py 驗證)
+@router.get("/insights", responses={200: {"model": InsightsPage}})
+async def get_insights(
+    request: Request,
+    source: list[str] | None = Query(None),
+    limit: int = Query(50, ge=1, le=MAX_INSIGHTS_PAGE),
+    cursor: str | None = None,
+):
+    """
+    輿情列表 (依爬取時間新到舊) 的分頁，供前端無限捲動載入；週報的 insights 只有各來源前幾篇。
+    source 可重複 (PTT / Dcard / GoogleNews)；下一頁帶上回應的 next_cursor。
+    回應以 orjson 序列化，較大的頁面依 Accept-Encoding 以 gzip / br 壓縮。
+    """
+    try:
+        page = await fetch_insights_page_async(source, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await asyncio.to_thread(json_response, page, request.headers.get("accept-encoding"))
+
+@router.get("/heat")
+async def get_topic_heat(
+    terms: list[str] = Query(..., max_length=MAX_HEAT_TERMS),
+    kind: str = Query("keyword", pattern=f"^({'|'.join(KINDS)})$"),
+    date: str | None = Query(None, pattern=DATE_PATTERN),
+    days: int = Query(SPARKLINE_DAYS, ge=1, le=90),
+    granularity: str = Query("day", pattern="^(day|hour)$"),
+):
+    """
+    話題熱度趨勢：每個 term 的 sparkline (每日或每小時提及次數)、本週 / 上週總數與週對週變化 (%)。
+    date 為區間最後一天 (預設今天)；一次索引查詢讀回全部 term 的日文件。
+    """
+    if granularity == "hour" and days > 7:
+        raise HTTPException(status_code=422, detail="小時粒度最多 7 天")
+    trends = await fetch_heat_trends_async(kind, list(dict.fromkeys(terms)), date, days, granularity)
+    return {"kind": kind, "granularity": granularity, "trends": trends}
+
+@router.get("/stream")
+async def stream_events(request: Request):
+    """
+    SSE：新的輿情 (event: insight) 與法規警示 (event: alert) 即時推播。
+    前端用 EventSource 連線，斷線重連時會自動帶 Last-Event-ID 補發錯過的事件。
+    """
+    last_event_id = request.headers.get("last-event-id")
+    sub = event_hub.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    if sub is None:
+        raise HTTPException(status_code=503, detail="即時推播連線數已達上限")
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(sub.queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # 心跳 (SSE 註解行)，避免 proxy 把閒置連線切斷
+                    yield b": ping\n\n"
+                    continue
+                if payload is None:
+                    break   # 消化太慢被踢掉，前端會自動重連
+                yield payload
+        finally:
+            event_hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@router.post("/cache/invalidate", dependencies=[Depends(verify_credentials)])
+async def invalidate_report_cache(store_id: str | None = None, date: str | None = None):
+    """
+    清除週報快照 (例如 ERP 匯入新的庫存後呼叫)，下次請求時重新計算
+    """
+    report_cache.invalidate(store_id, date)
+    return {"message": "週報快取已清除", "store_id": store_id, "date": date}
+
+@router.post("/rollups/refresh", dependencies=[Depends(verify_credentials)])
+async def refresh_kpi_rollups(store_id: str | None = None, date: str | None = Query(None, pattern=DATE_PATTERN)):
+    """
+    重算該門市 / 日期的 KPI 彙總並清除週報快照；不帶參數時全量重建。
+    新增的 summary 資料列由排程 (KPI_ROLLUP_SCHEDULER_ENABLED) 自動重算，
+    ERP 原地修改或刪除既有資料列時才需要手動呼叫。
     """
-    # 直接呼叫 Service 層的函式
-    return get_weekly_dashboard_data()
\ No newline at end of file
+    await asyncio.to_thread(refresh_rollups, [store_id] if store_id else None, [date] if date else None)
+    # 同一週的其他日期也會用到這份週彙總，因此只依門市清除
+    report_cache.invalidate(store_id)
+    return {"message": "KPI 彙總已更新", "store_id": store_id, "date": date}
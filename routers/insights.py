@@ -0,0 +1,30 @@
+import asyncio
+from datetime import date as date_type, datetime, time, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from services.search import MAX_PAGE_SIZE, search_articles
+
+router = APIRouter(prefix="/api/insights", tags=["Insights"])
+
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+@router.get("/search")
+async def search_insights(
+    q: str = Query(..., min_length=1, max_length=100),
+    source: list[str] | None = Query(None),
+    since: str | None = Query(None, pattern=DATE_PATTERN),
+    until: str | None = Query(None, pattern=DATE_PATTERN),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: str = Query("relevance", pattern="^(relevance|date)$"),
+):
+    """
+    輿情全文檢索 (標題 + 內文的字元 bigram 倒排索引)，例如 q=普拿疼 缺貨：所有詞都要出現，依 BM25 排序。
+    source 可重複 (PTT / Dcard / GoogleNews)；since / until 為爬取日期 (含當天)；
+    下一頁帶上回應的 next_cursor，為 null 時已經沒有更多結果。
+    """
+    start = datetime.combine(date_type.fromisoformat(since), time.min) if since else None
+    end = datetime.combine(date_type.fromisoformat(until), time.min) + timedelta(days=1) if until else None
+    try:
+        return await asyncio.to_thread(search_articles, q, source, start, end, limit, cursor, sort)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
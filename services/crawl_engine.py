@@ -0,0 +1,455 @@
+import asyncio
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.crawlers import (
+    HEADERS, PTT_TARGET_BOARDS, ptt_cookies,
+    PTT_BASE_URL, CDC_BASE_URL, CDC_BULLETIN_PATH, GOOGLE_NEWS_RSS_URL, GOOGLE_NEWS_QUERY,
+    PTT_PARSERS, parse_ptt_article, parse_cdc_bulletins, tag_keywords, parse_google_news, build_dcard_articles,
+    save_articles, save_alerts,
+)
+from services.write_buffer import BulkWriteBuffer
+from services.http_client import AsyncHttpClient
+from services.metrics import stage_timer
+from services.crawl_state import CrawlStateStore, ptt_article_id, body_hash
+from services.parse_pipeline import ParseStage
+from services.event_stream import event_hub
+from services.dedupe import TitleIndex, title_index
+from services.topic_heat import TopicHeatCounter
+from services.search import SearchIndex, search_index
+from services.report_cache import report_cache
+from services.dashboard import pregenerate_talking_points
+from util.config import env
+
+# ==========================================
+# 每個 Host 的禮貌限制
+#   concurrency: 同時連線數上限
+#   rate / burst: token bucket (每秒補充幾個 token / 最多累積幾個)
+# ==========================================
+HOST_POLICIES = {
+    "www.ptt.cc": {"concurrency": 2, "rate": 2.0, "burst": 2},
+    "www.cdc.gov.tw": {"concurrency": 1, "rate": 1.0, "burst": 1},
+    "news.google.com": {"concurrency": 2, "rate": 2.0, "burst": 2},
+}
+DEFAULT_HOST_POLICY = {"concurrency": 2, "rate": 1.0, "burst": 1}
+
+ALL_SOURCES = ("cdc", "dcard", "news", "ptt")
+
+
+class TokenBucket:
+    """簡單的 token bucket，取代原本每頁 time.sleep 的做法"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    """同一個 host 共用：連線數上限 (Semaphore) + 頻率上限 (TokenBucket)"""
+
+    def __init__(self, concurrency, rate, burst):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class CrawlEngine:
+    """
+    非同步爬蟲引擎：所有來源與 PTT 看板同時抓取，
+    共用一個 AsyncHttpClient (連線池、重試、計時，見 http_client)，並依 host 各自限流。
+    http2=None 時依 CRAWL_HTTP2 決定是否啟用 HTTP/2。
+
+    網址皆可覆寫 (benchmark 會指向本機 stub server)；
+    persist=False 時只抓取與解析，不寫入 DB；
+    persist=True 時所有來源共用一個 BulkWriteBuffer，批次寫入。
+
+    incremental=True 時使用 crawl_state：送 ETag / Last-Modified 條件式請求，
+    列表沒變就不解析；PTT 翻頁碰到看過的文章就停，只寫入新文章。
+
+    解析交給 ParseStage (parse_workers > 0 時在 process pool 執行，見 parse_pipeline)，
+    每次 fetch 前先佔解析名額，解析跟不上時 fetch 跟著暫停；
+    ptt_parser 可選 "bs4" 或 "lxml" (較快的 XPath 版本)。
+
+    deep=True 時再抓每篇符合條件的 PTT 文章內文與推文數 (見 fetch_ptt_articles)。
+    """
+
+    def __init__(self, ptt_base_url=PTT_BASE_URL, cdc_base_url=CDC_BASE_URL,
+                 news_rss_url=GOOGLE_NEWS_RSS_URL, policies=None, persist=True, timeout=10,
+                 database=None, incremental=True, state=None,
+                 parse_workers=None, ptt_parser=None, deep=None,
+                 article_concurrency=None, max_body_bytes=None, dedupe=None, http2=None):
+        self.ptt_base_url = ptt_base_url
+        self.cdc_base_url = cdc_base_url
+        self.news_rss_url = news_rss_url
+        self.policies = policies if policies is not None else HOST_POLICIES
+        self.persist = persist
+        self.timeout = timeout
+        self.http2 = http2
+        # 新插入的文章 / 警示：推給 SSE 連線 (沒有 change stream 時)，並累加標題群組的提及次數、話題熱度與全文檢索索引
+        self.buffer = BulkWriteBuffer(database, on_insert=self._on_insert) if persist else None
+        if dedupe is None:
+            dedupe = title_index if database is None and persist else TitleIndex(database, persist=persist)
+        self.dedupe = dedupe
+        self.heat = TopicHeatCounter(database, persist=persist)
+        # 全文檢索：預設 DB 時與 API 共用 singleton，新文章寫入後查詢端立刻看得到
+        self.search = search_index if database is None and persist else SearchIndex(database, persist=persist)
+        self.incremental = incremental
+        self.state = state if state is not None else CrawlStateStore(database, persist=persist)
+        self.http_stats = {"requests": 0, "bytes": 0, "not_modified": 0, "unchanged": 0}
+        self.parser = ParseStage(parse_workers)
+        self.parse_ptt_index = PTT_PARSERS[ptt_parser or env.PTT_PARSER]
+        self.deep = env.PTT_DEEP_CRAWL if deep is None else deep
+        self.article_concurrency = article_concurrency or env.PTT_ARTICLE_CONCURRENCY
+        self.max_body_bytes = max_body_bytes or env.PTT_MAX_BODY_BYTES
+        self.article_stats = {"fetched": 0, "bytes": 0, "truncated": 0, "unchanged": 0, "failed": 0, "seconds": 0.0}
+        self.errors = {}    # 各來源的錯誤訊息 (排程器據此判斷是否要退避重試)
+        self._limiters = {}
+        self._client = None
+        # host -> 來源名稱 (量測 fetch 耗時用)
+        self._sources = {urlsplit(url).netloc: source for url, source in (
+            (ptt_base_url, "PTT"), (cdc_base_url, "CDC"), (news_rss_url, "GoogleNews"),
+        )}
+
+    async def __aenter__(self):
+        self._client = AsyncHttpClient(headers=HEADERS, timeout=self.timeout, http2=self.http2,
+                                       cookies=ptt_cookies(self.ptt_base_url))
+        if self.incremental:
+            await asyncio.to_thread(self.state.load)
+        if self.persist:
+            await asyncio.to_thread(self.dedupe.ensure_loaded)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    def _limiter_for(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            policy = self.policies.get(host, DEFAULT_HOST_POLICY)
+            self._limiters[host] = HostLimiter(policy["concurrency"], policy["rate"], policy["burst"])
+        return self._limiters[host]
+
+    def _source_for(self, url):
+        return self._sources.get(urlsplit(url).netloc, "")
+
+    async def fetch(self, url, **kwargs):
+        with stage_timer("crawler", "fetch", self._source_for(url)):
+            async with self._limiter_for(url):
+                resp = await self._client.get(url, **kwargs)
+        self.http_stats["requests"] += 1
+        self.http_stats["bytes"] += len(resp.content)
+        return resp
+
+    async def fetch_capped(self, url, max_bytes, **kwargs):
+        """
+        串流讀取，讀到 max_bytes 就停 (超長的討論串不會整篇讀進記憶體)。
+        回傳 (status_code, 內容 bytes, 是否被截斷)
+        """
+        chunks, size, truncated = [], 0, False
+        with stage_timer("crawler", "fetch", self._source_for(url)):
+            async with self._limiter_for(url):
+                async with self._client.stream("GET", url, **kwargs) as resp:
+                    if resp.status_code == 200:
+                        async for chunk in resp.aiter_bytes():
+                            chunks.append(chunk)
+                            size += len(chunk)
+                            if size >= max_bytes:
+                                truncated = True
+                                break
+        self.http_stats["requests"] += 1
+        self.http_stats["bytes"] += size
+        return resp.status_code, b"".join(chunks)[:max_bytes], truncated
+
+    async def fetch_if_changed(self, url, scope, **kwargs):
+        """
+        條件式請求：回應 304，或內容與上次完全相同時回傳 None (呼叫端不必再解析)
+        驗證資訊暫存在 scope，呼叫端解析、寫入緩衝區之後才 commit (見 crawl_state)
+        """
+        if not self.incremental:
+            return await self.fetch(url, **kwargs)
+
+        resp = await self.fetch(url, headers=self.state.conditional_headers(url), **kwargs)
+        if resp.status_code == 304:
+            self.http_stats["not_modified"] += 1
+            return None
+        if resp.status_code == 200 and self.state.record_response(url, resp.headers, resp.content, scope):
+            self.http_stats["unchanged"] += 1
+            return None
+        return resp
+
+    async def _parse(self, source, func, content, *args):
+        with stage_timer("crawler", "parse", source):
+            return await self.parser.run(func, content, *args)
+
+    async def _save(self, source, func, items):
+        # pymongo 是同步的，丟到 thread 執行避免卡住 event loop
+        if self.persist and items:
+            with stage_timer("crawler", "persist", source):
+                await asyncio.to_thread(self._persist, func, items)
+
+    def _persist(self, func, items):
+        if func is save_articles:
+            # 寫入前先歸群，cluster_id 跟著文章一起存
+            self.dedupe.assign(items)
+        func(items, self.buffer)
+
+    def _on_insert(self, collection, docs):
+        event_hub.publish_inserted(collection, docs)
+        if collection == "raw_articles":
+            self.dedupe.count_inserted(docs)
+            self.heat.count_inserted(docs)
+            self.search.index_inserted(docs)
+
+    # ------------------------------------------
+    # 各來源
+    # ------------------------------------------
+    async def crawl_ptt(self, board, limit_pages=1):
+        current_url = f"{self.ptt_base_url}/bbs/{board}/index.html"
+        scope = f"ptt:{board}"
+        newest = self.state.newest_ptt_id(board) if self.incremental else None
+        titles = []
+        # 同一看板的分頁必須依序抓 (要靠上一頁連結)，不同看板之間則是並行
+        for _ in range(limit_pages):
+            try:
+                # 先佔解析名額再抓：解析塞滿時不再抓新頁面 (背壓，見 parse_pipeline)
+                async with self.parser.reserve():
+                    resp = await self.fetch_if_changed(current_url, scope)
+                    if resp is None: break  # 列表頁沒變，不會有新文章
+                    if resp.status_code != 200: break
+
+                    articles, prev_url = await self._parse("PTT", self.parse_ptt_index, resp.content, board, self.ptt_base_url)
+                ids = [ptt_article_id(a["url"]) for a in articles]
+                fresh = [a for a, i in zip(articles, ids) if newest is None or i is None or i > newest]
+                for i in ids:
+                    if i: self.state.set_newest_ptt_id(board, i, scope)
+
+                if self.deep:
+                    await self._save("PTT", save_articles, await self.fetch_ptt_articles(fresh))
+                else:
+                    await self._save("PTT", save_articles, fresh)
+                titles.extend(a["title"] for a in fresh)
+
+                # 這頁已經出現看過的文章，更舊的頁面都爬過了
+                if len(fresh) < len(articles): break
+                if not prev_url: break
+                current_url = prev_url
+            except Exception as e:
+                print(f"❌ [PTT-{board}] 錯誤: {e}")
+                self.errors[scope] = str(e)
+                self.state.discard(scope)
+                break
+        self.state.commit(scope)
+        print(f"✅ [PTT-{board}] 完成，抓取 {len(titles)} 篇。")
+        return titles
+
+    async def fetch_ptt_articles(self, articles):
+        """
+        深度爬取：補上每篇文章的內文與推文數。
+        同一看板最多 article_concurrency 篇同時抓取 (仍受 host 限流)，
+        內文與 DB 裡的 content_hash 相同就不再寫入；抓取失敗的保留標題版本。
+        回傳需要寫入的文章
+        """
+        known = await asyncio.to_thread(self._known_hashes, [a["url"] for a in articles]) if self.persist and articles else {}
+        slots = asyncio.Semaphore(self.article_concurrency)
+        stats = self.article_stats
+
+        async def fetch_one(article):
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    async with self.parser.reserve():
+                        status, body, truncated = await self.fetch_capped(article["url"], self.max_body_bytes)
+                        if status != 200:
+                            stats["failed"] += 1
+                            return True
+                        stats["fetched"] += 1
+                        stats["bytes"] += len(body)
+                        digest = body_hash(body)
+                        if known.get(article["url"]) == digest:
+                            stats["unchanged"] += 1
+                            return False
+                        parsed = await self._parse("PTT", parse_ptt_article, body)
+                    if parsed is None:
+                        return True
+                    stats["truncated"] += truncated
+                    article.update(parsed, content_hash=digest, content_truncated=truncated)
+                    tag_keywords(article)
+                    return True
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"⚠️ [PTT] 文章抓取失敗 {article['url']}: {e}")
+                    return True
+                finally:
+                    stats["seconds"] += time.perf_counter() - started
+
+        keep = await asyncio.gather(*(fetch_one(a) for a in articles))
+        return [a for a, k in zip(articles, keep) if k]
+
+    def _known_hashes(self, urls):
+        cursor = self.buffer.database.raw_articles.find({"url": {"$in": urls}}, {"_id": 0, "url": 1, "content_hash": 1})
+        return {doc["url"]: doc.get("content_hash") for doc in cursor}
+
+    async def crawl_cdc(self):
+        titles = []
+        try:
+            async with self.parser.reserve():
+                resp = await self.fetch_if_changed(self.cdc_base_url + CDC_BULLETIN_PATH, "cdc")
+                if resp is None:
+                    self.state.commit("cdc")
+                    print("✅ [CDC] 公告列表未變更。")
+                    return titles
+                alerts = await self._parse("CDC", parse_cdc_bulletins, resp.content, self.cdc_base_url)
+            await self._save("CDC", save_alerts, alerts)
+            self.state.commit("cdc")
+            titles = [a["title"] for a in alerts]
+            print(f"✅ [CDC] 完成，新增 {len(titles)} 則公告。")
+        except Exception as e:
+            print(f"❌ [CDC] 錯誤: {e}")
+            self.errors["cdc"] = str(e)
+            self.state.discard("cdc")
+        return titles
+
+    async def crawl_google_news(self, query=GOOGLE_NEWS_QUERY):
+        titles = []
+        try:
+            params = {"q": query, "hl": "zh-TW", "gl": "TW", "ceid": "TW:zh-Hant"}
+            async with self.parser.reserve():
+                resp = await self.fetch_if_changed(str(httpx.URL(self.news_rss_url, params=params)), "news")
+                if resp is None:
+                    self.state.commit("news")
+                    print("✅ [News] RSS 未變更。")
+                    return titles
+                articles = await self._parse("GoogleNews", parse_google_news, resp.content)
+            if self.incremental:
+                articles = self._only_newer_news(articles)
+            await self._save("GoogleNews", save_articles, articles)
+            self.state.commit("news")
+            titles = [a["title"] for a in articles]
+            print(f"✅ [News] 完成，新增 {len(titles)} 則新聞。")
+        except Exception as e:
+            print(f"❌ [News] 錯誤: {e}")
+            self.errors["news"] = str(e)
+            self.state.discard("news")
+        return titles
+
+    def _only_newer_news(self, articles):
+        """只留下發布時間比上次看過最新的還新的新聞"""
+        newest = self.state.newest_published("news")
+        fresh = []
+        for art in articles:
+            try:
+                # 統一轉成 naive UTC，才能和從 Mongo 讀回來的時間比較
+                published = parsedate_to_datetime(art["date"]).astimezone(timezone.utc).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                fresh.append(art)
+                continue
+            if newest is None or published > newest:
+                fresh.append(art)
+            self.state.set_newest_published("news", published, "news")
+        return fresh
+
+    async def crawl_dcard(self):
+        articles = build_dcard_articles()
+        await self._save("Dcard", save_articles, articles)
+        print(f"✅ [Dcard] 完成，寫入 {len(articles)} 篇資料。")
+        return [a["title"] for a in articles]
+
+    # ------------------------------------------
+    # 全部一起跑
+    # ------------------------------------------
+    async def run(self, boards=None, ptt_pages=1, sources=ALL_SOURCES):
+        boards = PTT_TARGET_BOARDS if boards is None else boards
+        print(f"🚀 [Engine] 同時爬取 {' / '.join(sources)} (PTT x{len(boards)})...")
+
+        jobs = {}
+        if "cdc" in sources: jobs["cdc"] = self.crawl_cdc()
+        if "dcard" in sources: jobs["dcard"] = self.crawl_dcard()
+        if "news" in sources: jobs["news"] = self.crawl_google_news()
+        if "ptt" in sources:
+            jobs["ptt"] = asyncio.gather(*(self.crawl_ptt(board, ptt_pages) for board in boards))
+
+        flusher = asyncio.create_task(self._flush_due_writes()) if self.persist else None
+        try:
+            done = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+        results = {
+            source: sum(len(x) for x in titles) if source == "ptt" else len(titles)
+            for source, titles in done.items()
+        }
+        results["http"] = {**self.http_stats, "transport": self._client.stats.snapshot()}
+        results["parse"] = {**self.parser.stats, "seconds": round(self.parser.stats["seconds"], 3)}
+        if self.deep:
+            fetched = self.article_stats["fetched"]
+            results["articles"] = {
+                **self.article_stats,
+                "seconds": round(self.article_stats["seconds"], 3),
+                "avg_ms": round(self.article_stats["seconds"] * 1000 / fetched, 1) if fetched else None,
+            }
+        results["errors"] = dict(self.errors)
+
+        if self.persist:
+            with stage_timer("crawler", "flush"):
+                results["writes"] = await asyncio.to_thread(self.buffer.flush)
+            await asyncio.to_thread(self.dedupe.save)
+            results["heat_buckets"] = await asyncio.to_thread(self.heat.flush)
+            results["search_indexed"] = await asyncio.to_thread(self.search.flush)
+            results["clusters"] = len(self.dedupe)
+            print(f"💾 [Engine] 寫入統計: {results['writes']}")
+        # 資料確定寫入後才更新爬取狀態，避免寫入失敗卻被當成「已看過」
+        if self.incremental:
+            await asyncio.to_thread(self.state.save)
+        if self.persist:
+            # 輿情與警示更新了，週報快照全部作廢
+            report_cache.invalidate()
+            if env.TALKING_POINT_PREGENERATE:
+                await asyncio.to_thread(pregenerate_talking_points)
+        return results
+
+
+    async def _flush_due_writes(self):
+        """爬取期間定時送出等太久的寫入 (緩衝區的時間門檻；最後仍會在 run() 結尾全部 flush)"""
+        while True:
+            await asyncio.sleep(self.buffer.max_delay / 2)
+            try:
+                await asyncio.to_thread(self.buffer.flush_if_due)
+            except Exception as e:
+                print(f"❌ [Engine] 定時寫入失敗: {e}")
+                self.errors["flush"] = str(e)
+
+
+async def run_all_crawlers_async(boards=None, ptt_pages=1, sources=ALL_SOURCES, **engine_kwargs):
+    """非同步版 run_all_crawlers，回傳與舊版相同的各來源筆數"""
+    async with CrawlEngine(**engine_kwargs) as engine:
+        return await engine.run(boards, ptt_pages, sources)
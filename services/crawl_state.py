@@ -0,0 +1,119 @@
+import hashlib
+import re
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from db.mongo import db
+
+# ==========================================
+# 爬蟲狀態 (crawl_state 集合)
+#   url:<網址>     -> ETag / Last-Modified / 內容 hash，用來送條件式請求
+#   ptt:<看板>     -> 看過最新的文章 ID，翻頁碰到舊文章就停
+#   feed:<名稱>    -> 看過最新的發布時間 (RSS)
+#
+# 每次爬取開始時一次載入、結束時一次 bulk_write 寫回。
+# persist=False 時只存在記憶體 (benchmark / 測試用)。
+#
+# 爬取途中的更新先暫存在各自的 scope (例如 "ptt:Health"、"cdc")，
+# 該來源解析並交給寫入緩衝區之後才 commit(scope)；途中出錯就 discard(scope)，
+# 下次仍會重新抓取、解析，不會因為一次失敗就永遠被當成「沒變更」而略過。
+# ==========================================
+PTT_ARTICLE_ID = re.compile(r"M\.(\d+)\.A(?:\.([0-9A-Fa-f]+))?")
+
+
+def ptt_article_id(url):
+    """
+    PTT 文章 ID (M.1700000000.A.1B2) 依發文時間遞增，
+    轉成可比較的 (timestamp, 尾碼) tuple；解析失敗回傳 None
+    """
+    m = PTT_ARTICLE_ID.search(url or "")
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2) or "0", 16)
+
+
+def body_hash(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+class CrawlStateStore:
+    def __init__(self, database=None, persist=True):
+        self.collection = (database if database is not None else db)["crawl_state"] if persist else None
+        self._state = {}
+        self._dirty = set()
+        self._staged = {}   # scope -> {key: 欄位}
+
+    def load(self):
+        if self.collection is not None:
+            self._state = {doc["_id"]: doc for doc in self.collection.find()}
+        self._dirty.clear()
+        self._staged.clear()
+
+    def save(self):
+        if self.collection is not None and self._dirty:
+            ops = [UpdateOne({"_id": key}, {"$set": {k: v for k, v in self._state[key].items() if k != "_id"}}, upsert=True)
+                   for key in self._dirty]
+            self.collection.bulk_write(ops, ordered=False)
+        self._dirty.clear()
+
+    def _update(self, key, scope=None, **fields):
+        if scope is not None:
+            self._staged.setdefault(scope, {}).setdefault(key, {}).update(fields)
+            return
+        self._state.setdefault(key, {"_id": key}).update(fields, updated_at=datetime.now())
+        self._dirty.add(key)
+
+    def _get(self, key, scope=None):
+        """已確認的狀態，再疊上同一個 scope 暫存中的更新"""
+        return {**self._state.get(key, {}), **self._staged.get(scope, {}).get(key, {})}
+
+    def commit(self, scope):
+        for key, fields in self._staged.pop(scope, {}).items():
+            self._update(key, **fields)
+
+    def discard(self, scope):
+        self._staged.pop(scope, None)
+
+    # ------------------------------------------
+    # HTTP 條件式請求
+    # ------------------------------------------
+    def conditional_headers(self, url):
+        doc = self._state.get(f"url:{url}", {})
+        headers = {}
+        if doc.get("etag"):
+            headers["If-None-Match"] = doc["etag"]
+        if doc.get("last_modified"):
+            headers["If-Modified-Since"] = doc["last_modified"]
+        return headers
+
+    def record_response(self, url, headers, content, scope=None):
+        """
+        記錄回應的驗證資訊 (帶 scope 時先暫存，commit 後才生效)；回傳內容是否與上次相同
+        (有些伺服器不支援 304，內容 hash 相同也視為未變更)
+        """
+        key = f"url:{url}"
+        digest = body_hash(content)
+        unchanged = self._state.get(key, {}).get("hash") == digest
+        self._update(key, scope, etag=headers.get("etag"), last_modified=headers.get("last-modified"), hash=digest)
+        return unchanged
+
+    # ------------------------------------------
+    # 看過的最新內容
+    # ------------------------------------------
+    def newest_ptt_id(self, board, scope=None):
+        value = self._get(f"ptt:{board}", scope).get("newest_id")
+        return tuple(value) if value else None
+
+    def set_newest_ptt_id(self, board, article_id, scope=None):
+        current = self.newest_ptt_id(board, scope)
+        if current is None or article_id > current:
+            self._update(f"ptt:{board}", scope, newest_id=list(article_id))
+
+    def newest_published(self, feed, scope=None):
+        return self._get(f"feed:{feed}", scope).get("newest_published")
+
+    def set_newest_published(self, feed, published, scope=None):
+        current = self.newest_published(feed, scope)
+        if current is None or published > current:
+            self._update(f"feed:{feed}", scope, newest_published=published)
@@ -1,11 +1,12 @@
-import requests
+import asyncio
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from datetime import datetime
-import time
 import random
-import cloudscraper
-import re
-from db.mongo import db
+from urllib.parse import urlsplit
+import httpx
+from services.keywords import keyword_matcher
 
 # --- 設定 Headers ---
 HEADERS = {
@@ -14,231 +15,284 @@ HEADERS = {
 }
 PTT_COOKIES = {"over18": "1"} 
 
-PTT_TARGET_BOARDS = ["BabyMother", "Health", "Beauty", "Gossiping"]
+# --- 來源網址 (集中管理，方便 benchmark 指向本機 stub server) ---
+PTT_BASE_URL = "https://www.ptt.cc"
+CDC_BASE_URL = "https://www.cdc.gov.tw"
+CDC_BULLETIN_PATH = "/Bulletin/List/MmgtpeidAR5Ooai4-fgHzQ"
+GOOGLE_NEWS_RSS_URL = "https://news.google.com/rss/search"
+GOOGLE_NEWS_QUERY = "流感 OR 腸病毒 OR 缺藥"
 
-# --- 健康與藥品關鍵字篩選 ---
-HEALTH_KEYWORDS = [
-    # 疾病症狀
-    "感冒", "發燒", "咳嗽", "流感", "腸病毒", "過敏", "氣喘", "鼻炎", "喉嚨痛", "頭痛",
-    "腹瀉", "便秘", "腸胃", "胃痛", "噁心", "嘔吐", "疲勞", "失眠", "焦慮", "憂鬱",
-    "高血壓", "糖尿病", "癌症", "腫瘤", "中風", "心臟", "肝炎", "腎臟", "痛風", "骨質疏鬆",
-    "關節炎", "皮膚炎", "濕疹", "蕁麻疹", "痘痘", "粉刺", "異位性", "紅疹", "癢",
-    "懷孕", "產檢", "產後", "哺乳", "母乳", "嬰兒", "幼兒", "兒童", "寶寶",
-    "疫情", "確診", "染疫", "隔離", "快篩", "PCR", "疫苗", "施打", "副作用",
-    
-    # 藥品相關
-    "藥", "藥物", "藥品", "用藥", "吃藥", "藥局", "藥師", "處方", "慢性處方",
-    "止痛藥", "消炎藥", "抗生素", "退燒藥", "感冒藥", "胃藥", "止咳", "化痰",
-    "維他命", "維生素", "保健食品", "營養品", "益生菌", "魚油", "鈣片", "葉黃素",
-    "普拿疼", "斯斯", "伏冒", "克流感", "類固醇", "安眠藥", "降血壓", "降血糖",
-    "藥膏", "藥水", "藥粉", "軟膏", "眼藥水", "噴劑", "貼布", "酸痛貼布",
-    
-    # 健康照護
-    "健康", "醫療", "醫院", "診所", "看診", "就醫", "掛號", "急診", "住院",
-    "醫生", "醫師", "護理師", "檢查", "體檢", "健檢", "抽血", "X光", "超音波",
-    "治療", "復健", "手術", "開刀", "化療", "放療",
-    "身體", "健康檢查", "預防", "養生", "保養", "調理", "體質"
-]
+def ptt_cookies(base_url=PTT_BASE_URL):
+    """PTT 的 over18 cookie，只送給 PTT 的 host (設在 client 上，不用已棄用的 per-request cookies)"""
+    cookies = httpx.Cookies()
+    for name, value in PTT_COOKIES.items():
+        cookies.set(name, value, domain=urlsplit(base_url).hostname)
+    return cookies
+
+PTT_TARGET_BOARDS = ["BabyMother", "Health", "Beauty", "Gossiping"]
 
+# --- 健康與藥品關鍵字篩選 (關鍵字清單與比對器見 services/keywords.py) ---
 def is_health_related(text):
     """檢查文章標題或內容是否與健康藥品相關"""
-    if not text:
-        return False
-    text_lower = text.lower()
-    return any(keyword in text for keyword in HEALTH_KEYWORDS)
+    return keyword_matcher.is_health_related(text)
 
-# ==========================================
-# 1. PTT 爬蟲
-# ==========================================
-def crawl_ptt(board="BabyMother", limit_pages=2):
-    print(f"🚀 [PTT] 開始爬取 {board} 版...")
-    current_url = f"https://www.ptt.cc/bbs/{board}/index.html"
-    articles_list = []
-    
-    for page in range(limit_pages):
-        try:
-            resp = requests.get(current_url, headers=HEADERS, cookies=PTT_COOKIES, timeout=10)
-            if resp.status_code != 200: break
-            
-            soup = BeautifulSoup(resp.text, "lxml")
-            divs = soup.find_all("div", class_="r-ent")
-            
-            for div in divs:
-                title_div = div.find("div", class_="title")
-                if not title_div.a: continue
-                title = title_div.a.text.strip()
-                link = "https://www.ptt.cc" + title_div.a["href"]
-                date_str = div.find("div", class_="date").text.strip()
-                
-                # 篩選：排除公告，且必須包含健康/藥品關鍵字
-                if "公告" in title:
-                    continue
-                
-                if not is_health_related(title):
-                    continue
-                
-                article_data = {
-                    "source": "PTT",
-                    "board": board,
-                    "title": title,
-                    "content": title,
-                    "url": link,
-                    "date": date_str,
-                    "crawled_at": datetime.now(),
-                    "status": "new"
-                }
-                db.raw_articles.update_one({"url": link}, {"$set": article_data}, upsert=True)
-                articles_list.append(title)
-
-            paging = soup.find("div", class_="btn-group-paging")
-            if paging:
-                prev_link_tags = paging.find_all("a")
-                if len(prev_link_tags) >= 2 and "上頁" in prev_link_tags[1].text:
-                    current_url = "https://www.ptt.cc" + prev_link_tags[1]["href"]
-                else: break
-            time.sleep(random.uniform(0.5, 1.0))
-        except Exception as e:
-            print(f"❌ [PTT-{board}] 錯誤: {e}")
-            break
-    print(f"✅ [PTT-{board}] 完成，抓取 {len(articles_list)} 篇。")
-    return articles_list
+def tag_keywords(article):
+    """比對標題與內文，把命中的關鍵字與分類存進文章"""
+    result = keyword_matcher.match(f"{article['title']}\n{article.get('content', '')}")
+    article["keywords"] = result.keywords
+    article["categories"] = result.categories
+    return result.is_health_related
 
 # ==========================================
-# 2. Dcard 爬蟲 (Mock 救援模式)
+# 解析 (純函式，不碰網路與 DB；CrawlEngine 直接呼叫或丟到 process pool)
 # ==========================================
-def crawl_dcard(limit=30):
-    # ... (省略真實爬取嘗試，直接回傳 Mock 以確保 Demo 順暢) ...
-    # 您可以保留之前的程式碼，這裡為了簡潔直接使用 Mock 邏輯
-    print(f"🚀 [Dcard] 執行爬取 (Mock Mode)...")
-    MOCK_DCARD_DATA = [
-        {"title": "最近流感真的好嚴重，小孩發燒三天了", "board": "parenting", "content": "看了兩次醫生都沒好..."},
-        {"title": "請問大家有推薦的維他命C嗎？", "board": "health", "content": "最近辦公室都在感冒..."},
-        {"title": "#請益 喉嚨痛到像刀割吃什麼藥有效？", "board": "talk", "content": "已經痛兩天了..."},
-        {"title": "藥局看到這個益生菌在特價值得買嗎？", "board": "shopping", "content": "大樹藥局現在買一送一..."},
-        {"title": "換季皮膚過敏好癢，求推薦藥膏", "board": "makeup", "content": "臉上紅一塊一塊的..."}
-    ]
-    
-    titles = []
+def _ptt_article(board, title, href, date_str, base_url):
+    """PTT 列表的一列轉成文章；公告或與健康無關時回傳 None"""
+    # 篩選：排除公告，且必須包含健康/藥品關鍵字
+    if "公告" in title:
+        return None
+
+    if not is_health_related(title):
+        return None
+
+    article = {
+        "source": "PTT",
+        "board": board,
+        "title": title,
+        "content": title,
+        "url": base_url + href,
+        "date": date_str,
+        "crawled_at": datetime.now(),
+        "status": "new"
+    }
+    tag_keywords(article)
+    return article
+
+
+def parse_ptt_index(html, board, base_url=PTT_BASE_URL):
+    """
+    解析 PTT 看板列表頁。
+    回傳 (符合健康關鍵字的文章列表, 上一頁網址或 None)
+    """
+    soup = BeautifulSoup(html, "lxml")
+    articles = []
+
+    for div in soup.find_all("div", class_=["r-ent", "r-list-sep"]):
+        # r-list-sep 之後是置底文 (版規等舊文章)，不列入
+        if "r-list-sep" in div.get("class", []): break
+        title_div = div.find("div", class_="title")
+        if not title_div or not title_div.a: continue
+        title = title_div.a.text.strip()
+        date_str = div.find("div", class_="date").text.strip()
+
+        article = _ptt_article(board, title, title_div.a["href"], date_str, base_url)
+        if article: articles.append(article)
+
+    prev_url = None
+    paging = soup.find("div", class_="btn-group-paging")
+    if paging:
+        prev_link_tags = paging.find_all("a")
+        if len(prev_link_tags) >= 2 and "上頁" in prev_link_tags[1].text and prev_link_tags[1].get("href"):
+            prev_url = base_url + prev_link_tags[1]["href"]
+
+    return articles, prev_url
+
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+PTT_ROWS_XPATH = etree.XPath(f'//div[{_has_class("r-ent")} or {_has_class("r-list-sep")}]')
+PTT_TITLE_XPATH = etree.XPath(f'./div[{_has_class("title")}]/a')
+PTT_DATE_XPATH = etree.XPath(f'.//div[{_has_class("date")}]')
+PTT_PAGING_XPATH = etree.XPath(f'//div[{_has_class("btn-group-paging")}]/a')
+
+def parse_ptt_index_lxml(html, board, base_url=PTT_BASE_URL):
+    """
+    parse_ptt_index 的快速版：直接用 lxml.html + 預先編譯的 XPath，不經過 BeautifulSoup。
+    輸出與 parse_ptt_index 相同。
+    """
+    if isinstance(html, bytes):
+        doc = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    else:
+        doc = lxml.html.fromstring(html)
+    articles = []
+
+    for div in PTT_ROWS_XPATH(doc):
+        if "r-list-sep" in div.get("class", "").split(): break
+        links = PTT_TITLE_XPATH(div)
+        if not links: continue
+        title = links[0].text_content().strip()
+        dates = PTT_DATE_XPATH(div)
+        date_str = dates[0].text_content().strip() if dates else ""
+
+        article = _ptt_article(board, title, links[0].get("href"), date_str, base_url)
+        if article: articles.append(article)
+
+    prev_url = None
+    prev_link_tags = PTT_PAGING_XPATH(doc)
+    if len(prev_link_tags) >= 2 and "上頁" in prev_link_tags[1].text_content() and prev_link_tags[1].get("href"):
+        prev_url = base_url + prev_link_tags[1].get("href")
+
+    return articles, prev_url
+
+
+PTT_ARTICLE_CONTENT_LIMIT = 5000    # 內文最多保留幾個字
+PTT_ARTICLE_NOISE_XPATH = etree.XPath(
+    f'.//div[{_has_class("article-metaline")} or {_has_class("article-metaline-right")} or {_has_class("push")}]'
+    f' | .//span[{_has_class("f2")}]'
+)
+PTT_PUSH_TAG_XPATH = etree.XPath(f'.//div[{_has_class("push")}]/span[{_has_class("push-tag")}]')
+PTT_PUSH_KINDS = {"推": "up", "噓": "down", "→": "neutral"}
+
+def parse_ptt_article(html):
+    """
+    解析 PTT 文章頁，只留主要內文 (去掉作者/標題欄、發信站資訊、簽名檔與推文)。
+    回傳 {"content": 內文, "push": {"up", "down", "neutral"}}；找不到 main-content 時回傳 None
+    """
+    if isinstance(html, bytes):
+        doc = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    else:
+        doc = lxml.html.fromstring(html)
+    main = doc.get_element_by_id("main-content", None)
+    if main is None:
+        return None
+
+    push = {"up": 0, "down": 0, "neutral": 0}
+    for tag in PTT_PUSH_TAG_XPATH(main):
+        kind = PTT_PUSH_KINDS.get(tag.text_content().strip())
+        if kind: push[kind] += 1
+
+    for el in PTT_ARTICLE_NOISE_XPATH(main):
+        el.drop_tree()  # 保留元素後面的文字 (tail)
+    text = main.text_content()
+    # "--" 之後是簽名檔
+    sep = text.rfind("\n--\n")
+    if sep != -1: text = text[:sep]
+    return {"content": text.strip()[:PTT_ARTICLE_CONTENT_LIMIT], "push": push}
+
+
+# PTT 列表解析器，可用環境變數 PTT_PARSER=lxml 切換成快速版
+PTT_PARSERS = {"bs4": parse_ptt_index, "lxml": parse_ptt_index_lxml}
+
+
+def parse_cdc_bulletins(html, base_url=CDC_BASE_URL, limit=5):
+    """解析疾管署新聞稿列表，回傳 alert 資料列表 (只取最新 limit 則)"""
+    soup = BeautifulSoup(html, "lxml")
+
+    # 抓取列表中的連結 (class 隨時可能變，目前抓 div.content-boxes-v3 > a)
+    # 這裡使用較通用的解法
+    links = soup.select(".content-boxes-v3 a")
+
+    alerts = []
+    for link in links[:limit]:
+        title = link.get("title", "").strip()
+        href = link.get("href", "")
+        if not title: continue
+
+        # 判斷風險等級
+        risk = "Medium"
+        if any(x in title for x in ["死亡", "重症", "流行", "高峰", "緊急"]):
+            risk = "High"
+
+        alerts.append({
+            "agency": "CDC",
+            "type": "疫情速訊",
+            "title": title,
+            "url": base_url + href,
+            "risk_level": risk,
+            "crawled_at": datetime.now(),
+            "date": datetime.now().strftime("%Y-%m-%d") # 暫用當天日期
+        })
+    return alerts
+
+
+def parse_google_news(content, limit=10):
+    """解析 Google News RSS，回傳健康相關新聞列表"""
+    soup = BeautifulSoup(content, "xml")
+    articles = []
+    for item in soup.find_all("item")[:limit]:
+        title = item.title.text
+        link = item.link.text
+        pub_date = item.pubDate.text
+
+        # 篩選健康相關新聞
+        if not is_health_related(title):
+            continue
+
+        article = {
+            "source": "GoogleNews",
+            "board": "News",
+            "title": title,
+            "content": title,
+            "url": link,
+            "date": pub_date,
+            "crawled_at": datetime.now(),
+            "status": "new"
+        }
+        tag_keywords(article)
+        articles.append(article)
+    return articles
+
+
+# Dcard 目前使用 Mock 資料 (真實爬取常被 Cloudflare 擋下)
+MOCK_DCARD_DATA = [
+    {"title": "最近流感真的好嚴重，小孩發燒三天了", "board": "parenting", "content": "看了兩次醫生都沒好..."},
+    {"title": "請問大家有推薦的維他命C嗎？", "board": "health", "content": "最近辦公室都在感冒..."},
+    {"title": "#請益 喉嚨痛到像刀割吃什麼藥有效？", "board": "talk", "content": "已經痛兩天了..."},
+    {"title": "藥局看到這個益生菌在特價值得買嗎？", "board": "shopping", "content": "大樹藥局現在買一送一..."},
+    {"title": "換季皮膚過敏好癢，求推薦藥膏", "board": "makeup", "content": "臉上紅一塊一塊的..."}
+]
+
+def build_dcard_articles():
+    """將 Dcard Mock 資料轉成 raw_articles 格式"""
+    articles = []
     for mock in MOCK_DCARD_DATA:
         # 檢查是否符合健康關鍵字
         if not is_health_related(mock['title']):
             continue
-            
-        mock_url = f"https://www.dcard.tw/f/{mock['board']}/p/{random.randint(200000000, 250000000)}"
-        article_data = {
+
+        article = {
             "source": "Dcard",
             "board": mock['board'],
             "title": mock['title'],
             "content": mock['content'],
-            "url": mock_url,
+            "url": f"https://www.dcard.tw/f/{mock['board']}/p/{random.randint(200000000, 250000000)}",
             "crawled_at": datetime.now(),
             "status": "mock"
         }
-        db.raw_articles.update_one({"title": mock['title']}, {"$set": article_data}, upsert=True)
-        titles.append(mock['title'])
-        
-    print(f"✅ [Dcard] 完成，寫入 {len(titles)} 篇資料。")
-    return titles
+        tag_keywords(article)
+        articles.append(article)
+    return articles
 
 # ==========================================
-# 3. CDC 疾管署新聞 (新增回來)
+# 寫入 DB
+#   重爬到的文章 / 警示會清掉保存分層蓋上的 expires_at (services/retention.py)：
+#   crawled_at 移到今天，等今天封存時再重新蓋上，仍在討論中的文件不會被 TTL 刪掉後又當成新文件插入
 # ==========================================
-def crawl_cdc():
-    print(f"🚀 [CDC] 開始爬取疾管署新聞...")
-    # 這是疾管署的新聞稿列表頁面
-    url = "https://www.cdc.gov.tw/Bulletin/List/MmgtpeidAR5Ooai4-fgHzQ"
-    
-    titles = []
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(resp.text, "lxml")
-        
-        # 抓取列表中的連結 (class 隨時可能變，目前抓 div.content-boxes-v3 > a)
-        # 這裡使用較通用的解法
-        links = soup.select(".content-boxes-v3 a")
-        
-        for link in links[:5]: # 只抓最新的 5 則
-            title = link.get("title", "").strip()
-            href = link.get("href", "")
-            full_url = "https://www.cdc.gov.tw" + href
-            
-            if not title: continue
-
-            # 判斷風險等級
-            risk = "Medium"
-            if any(x in title for x in ["死亡", "重症", "流行", "高峰", "緊急"]):
-                risk = "High"
-            
-            alert_data = {
-                "agency": "CDC",
-                "type": "疫情速訊",
-                "title": title,
-                "url": full_url,
-                "risk_level": risk,
-                "crawled_at": datetime.now(),
-                "date": datetime.now().strftime("%Y-%m-%d") # 暫用當天日期
-            }
-            
-            # 存入 alerts 集合 (注意：不是 raw_articles)
-            db.alerts.update_one({"title": title}, {"$set": alert_data}, upsert=True)
-            titles.append(title)
-            
-        print(f"✅ [CDC] 完成，新增 {len(titles)} 則公告。")
-        
-    except Exception as e:
-        print(f"❌ [CDC] 錯誤: {e}")
-        
-    return titles
+RECRAWL_UNSET = ("expires_at",)
 
-# ==========================================
-# 4. Google News
-# ==========================================
-def crawl_google_news(query="流感 OR 腸病毒 OR 缺藥"):
-    print(f"🚀 [News] 開始爬取 Google News...")
-    rss_url = f"https://news.google.com/rss/search?q={query}&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
-    titles = []
-    try:
-        resp = requests.get(rss_url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(resp.content, "xml")
-        items = soup.find_all("item")
-        for item in items[:10]:
-            title = item.title.text
-            link = item.link.text
-            pub_date = item.pubDate.text
-            
-            # 篩選健康相關新聞
-            if not is_health_related(title):
-                continue
-            
-            article_data = {
-                "source": "GoogleNews",
-                "board": "News",
-                "title": title,
-                "content": title,
-                "url": link,
-                "date": pub_date,
-                "crawled_at": datetime.now(),
-                "status": "new"
-            }
-            db.raw_articles.update_one({"url": link}, {"$set": article_data}, upsert=True)
-            titles.append(title)
-        print(f"✅ [News] 完成，新增 {len(titles)} 則新聞。")
-    except Exception as e:
-        print(f"❌ [News] 錯誤: {e}")
-    return titles
+def save_articles(articles, buffer):
+    """
+    寫入 raw_articles (Dcard 以 title 為 key，其餘以 url 為 key)。
+    交給 buffer 批次寫入；CrawlEngine 的 buffer 帶 on_insert hook (去重計數、熱度、檢索索引、SSE)。
+    """
+    for art in articles:
+        key = {"title": art["title"]} if art["source"] == "Dcard" else {"url": art["url"]}
+        buffer.upsert("raw_articles", key, art, source=art["source"], unset=RECRAWL_UNSET)
+
+
+def save_alerts(alerts, buffer):
+    """寫入 alerts 集合 (注意：不是 raw_articles)，同樣交給 CrawlEngine 的 buffer"""
+    for alert in alerts:
+        buffer.upsert("alerts", {"title": alert["title"]}, alert, source=alert["agency"], unset=RECRAWL_UNSET)
 
 # ==========================================
-# 主入口
+# 主入口 (爬取與寫入都在 services/crawl_engine.py 的 CrawlEngine)
 # ==========================================
 def run_all_crawlers():
-    results = {}
-    results["cdc"] = len(crawl_cdc())
-    results["dcard"] = len(crawl_dcard())
-    results["news"] = len(crawl_google_news())
-    
-    ptt_count = 0
-    for board in PTT_TARGET_BOARDS:
-        ptt_count += len(crawl_ptt(board, 1))
-    results["ptt"] = ptt_count
-    
-    return results
\ No newline at end of file
+    """
+    同時爬取所有來源 (非同步引擎，見 services/crawl_engine.py)。
+    由 BackgroundTasks 放在 threadpool 執行，因此這裡自己開一個 event loop。
+    """
+    from services.crawl_engine import run_all_crawlers_async
+    return asyncio.run(run_all_crawlers_async())
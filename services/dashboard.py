@@ -1,56 +1,122 @@
-from db.mongo import db
-from util.gemini import generate_talking_point
-from datetime import datetime
+import asyncio
+from services.dashboard_queries import (
+    fetch_store_snapshot, fetch_feed, fetch_store_snapshot_async, fetch_feed_async,
+    fetch_stores_snapshot_async,
+)
+from services.talking_points import talking_points, talking_point_key
+from util.gemini import DEFAULT_TALKING_POINT
+from services.suggestions import suggest, demand_lift, SKU_CATEGORY_TERMS
+from services.keywords import keyword_matcher, HEALTH_KEYWORD_CATEGORIES
+from services.topic_heat import combined_trend
+from services.metrics import stage_timer, timed_await
 
 TARGET_DATE = "2025-10-30"
 STORE_ID = "S001"
 
-def get_weekly_dashboard_data():
+# 輿情配額：各平台取最新 5 筆
+TARGET_SOURCES = ["PTT", "Dcard", "GoogleNews"]
+
+# 週報用到的話題熱度：補貨建議 (感冒類關鍵字) 與整體健康討論 (全部分類)
+RESTOCK_HEAT_CATEGORY = "感冒"
+REPORT_HEAT_TERMS = {
+    "keyword": SKU_CATEGORY_TERMS[RESTOCK_HEAT_CATEGORY],
+    "category": list(HEALTH_KEYWORD_CATEGORIES),
+}
+
+def feed_demand_lift(feed):
+    """依最新輿情標題算出各 SKU 分類的需求加成 (所有門市共用)"""
+    return demand_lift(art.get("title") for articles in feed["articles"].values() for art in articles)
+
+def restock_talking_point_prompt(restock_items):
+    """補貨建議話術的 (topic, products, reason)"""
+    return ("流感高峰", [x['name'] for x in restock_items], "庫存告急")
+
+def pregenerate_talking_points(store_id=STORE_ID, date=TARGET_DATE):
+    """背景預先生成週報會用到的話術 (爬蟲跑完後呼叫)"""
+    store, feed = fetch_store_snapshot(store_id, date), fetch_feed(TARGET_SOURCES)
+    restock_items, _ = suggest(store["skus"], feed_demand_lift(feed))
+    if restock_items:
+        talking_points.pregenerate([restock_talking_point_prompt(restock_items)])
+
+def get_weekly_dashboard_data(store_id=STORE_ID, date=TARGET_DATE):
     """
-    處理 Dashboard 所有的資料獲取與計算邏輯
+    處理 Dashboard 所有的資料獲取與計算邏輯 (同步版，給 thread 內的程式使用)
     """
-    
-    # ==========================================
-    # 1. 計算 KPI (從 daily_category_summary 撈取)
-    # ==========================================
-    pipeline_kpi = [
-        {"$match": {"date": TARGET_DATE, "store_id": STORE_ID}},
-        {"$group": {
-            "_id": None,
-            "total_revenue": {"$sum": "$revenue"},
-            "total_gp": {"$sum": "$gross_profit"}
-        }}
-    ]
-    
-    kpi_result = list(db.daily_category_summary.aggregate(pipeline_kpi))
-    
-    if kpi_result:
-        revenue = kpi_result[0]['total_revenue']
-        gp = kpi_result[0]['total_gp']
-        margin = round((gp / revenue) * 100, 1) if revenue > 0 else 0
-    else:
-        revenue = 42296
-        gp = 4148
-        margin = 9.8
+    # 一次撈門市資料 (KPI + SKU 銷售窗口)、一次撈警示與輿情，共 2 次 DB 往返
+    with stage_timer("dashboard", "report"):
+        with stage_timer("dashboard", "kpi"):
+            store = fetch_store_snapshot(store_id, date)
+        with stage_timer("dashboard", "feed"):
+            feed = fetch_feed(TARGET_SOURCES, heat_terms=REPORT_HEAT_TERMS, heat_end_day=date)
 
-    kpi_data = {
-        "coverage_label": "熱門商品覆蓋率",
-        "coverage_value": "85%",
-        "coverage_trend": "較上週 +5%",
-        "coverage_progress": 85,
-        "gross_profit": f"{int(gp):,}",
-        "margin_rate": f"{margin}%",
-        "margin_status": "low" if margin < 15 else "high",
-        "top_category": "保健藥品"
-    }
+        with stage_timer("dashboard", "suggestions"):
+            restock_items, promo_items = suggest(store["skus"], feed_demand_lift(feed))
+        ai_talk = None
+        if restock_items:
+            with stage_timer("dashboard", "llm"):
+                ai_talk = talking_points.generate_sync(*restock_talking_point_prompt(restock_items))
+        return build_weekly_report(date, store, feed, restock_items, promo_items, ai_talk)
 
-    # ==========================================
-    # 2. 取得法規警示
-    # ==========================================
-    alert_cursor = db.alerts.find().sort("crawled_at", -1).limit(5)
+async def get_weekly_dashboard_data_async(store_id=STORE_ID, date=TARGET_DATE):
+    """
+    非同步版：兩個查詢同時送出，等待 DB / Gemini 時不佔用 threadpool
+    """
+    with stage_timer("dashboard", "report"):
+        store, feed = await asyncio.gather(
+            timed_await("dashboard", "kpi", fetch_store_snapshot_async(store_id, date)),
+            timed_await("dashboard", "feed", fetch_feed_async(TARGET_SOURCES, heat_terms=REPORT_HEAT_TERMS, heat_end_day=date)),
+        )
+
+        with stage_timer("dashboard", "suggestions"):
+            restock_items, promo_items = suggest(store["skus"], feed_demand_lift(feed))
+        ai_talk = None
+        if restock_items:
+            ai_talk = await timed_await("dashboard", "llm", talking_points.generate(*restock_talking_point_prompt(restock_items)))
+        return build_weekly_report(date, store, feed, restock_items, promo_items, ai_talk)
+
+async def stream_weekly_reports(store_ids, date=TARGET_DATE):
+    """
+    多門市批次週報：依完成順序逐一產出 (store_id, report, error)
+      - 法規警示與輿情所有門市共用，只查一次、只組一次
+      - KPI 與庫存用 store_id $in 一次查完
+      - 相同的話術 prompt 只呼叫一次 Gemini
+    單一門市失敗時 report 為 None、error 為例外，其他門市照常產出；
+    共用查詢失敗時直接丟出例外 (還沒有任何門市能產出)
+    """
+    stores, feed = await asyncio.gather(
+        timed_await("dashboard", "kpi", fetch_stores_snapshot_async(store_ids, date)),
+        timed_await("dashboard", "feed", fetch_feed_async(TARGET_SOURCES, heat_terms=REPORT_HEAT_TERMS, heat_end_day=date)),
+    )
+    shared = build_shared_sections(feed, date)
+    lift = feed_demand_lift(feed)
+
+    prompts = {}    # talking_point_key -> task
+    async def build_one(store_id):
+        try:
+            store = stores[store_id]
+            with stage_timer("dashboard", "suggestions"):
+                restock_items, promo_items = suggest(store["skus"], lift)
+            ai_talk = None
+            if restock_items:
+                prompt = restock_talking_point_prompt(restock_items)
+                key = talking_point_key(*prompt)
+                if key not in prompts:
+                    prompts[key] = asyncio.ensure_future(timed_await("dashboard", "llm", talking_points.generate(*prompt)))
+                ai_talk = await prompts[key]
+            return store_id, build_weekly_report(date, store, feed, restock_items, promo_items, ai_talk, shared), None
+        except Exception as e:
+            print(f"❌ [Dashboard] 門市 {store_id} 週報失敗: {e}")
+            return store_id, None, e
+
+    for done in asyncio.as_completed([build_one(s) for s in store_ids]):
+        yield await done
+
+@stage_timer("dashboard", "alerts")
+def build_alerts(feed):
+    """法規警示"""
     alerts = []
     
-    for a in alert_cursor:
+    for a in feed["alerts"]:
         alerts.append({
             "agency": a.get("agency", "CDC"),
             "type": a.get("type", "公告"),
@@ -64,101 +130,37 @@ def get_weekly_dashboard_data():
             {"agency": "TFDA", "type": "範例", "title": "特定批號胃藥因包裝瑕疵啟動二級回收 (範例)", "risk_level": "Medium"}
         ]
 
-    # ==========================================
-    # 3. 產生智慧備貨建議
-    # ==========================================
-    low_stock_cursor = db.inventory.find({
-        "date": TARGET_DATE, 
-        "store_id": STORE_ID,
-        "closing_on_hand": {"$lt": 30}
-    }).limit(2)
-
-    high_stock_cursor = db.inventory.find({
-        "date": TARGET_DATE, 
-        "store_id": STORE_ID,
-        "closing_on_hand": {"$gt": 100}
-    }).limit(1)
-    
-    suggestions = []
+    return alerts
 
-    # 3.1 補貨建議
-    restock_items = []
-    for item in low_stock_cursor:
-        sku_name = f"熱銷藥品 ({item['sku_id'][-3:]})"
-        if "保健" in item['sku_id']: sku_name = f"綜合感冒藥 ({item['sku_id'][-3:]})"
-        if "婦嬰" in item['sku_id']: sku_name = f"兒童退燒水 ({item['sku_id'][-3:]})"
-
-        restock_items.append({
-            "sku_id": item["sku_id"],
-            "name": sku_name,
-            "stock": item["closing_on_hand"],
-            "margin": 34.1, 
-            "sales_7d": 14,
-            "status": "Critical"
-        })
-    
-    if restock_items:
-        ai_talk = generate_talking_point("流感高峰", [x['name'] for x in restock_items], "庫存告急")
-        suggestions.append({
-            "topic": "流感與呼吸道感染高峰",
-            "action": "Restock",
-            "related_category": "感冒/退燒",
-            "reason": "輿情熱度上升 150%，且店內庫存低於安全水位。",
-            "items": restock_items,
-            "talking_points": ai_talk
-        })
-
-    # 3.2 促銷建議
-    promo_items = []
-    for item in high_stock_cursor:
-         promo_items.append({
-            "sku_id": item["sku_id"],
-            "name": f"維他命/噴劑 ({item['sku_id'][-3:]})",
-            "stock": item["closing_on_hand"],
-            "margin": 36.0,
-            "sales_7d": 5,
-            "status": "Safe"
-        })
-
-    if promo_items:
-        suggestions.append({
-            "topic": "換季過敏潮",
-            "action": "Promotion",
-            "related_category": "鼻噴劑/維他命",
-            "reason": "網路討論增加，但店內庫存過高，建議做促銷去化。",
-            "items": promo_items,
-            "talking_points": "雖然現在有人問，但庫存偏高。建議搭配維他命 C 做「換季防護組」促銷。"
-        })
-
-    # ==========================================
-    # 4. 輿情 (配額制：各平台取最新 5 筆)
-    # ==========================================
+@stage_timer("dashboard", "insights")
+def build_insights(feed):
+    """輿情 (配額制：各平台取最新 5 筆；跨平台的近似重複標題只列一次，帶提及次數)"""
     insights = []
+    seen_clusters = set()
     
-    # 定義要抓取的來源與數量
-    target_sources = ["PTT", "Dcard", "GoogleNews"]
-    
-    for source in target_sources:
-        # 針對每個來源，依時間排序抓最新的 5 筆
-        cursor = db.raw_articles.find({"source": source}).sort("crawled_at", -1).limit(5)
-        
-        for art in cursor:
+    for source in TARGET_SOURCES:
+        # 各來源已依時間排序取最新的 5 筆 (content 已在 DB 端截斷，同來源的重複標題已合併)
+        for art in feed["articles"][source]:
+            cluster_id = art.get("cluster_id")
+            if cluster_id is not None:
+                if cluster_id in seen_clusters:
+                    continue
+                seen_clusters.add(cluster_id)
             # 標籤邏輯
-            tags = ["熱議"]
             title = art.get("title", "")
-            if "感冒" in title or "流感" in title: tags.append("流感")
-            if "缺" in title: tags.append("缺貨")
-            if "藥" in title: tags.append("用藥諮詢")
-            if "寶寶" in title or "小孩" in title: tags.append("兒童")
+            tags = ["熱議"] + keyword_matcher.match(title).tags
             
             insights.append({
                 "source": art.get("source", "Internet"),
                 "board": art.get("board", "General"),
                 "title": title,
-                "content": art.get("content", "")[:60] + "...", 
+                "content": art.get("content", "") + "...", 
                 "url": art.get("url", "#"),
                 "intent": "Ask" if "?" in title else "Complain",
                 "tags": tags,
+                # 同一話題在各平台被提到的次數 (熱度)
+                "cluster_id": str(cluster_id) if cluster_id is not None else None,
+                "mentions": art.get("mentions", 1),
                 # 雖然現在是分開抓，但加上時間欄位方便前端如果要統一排序
                 "crawled_at": art.get("crawled_at") 
             })
@@ -170,10 +172,99 @@ def get_weekly_dashboard_data():
             {"source": "Dcard", "board": "Health", "title": "(範例) 最近流感是不是很強？", "content": "吞口水像刀割一樣...", "url": "#", "intent": "Ask", "tags": ["流感", "推薦"]}
         ]
 
+    return insights
+
+def build_heat(feed, date):
+    """feed 帶回的熱度日文件 -> 補貨話題與整體討論到週報日期 date 為止的趨勢 (WoW + sparkline)"""
+    docs = feed.get("heat", [])
+    return {
+        "restock": combined_trend([d for d in docs if d["kind"] == "keyword"], date),
+        "overall": combined_trend([d for d in docs if d["kind"] == "category"], date),
+    }
+
+def uses_default_talking_point(report):
+    """話術生成逾時 (或失敗) 時週報帶的是預設話術，快取只能短暫保留"""
+    return any(s.get("talking_points") == DEFAULT_TALKING_POINT for s in report.get("suggestions", []))
+
+def restock_reason(trend):
+    wow = trend["wow"]
+    if wow is None:
+        return "近期輿情持續討論，且店內庫存低於安全水位。"
+    if wow > 0:
+        return f"輿情熱度上升 {wow:g}%，且店內庫存低於安全水位。"
+    return f"輿情熱度較上週 {wow:+g}%，但店內庫存低於安全水位。"
+
+def wow_label(trend):
+    return f"較上週 {trend['wow']:+g}%" if trend["wow"] is not None else "較上週 —"
+
+def build_shared_sections(feed, date):
+    """所有門市共用的區塊 (法規警示、輿情、話題熱度)，多門市批次時只算一次"""
+    return {"alerts": build_alerts(feed), "insights": build_insights(feed), "heat": build_heat(feed, date)}
+
+def build_weekly_report(date, store, feed, restock_items, promo_items, ai_talk, shared=None):
+    """
+    依查詢結果組出週報 (純計算，不碰 DB)
+    shared: build_shared_sections(feed, date) 的結果，未提供時現場計算
+    """
+    shared = shared if shared is not None else build_shared_sections(feed, date)
+    # ==========================================
+    # 1. KPI (kpi_rollups 的週彙總)
+    # ==========================================
+    kpi_result = store["kpi"]
+    
+    if kpi_result:
+        gp = kpi_result['gross_profit']
+        margin = kpi_result['margin']
+        top_category = kpi_result.get('top_category') or "保健藥品"
+    else:
+        gp = 4148
+        margin = 9.8
+        top_category = "保健藥品"
+
+    kpi_data = {
+        "coverage_label": "熱門商品覆蓋率",
+        "coverage_value": "85%",
+        # 整體健康話題討論量的週對週變化 (topic_heat)
+        "coverage_trend": wow_label(shared["heat"]["overall"]),
+        "coverage_progress": 85,
+        "gross_profit": f"{int(gp):,}",
+        "margin_rate": f"{margin}%",
+        "margin_status": "low" if margin < 15 else "high",
+        "top_category": top_category
+    }
+
+    # ==========================================
+    # 2. 產生智慧備貨建議 (法規警示、輿情見 build_shared_sections)
+    # ==========================================
+    suggestions = []
+
+    # 2.1 補貨建議
+    if restock_items:
+        suggestions.append({
+            "topic": "流感與呼吸道感染高峰",
+            "action": "Restock",
+            "related_category": "感冒/退燒",
+            "reason": restock_reason(shared["heat"]["restock"]),
+            "heat": shared["heat"]["restock"],
+            "items": restock_items,
+            "talking_points": ai_talk
+        })
+
+    # 2.2 促銷建議
+    if promo_items:
+        suggestions.append({
+            "topic": "換季過敏潮",
+            "action": "Promotion",
+            "related_category": "鼻噴劑/維他命",
+            "reason": "網路討論增加，但店內庫存過高，建議做促銷去化。",
+            "items": promo_items,
+            "talking_points": "雖然現在有人問，但庫存偏高。建議搭配維他命 C 做「換季防護組」促銷。"
+        })
+
     return {
-        "report_date": TARGET_DATE,
+        "report_date": date,
         "kpiData": kpi_data,
-        "alerts": alerts,
+        "alerts": shared["alerts"],
         "suggestions": suggestions,
-        "insights": insights
+        "insights": shared["insights"]
     }
\ No newline at end of file
@@ -0,0 +1,350 @@
+import base64
+from datetime import date as date_type, datetime, timedelta
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+from db.mongo import db, get_async_db
+from services.kpi_rollups import (
+    ROLLUP_COLLECTION, KPI_PROJECTION, week_dates, weekly_rollup_id, fetch_live_kpis, fetch_live_kpis_async,
+)
+from services.topic_heat import HEAT_COLLECTION, heat_stages
+
+# ==========================================
+# Dashboard 查詢層：把原本 7+ 次的 DB 往返合併成固定 2 次
+#   1. fetch_store_snapshot：週 KPI (kpi_rollups 一份文件) + 全部 SKU 的庫存與銷售窗口 (一次 aggregate)
+#   2. fetch_feed：法規警示 + 各來源最新 N 篇輿情 (一次 aggregate；近似重複的標題合併，帶提及次數)
+#      + 話題熱度日文件 (heat_terms，近 14 天，趨勢在 App 端由 topic_heat 計算)
+#   多門市批次版 (fetch_stores_snapshot*) 用 store_id $in 一次撈所有門市，不是每間各查一次。
+#   3. fetch_insights_page：輿情列表的分頁 (GET /api/dashboard/insights)，見下方「輿情分頁」
+#
+# 用 $unionWith 把多個子查詢接在同一個 pipeline，再以 _section 欄位 (或最後的 $facet) 分組。
+# 每個子查詢都各自 $match + $sort + $limit，仍可走索引；
+# 新增來源只會多一段 $unionWith，不會多一次往返。
+#
+# 每個查詢都有同步 (pymongo) 與非同步 (AsyncMongoClient) 版本，共用同一份 pipeline。
+# ==========================================
+SALES_WINDOW_DAYS = 7
+CONTENT_PREVIEW_LENGTH = 60
+
+ARTICLE_PROJECTION = {
+    "_id": 0,
+    "source": 1,
+    "board": 1,
+    "title": 1,
+    "url": 1,
+    "crawled_at": 1,
+    "cluster_id": 1,
+    "mentions": {"$ifNull": [{"$first": "$cluster.mentions"}, 1]},
+    # 只取前 60 字，不把整篇內文傳回來
+    "content": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, CONTENT_PREVIEW_LENGTH]},
+}
+
+# 每個來源先多取幾篇，同一群組 (cluster_id) 只留最新一篇後再取前 N 篇
+FEED_OVERFETCH = 4
+
+ALERT_PROJECTION = {"_id": 0, "agency": 1, "type": 1, "title": 1, "risk_level": 1}
+
+
+def _tagged(pipeline, section):
+    return pipeline + [{"$set": {"_section": section}}]
+
+
+def window_dates(date, days=SALES_WINDOW_DAYS):
+    """date 往前 days 天 (含當天)"""
+    day = date_type.fromisoformat(date)
+    return [(day - timedelta(days=i)).isoformat() for i in range(days)]
+
+
+SKU_COLUMNS = ("sku_id", "name", "category", "on_hand", "sold", "unit_price", "unit_cost")
+
+
+def sku_window_stages(store_ids, date, window_days=SALES_WINDOW_DAYS):
+    """
+    在 inventory 上執行：每個門市一份「欄位式」文件 {store_id, sku_id: [...], on_hand: [...], ...}，
+    第 i 個元素是第 i 個 SKU 最新一天的庫存 / 售價 / 成本與窗口內的銷售量加總。
+    欄位式回傳讓建議引擎可直接轉成 NumPy 陣列 (見 services/suggestions.py)，不必逐筆處理 dict。
+    缺少的數值以 0 表示 (售價 / 成本為 0 視為無資料)。
+    """
+    return [
+        {"$match": {"date": {"$in": window_dates(date, window_days)}, "store_id": {"$in": list(store_ids)}}},
+        {"$group": {
+            "_id": {"store_id": "$store_id", "sku_id": "$sku_id"},
+            "latest": {"$top": {"sortBy": {"date": -1}, "output": {
+                "on_hand": "$closing_on_hand", "unit_price": "$unit_price", "unit_cost": "$unit_cost",
+                "name": "$name", "category": "$category",
+            }}},
+            "sold": {"$sum": {"$ifNull": ["$sold_qty", 0]}},
+        }},
+        {"$group": {
+            "_id": "$_id.store_id",
+            "sku_id": {"$push": "$_id.sku_id"},
+            "name": {"$push": {"$ifNull": ["$latest.name", ""]}},
+            "category": {"$push": {"$ifNull": ["$latest.category", ""]}},
+            "on_hand": {"$push": {"$ifNull": ["$latest.on_hand", 0]}},
+            "sold": {"$push": "$sold"},
+            "unit_price": {"$push": {"$ifNull": ["$latest.unit_price", 0]}},
+            "unit_cost": {"$push": {"$ifNull": ["$latest.unit_cost", 0]}},
+        }},
+        {"$set": {"store_id": "$_id"}},
+        {"$unset": "_id"},
+    ]
+
+
+def empty_sku_columns():
+    return {column: [] for column in SKU_COLUMNS}
+
+
+def store_snapshot_pipeline(store_ids, date, window_days=SALES_WINDOW_DAYS):
+    """
+    在 kpi_rollups 上執行：各門市 date 所在 ISO 週的 KPI 彙總 + 全部 SKU 的銷售窗口。
+    每個門市一份文件 (KPI 與 SKU 欄位各一)，不用 $facet 把所有門市包成單一文件 (16MB 上限)。
+    """
+    store_ids = list(store_ids)
+    return _tagged([
+        {"$match": {"_id": {"$in": [weekly_rollup_id(s, date) for s in store_ids]}}},
+        {"$project": {**KPI_PROJECTION, "store_id": 1}},
+    ], "kpi") + [
+        {"$unionWith": {"coll": "inventory", "pipeline": _tagged(sku_window_stages(store_ids, date, window_days), "sku")}},
+    ]
+
+
+class _StoreSnapshotShaper:
+    """逐筆接收 store_snapshot_pipeline 的結果，依門市分組"""
+
+    def __init__(self, store_ids):
+        self.stores = {s: {"kpi": None, "skus": empty_sku_columns()} for s in store_ids}
+
+    def add(self, doc):
+        section = doc.pop("_section")
+        store = self.stores.get(doc.pop("store_id"))
+        if store is None:
+            return
+        store["kpi" if section == "kpi" else "skus"] = doc
+
+    def missing_kpi(self):
+        return [s for s, store in self.stores.items() if store["kpi"] is None]
+
+    def fill_kpi(self, kpis):
+        for s, kpi in kpis.items():
+            self.stores[s]["kpi"] = kpi
+
+
+def feed_pipeline(sources, per_source=5, alert_limit=5, heat_terms=None, heat_end_day=None):
+    """
+    在 alerts 上執行：最新警示 + 各來源最新 N 篇輿情
+    heat_terms: {kind: [term, ...]}，一併讀回這些話題到 heat_end_day (預設今天) 為止的熱度日文件
+    """
+    pipeline = _tagged([
+        {"$sort": {"crawled_at": -1}},
+        {"$limit": alert_limit},
+        {"$project": ALERT_PROJECTION},
+    ], "alerts")
+    for source in sources:
+        pipeline.append({"$unionWith": {"coll": "raw_articles", "pipeline": _tagged([
+            {"$match": {"source": source}},
+            {"$sort": {"crawled_at": -1}},
+            {"$limit": per_source * FEED_OVERFETCH},
+            # 近似重複的標題只留最新一篇 (舊資料沒有 cluster_id 時以自己的 _id 為一群)
+            {"$group": {"_id": {"$ifNull": ["$cluster_id", "$_id"]}, "doc": {"$first": "$$ROOT"}}},
+            {"$replaceWith": "$doc"},
+            {"$sort": {"crawled_at": -1}},
+            {"$limit": per_source},
+            {"$lookup": {"from": "title_clusters", "localField": "cluster_id", "foreignField": "_id",
+                         "pipeline": [{"$project": {"_id": 0, "mentions": 1}}], "as": "cluster"}},
+            {"$project": ARTICLE_PROJECTION},
+        ], source)}})
+    heat_end_day = heat_end_day or date_type.today().isoformat()
+    for kind, terms in (heat_terms or {}).items():
+        pipeline.append({"$unionWith": {"coll": HEAT_COLLECTION, "pipeline": _tagged(heat_stages(kind, terms, heat_end_day), "heat")}})
+    pipeline.append({"$facet": {
+        section: [{"$match": {"_section": section}}, {"$unset": "_section"}]
+        for section in ["alerts", *sources, "heat"]
+    }})
+    return pipeline
+
+
+def _shape_feed(result, sources):
+    return {
+        "alerts": result.get("alerts", []),
+        "articles": {source: result.get(source, []) for source in sources},
+        "heat": result.get("heat", []),
+    }
+
+
+def fetch_stores_snapshot(store_ids, date, window_days=SALES_WINDOW_DAYS, database=None):
+    """
+    多門市的週 KPI 與 SKU 銷售窗口。
+    回傳 {store_id: {"kpi": {"key", "revenue", "gross_profit", "margin", "top_category"} 或 None,
+                     "skus": {"sku_id": [...], "on_hand": [...], ...} (欄位見 SKU_COLUMNS)}}
+    還沒有週彙總的門市才退回即時加總 (多一次往返)。
+    """
+    database = database if database is not None else db
+    shaper = _StoreSnapshotShaper(store_ids)
+    for doc in database[ROLLUP_COLLECTION].aggregate(store_snapshot_pipeline(store_ids, date, window_days)):
+        shaper.add(doc)
+    if shaper.missing_kpi():
+        shaper.fill_kpi(fetch_live_kpis(shaper.missing_kpi(), date, database))
+    return shaper.stores
+
+
+def fetch_store_snapshot(store_id, date, window_days=SALES_WINDOW_DAYS, database=None):
+    """單一門市的 fetch_stores_snapshot"""
+    return fetch_stores_snapshot([store_id], date, window_days, database)[store_id]
+
+
+def fetch_feed(sources, per_source=5, alert_limit=5, heat_terms=None, heat_end_day=None, database=None):
+    """
+    法規警示與各來源最新輿情。
+    回傳 {"alerts": [...], "articles": {source: [...]}, "heat": [熱度日文件]} (各來源依 crawled_at 新到舊)
+    """
+    database = database if database is not None else db
+    pipeline = feed_pipeline(sources, per_source, alert_limit, heat_terms, heat_end_day)
+    return _shape_feed(next(database.alerts.aggregate(pipeline), {}), sources)
+
+
+async def fetch_feed_async(sources, per_source=5, alert_limit=5, heat_terms=None, heat_end_day=None, database=None):
+    database = database if database is not None else get_async_db()
+    pipeline = feed_pipeline(sources, per_source, alert_limit, heat_terms, heat_end_day)
+    cursor = await database.alerts.aggregate(pipeline)
+    return _shape_feed(await anext(cursor, {}), sources)
+
+
+async def fetch_stores_snapshot_async(store_ids, date, window_days=SALES_WINDOW_DAYS, database=None):
+    database = database if database is not None else get_async_db()
+    shaper = _StoreSnapshotShaper(store_ids)
+    cursor = await database[ROLLUP_COLLECTION].aggregate(store_snapshot_pipeline(store_ids, date, window_days))
+    async for doc in cursor:
+        shaper.add(doc)
+    if shaper.missing_kpi():
+        shaper.fill_kpi(await fetch_live_kpis_async(shaper.missing_kpi(), date, database))
+    return shaper.stores
+
+
+async def fetch_store_snapshot_async(store_id, date, window_days=SALES_WINDOW_DAYS, database=None):
+    return (await fetch_stores_snapshot_async([store_id], date, window_days, database))[store_id]
+
+
+# ==========================================
+# 週報的資料版本 (services/report_cache 用來判斷快照是否過時)
+#   inventory 與 daily_category_summary 由 ERP 在 App 之外寫入，App 收不到寫入通知，
+#   因此以「門市該週相關資料列中最大的 _id」當版本：ObjectId 內含寫入時間，新匯入的資料列一定更大。
+#   兩個集合用 $unionWith 接在一起，一次往返；原地修改既有資料列 (_id 不變) 一樣偵測不到，
+#   需呼叫 POST /api/dashboard/cache/invalidate (與 kpi_rollups 的限制相同)。
+# ==========================================
+def data_version_pipeline(store_id, date, window_days=SALES_WINDOW_DAYS):
+    """在 inventory 上執行：銷售窗口的庫存列 + 該週 summary 列中最大的 _id"""
+    latest = [{"$sort": {"_id": -1}}, {"$limit": 1}, {"$project": {"_id": 1}}]
+    return [
+        {"$match": {"date": {"$in": window_dates(date, window_days)}, "store_id": store_id}},
+        *latest,
+        {"$unionWith": {"coll": "daily_category_summary", "pipeline": [
+            {"$match": {"date": {"$in": week_dates(date)}, "store_id": store_id}},
+            *latest,
+        ]}},
+        {"$group": {"_id": None, "version": {"$max": "$_id"}}},
+    ]
+
+
+def fetch_data_version(store_id, date, database=None):
+    """門市 / 日期的資料版本；沒有任何資料列時為 None"""
+    database = database if database is not None else db
+    doc = next(database.inventory.aggregate(data_version_pipeline(store_id, date)), None)
+    return doc["version"] if doc else None
+
+
+async def fetch_data_version_async(store_id, date, database=None):
+    database = database if database is not None else get_async_db()
+    cursor = await database.inventory.aggregate(data_version_pipeline(store_id, date))
+    doc = await anext(cursor, None)
+    return doc["version"] if doc else None
+
+
+# ==========================================
+# 輿情分頁 (GET /api/dashboard/insights)
+#   依 (crawled_at, _id) 由新到舊排序的 keyset 分頁：cursor 記上一頁最後一篇的 (crawled_at, _id)，
+#   下一頁只取排在它之後的文件，走 crawled_at_id / source_crawled_at_id 索引，
+#   翻到第幾頁都只讀 limit + 1 篇 (不用 skip，也不會因新文章寫入而重複或漏掉)。
+#   投影在 DB 端完成：只回傳列表需要的欄位，內文只取前 CONTENT_PREVIEW_LENGTH 字。
+# ==========================================
+INSIGHTS_SORT = [("crawled_at", DESCENDING), ("_id", DESCENDING)]
+
+INSIGHTS_PROJECTION = {
+    "source": 1,
+    "board": 1,
+    "title": 1,
+    "url": 1,
+    "crawled_at": 1,
+    "cluster_id": 1,
+    "keywords": 1,
+    "content": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, CONTENT_PREVIEW_LENGTH]},
+}
+
+
+def encode_insights_cursor(doc):
+    raw = f"{doc['crawled_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_insights_cursor(cursor):
+    """回傳 (crawled_at, _id)；無效的 cursor 丟 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        crawled_at, oid = raw.split("|")
+        return datetime.fromisoformat(crawled_at), ObjectId(oid)
+    except Exception as e:
+        raise ValueError(f"無效的 cursor: {cursor}") from e
+
+
+def insights_filter(sources=None, cursor=None):
+    """
+    外層的 crawled_at <= c 讓查詢成為索引上的範圍掃描，
+    $or 只排除同一時間點、_id 不比 cursor 小的文件 (兩個欄位都在索引裡，不必讀文件本身)
+    沒有 crawled_at 的舊資料無法產生 cursor，一律排除 ($type 同樣是索引範圍，不必讀文件)
+    """
+    query = {"crawled_at": {"$type": "date"}}
+    if sources:
+        query["source"] = {"$in": list(sources)}
+    if cursor:
+        crawled_at, oid = decode_insights_cursor(cursor)
+        query["crawled_at"]["$lte"] = crawled_at
+        query["$or"] = [{"crawled_at": {"$lt": crawled_at}}, {"_id": {"$lt": oid}}]
+    return query
+
+
+def _shape_insights_page(docs, limit):
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    items = []
+    for doc in docs:
+        cluster_id = doc.get("cluster_id")
+        items.append({
+            "id": str(doc["_id"]),
+            "source": doc.get("source"),
+            "board": doc.get("board"),
+            "title": doc.get("title", ""),
+            "content": doc.get("content", ""),
+            "url": doc.get("url"),
+            "crawled_at": doc.get("crawled_at"),
+            "cluster_id": str(cluster_id) if cluster_id is not None else None,
+            "keywords": doc.get("keywords") or [],
+        })
+    return {"items": items, "next_cursor": encode_insights_cursor(docs[-1]) if has_more else None}
+
+
+def fetch_insights_page(sources=None, cursor=None, limit=50, database=None):
+    """
+    輿情列表的一頁，依 crawled_at 新到舊。
+    回傳 {"items": [...], "next_cursor": str | None}；next_cursor 為 None 時已經沒有下一頁
+    """
+    database = database if database is not None else db
+    found = (database.raw_articles.find(insights_filter(sources, cursor), INSIGHTS_PROJECTION)
+             .sort(INSIGHTS_SORT).limit(limit + 1))
+    return _shape_insights_page(list(found), limit)
+
+
+async def fetch_insights_page_async(sources=None, cursor=None, limit=50, database=None):
+    database = database if database is not None else get_async_db()
+    found = (database.raw_articles.find(insights_filter(sources, cursor), INSIGHTS_PROJECTION)
+             .sort(INSIGHTS_SORT).limit(limit + 1))
+    return _shape_insights_page([doc async for doc in found], limit)
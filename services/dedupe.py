@@ -0,0 +1,205 @@
+import re
+import threading
+import unicodedata
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from db.mongo import db
+
+# ==========================================
+# 跨來源近似重複偵測 (MinHash + LSH)
+#   同一則新聞會以些微不同的標題出現在 Google News、PTT、Dcard。
+#   標題正規化 (去掉 [問卦]、Re:、「 - 媒體名」、標點空白) 後取字元 2-gram，
+#   算 128 個 MinHash，切成 32 個 band (每個 4 列) 放進 LSH bucket：
+#   查詢只比對落在同一 bucket 的群組，不必和全部標題逐一比較。
+#   估計的 Jaccard 相似度 >= DUPLICATE_THRESHOLD 就歸到同一群 (cluster_id)。
+#
+# 群組存在 title_clusters 集合 (簽章、代表標題、提及次數、來源)，
+# App 啟動時載入最近 INDEX_WINDOW_DAYS 天的群組重建 bucket (warm load)。
+# 注意：索引在各 process 的記憶體內，不同 worker 同時看到同一則新故事時可能各自建立群組。
+# ==========================================
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+DUPLICATE_THRESHOLD = 0.5
+INDEX_WINDOW_DAYS = 7
+NGRAM = 2
+
+# 排列 h(x) = ((a*x + b) mod p) & 0xFFFFFFFF；a、b 取自 [1, p)，乘法在 uint64 上溢位截斷
+# (a 太小時 a*x+b < p，h 會和 x 同序，所有排列都挑到同一個最小值)
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(20251030)
+_A = _rng.randint(1, (1 << 61) - 1, NUM_PERM, dtype=np.int64).astype(np.uint64)
+_B = _rng.randint(1, (1 << 61) - 1, NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+TITLE_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd)\s*[:：]\s*)*(?:\[[^\]]{1,8}\]|【[^】]{1,8}】)?\s*", re.IGNORECASE)
+NEWS_SUFFIX = re.compile(r"\s+[-－|｜]\s+[^-－|｜]{1,20}$")   # Google News 標題結尾的「 - 媒體名稱」
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    text = unicodedata.normalize("NFKC", title or "").lower()
+    text = TITLE_PREFIX.sub("", text)
+    text = NEWS_SUFFIX.sub("", text)
+    return NON_WORD.sub("", text)
+
+
+def shingles(text, n=NGRAM):
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def minhash(grams):
+    """MinHash 簽章：每個排列 (a*x + b) mod p 取最小值，一次用 NumPy 算完"""
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), np.uint64, len(grams))
+    with np.errstate(over="ignore"):
+        return (((np.outer(hashes, _A) + _B) % _PRIME) & _MAX_HASH).min(axis=0)
+
+
+def similarity(sig_a, sig_b):
+    """估計的 Jaccard 相似度 = 簽章相同位置的比例"""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def band_keys(signature):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+class Cluster:
+    def __init__(self, _id, signature, title, mentions=0, sources=(), last_seen=None):
+        self.id = _id
+        self.signature = signature
+        self.title = title
+        self.mentions = mentions
+        self.sources = set(sources)
+        self.last_seen = last_seen or datetime.now()
+
+
+class TitleIndex:
+    """
+    assign(articles)：幫每篇文章找到 (或新建) 群組並寫入 article["cluster_id"]
+    count_inserted(docs)：實際新插入 raw_articles 的文章才累加提及次數 (重爬同一篇不會重複計算)
+    save()：把有變動的群組寫回 title_clusters
+    """
+
+    def __init__(self, database=None, persist=True, threshold=DUPLICATE_THRESHOLD, window_days=INDEX_WINDOW_DAYS):
+        self.collection = (database if database is not None else db)["title_clusters"] if persist else None
+        self.threshold = threshold
+        self.window_days = window_days
+        self.loaded = False
+        self._clusters = {}     # cluster_id -> Cluster
+        self._buckets = {}      # (band, bytes) -> {cluster_id}
+        self._dirty = set()
+        self._increments = {}   # cluster_id -> 尚未寫回的提及次數
+        self._lock = threading.Lock()
+
+    # ------------------------------------------
+    # 載入 / 寫回
+    # ------------------------------------------
+    def load(self):
+        """warm load：最近 window_days 天有出現過的群組"""
+        with self._lock:
+            self._load()
+        print(f"✅ [Dedupe] 載入 {len(self._clusters)} 個標題群組")
+
+    def ensure_loaded(self):
+        # 啟動時的 warm load 可能還在跑：拿到 lock 後再判斷，不會重複載入
+        with self._lock:
+            if self.loaded:
+                return
+            self._load()
+
+    def _load(self):
+        self._clusters.clear()
+        self._buckets.clear()
+        if self.collection is not None:
+            since = datetime.now() - timedelta(days=self.window_days)
+            for doc in self.collection.find({"last_seen": {"$gte": since}}):
+                self._add(Cluster(doc["_id"], np.asarray(doc["signature"], dtype=np.uint64), doc["title"],
+                                  doc.get("mentions", 0), doc.get("sources", []), doc["last_seen"]))
+        self.loaded = True
+
+    def save(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            increments, self._increments = self._increments, {}
+            ops = []
+            for cluster_id in dirty | set(increments):
+                cluster = self._clusters.get(cluster_id)
+                if cluster is None:
+                    continue
+                update = {
+                    "$set": {"signature": [int(x) for x in cluster.signature], "title": cluster.title,
+                             "last_seen": cluster.last_seen},
+                    "$setOnInsert": {"first_seen": cluster.last_seen},
+                    "$addToSet": {"sources": {"$each": sorted(cluster.sources)}},
+                }
+                if increments.get(cluster_id):
+                    update["$inc"] = {"mentions": increments[cluster_id]}
+                ops.append(UpdateOne({"_id": cluster_id}, update, upsert=True))
+            self._evict_expired()
+        if self.collection is not None and ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    def _evict_expired(self):
+        cutoff = datetime.now() - timedelta(days=self.window_days)
+        for cluster in [c for c in self._clusters.values() if c.last_seen < cutoff]:
+            for key in band_keys(cluster.signature):
+                self._buckets.get(key, set()).discard(cluster.id)
+            del self._clusters[cluster.id]
+
+    # ------------------------------------------
+    # 查詢 / 指派
+    # ------------------------------------------
+    def _add(self, cluster):
+        self._clusters[cluster.id] = cluster
+        for key in band_keys(cluster.signature):
+            self._buckets.setdefault(key, set()).add(cluster.id)
+
+    def _find(self, signature):
+        candidates = set()
+        for key in band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_score = None, self.threshold
+        for cluster_id in candidates:
+            score = similarity(signature, self._clusters[cluster_id].signature)
+            if score >= best_score:
+                best, best_score = self._clusters[cluster_id], score
+        return best
+
+    def assign(self, articles):
+        now = datetime.now()
+        with self._lock:
+            for article in articles:
+                grams = shingles(normalize_title(article.get("title")))
+                if not grams:
+                    continue
+                signature = minhash(grams)
+                cluster = self._find(signature)
+                if cluster is None:
+                    cluster = Cluster(ObjectId(), signature, article["title"])
+                    self._add(cluster)
+                cluster.sources.add(article.get("source", "unknown"))
+                cluster.last_seen = now
+                self._dirty.add(cluster.id)
+                article["cluster_id"] = cluster.id
+
+    def count_inserted(self, docs):
+        with self._lock:
+            for doc in docs:
+                cluster = self._clusters.get(doc.get("cluster_id"))
+                if cluster is not None:
+                    cluster.mentions += 1
+                    self._increments[cluster.id] = self._increments.get(cluster.id, 0) + 1
+
+    def __len__(self):
+        return len(self._clusters)
+
+
+title_index = TitleIndex()
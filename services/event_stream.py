@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure, PyMongoError
+
+from db.mongo import get_async_db
+from services.dashboard_queries import CONTENT_PREVIEW_LENGTH
+from services.keywords import keyword_matcher
+from util.config import env
+
+# ==========================================
+# 即時事件推播 (SSE /api/dashboard/stream 的後端)
+#   來源 (二選一，啟動時自動判斷)：
+#     1. Mongo change stream：監看 raw_articles / alerts 的 insert，跨 worker、跨 process 都收得到
+#     2. 不支援 change stream (單機 mongod、權限不足) 時，改由爬蟲寫入時 (BulkWriteBuffer.on_insert)
+#        直接 publish，只有同一個 process 的連線收得到
+#
+#   每個事件只序列化一次，所有連線共用同一份 bytes；
+#   每個連線一個有上限的 queue，塞滿 (前端消化太慢) 就直接斷線，
+#   EventSource 會自動重連並帶 Last-Event-ID，從最近的事件緩衝補發。
+# ==========================================
+SUBSCRIBER_QUEUE_SIZE = 100
+REPLAY_BUFFER_SIZE = 256
+MAX_SUBSCRIBERS = 2000
+WATCHED_COLLECTIONS = ("raw_articles", "alerts")
+CHANGE_STREAM_RETRY_SECONDS = 30
+
+
+def article_event(doc):
+    title = doc.get("title", "")
+    return {
+        "source": doc.get("source", "Internet"),
+        "board": doc.get("board", "General"),
+        "title": title,
+        "content": (doc.get("content") or "")[:CONTENT_PREVIEW_LENGTH],
+        "url": doc.get("url", "#"),
+        "tags": ["熱議"] + keyword_matcher.match(title).tags,
+        "crawled_at": doc.get("crawled_at"),
+    }
+
+
+def alert_event(doc):
+    return {
+        "agency": doc.get("agency", "CDC"),
+        "type": doc.get("type", "公告"),
+        "title": doc.get("title", "無標題"),
+        "risk_level": doc.get("risk_level", "Medium"),
+        "url": doc.get("url"),
+        "crawled_at": doc.get("crawled_at"),
+    }
+
+
+EVENT_BUILDERS = {"raw_articles": ("insight", article_event), "alerts": ("alert", alert_event)}
+
+
+class Subscriber:
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+
+class EventHub:
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, replay_size=REPLAY_BUFFER_SIZE,
+                 max_subscribers=MAX_SUBSCRIBERS, use_change_stream=None):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.use_change_stream = env.STREAM_CHANGE_STREAMS if use_change_stream is None else use_change_stream
+        self.mode = "local"     # "change_stream" 啟用成功後切換，爬蟲端就不再重複 publish
+        self.stats = {"published": 0, "dropped_subscribers": 0}
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)   # (id, bytes)
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._task = None
+
+    # ------------------------------------------
+    # 生命週期 (由 FastAPI lifespan 呼叫)
+    # ------------------------------------------
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.use_change_stream and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for sub in list(self._subscribers):
+            self._drop(sub)
+        self._loop = None
+
+    # ------------------------------------------
+    # 訂閱
+    # ------------------------------------------
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id=None):
+        """
+        新增連線；帶 last_event_id 時先補發緩衝內更新的事件。
+        連線數已達上限時回傳 None
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        sub = Subscriber(self.queue_size)
+        if last_event_id is not None:
+            for event_id, payload in self._recent:
+                if event_id > last_event_id and not sub.queue.full():
+                    sub.queue.put_nowait(payload)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+    def _drop(self, sub):
+        """慢速連線：清空 queue 並放入結束標記，讓 SSE 產生器結束 (前端會自動重連)"""
+        sub.dropped = True
+        self._subscribers.discard(sub)
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    # ------------------------------------------
+    # 發布
+    # ------------------------------------------
+    def _fanout(self, event_type, data):
+        event_id = next(self._ids)
+        body = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+        payload = f"id: {event_id}\nevent: {event_type}\ndata: {body}\n\n".encode("utf-8")
+        self._recent.append((event_id, payload))
+        self.stats["published"] += 1
+        for sub in list(self._subscribers):
+            try:
+                sub.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.stats["dropped_subscribers"] += 1
+                self._drop(sub)
+
+    def publish(self, collection, doc):
+        """在 hub 的 event loop 上呼叫"""
+        if collection in EVENT_BUILDERS:
+            event_type, build = EVENT_BUILDERS[collection]
+            self._fanout(event_type, build(doc))
+
+    def publish_inserted(self, collection, docs):
+        """
+        BulkWriteBuffer.on_insert 的 callback (爬蟲 thread 呼叫)。
+        hub 未啟動 (例如 CLI 執行爬蟲) 或已由 change stream 提供事件時不動作。
+        """
+        loop = self._loop
+        if loop is None or self.mode == "change_stream" or collection not in EVENT_BUILDERS:
+            return
+        for doc in docs:
+            loop.call_soon_threadsafe(self.publish, collection, doc)
+
+    # ------------------------------------------
+    # Mongo change stream
+    # ------------------------------------------
+    async def _watch(self):
+        pipeline = [{"$match": {
+            "operationType": "insert",
+            "ns.coll": {"$in": list(WATCHED_COLLECTIONS)},
+        }}]
+        while True:
+            try:
+                async with await get_async_db().watch(pipeline) as stream:
+                    self.mode = "change_stream"
+                    print("📡 [Stream] 使用 Mongo change stream")
+                    async for change in stream:
+                        self.publish(change["ns"]["coll"], change["fullDocument"])
+            except OperationFailure as e:
+                # 不支援 change stream (非 replica set / 權限不足)：改用爬蟲端 publish
+                self.mode = "local"
+                print(f"⚠️ [Stream] 無法使用 change stream，改用 process 內推播: {e}")
+                return
+            except PyMongoError as e:
+                self.mode = "local"
+                print(f"⚠️ [Stream] change stream 中斷，{CHANGE_STREAM_RETRY_SECONDS} 秒後重試: {e}")
+                await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+
+event_hub = EventHub()
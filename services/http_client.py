@@ -0,0 +1,238 @@
+import asyncio
+import importlib.util
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from util.config import env
+
+# ==========================================
+# 爬蟲共用 HTTP client (同步 HttpClient / 非同步 AsyncHttpClient)
+#   - 連線池：httpx 依 origin (scheme + host + port) 保留 keep-alive 連線，同一個 host 的分頁、文章共用
+#   - HTTP/2：CRAWL_HTTP2=true 且有安裝 h2 時啟用 (同一條連線多工，不再為並行請求多開連線)
+#   - 壓縮：httpx 依已安裝的解碼器自動送 Accept-Encoding (gzip / deflate，裝了 brotli 再加 br)
+#   - 重試：429 / 5xx 與連線錯誤最多重試 max_retries 次，指數退避 + jitter，尊重 Retry-After
+#   - 計時：透過 httpcore 的 trace 事件拆出 connect (含 DNS 解析，httpcore 沒有分開) / TLS /
+#           等待回應 (送出請求到收到 header) / 傳輸 (讀 body)，依 host 累計到 stats
+#
+# stats 範例：
+#   {"requests": 12, "retries": 1, "errors": 0, "connections": 2, "wire_bytes": 8123, "bytes": 30211,
+#    "status": {200: 11, 503: 1}, "ms": {"connect": 3.1, "tls": 0.0, "wait": 612.4, "transfer": 4.2},
+#    "hosts": {"www.ptt.cc": {...同上，不含 hosts}}}
+# ==========================================
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+PHASES = ("connect", "tls", "wait", "transfer")
+
+# trace 事件 (去掉 http11. / http2. 前綴) -> (階段, 開始 / 結束)
+TRACE_PHASES = {
+    "connect_tcp.started": ("connect", 0), "connect_tcp.complete": ("connect", 1),
+    "start_tls.started": ("tls", 0), "start_tls.complete": ("tls", 1),
+    "send_request_headers.started": ("wait", 0), "receive_response_headers.complete": ("wait", 1),
+    "receive_response_body.started": ("transfer", 0), "receive_response_body.complete": ("transfer", 1),
+}
+
+
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=None, backoff=None, max_backoff=8.0, statuses=RETRY_STATUSES):
+        self.max_retries = env.CRAWL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = env.CRAWL_RETRY_BACKOFF if backoff is None else backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def delay(self, attempt, response=None):
+        """第 attempt 次重試前要等幾秒：Retry-After 優先，否則 backoff x 2^attempt (+/- 25% jitter)"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                try:
+                    seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    seconds = 0
+            return min(max(seconds, 0), self.max_backoff)
+        base = self.backoff * (2 ** attempt)
+        return min(base * random.uniform(0.75, 1.25), self.max_backoff)
+
+
+class RequestTiming:
+    """收集單一請求的 trace 事件，換算成各階段耗時 (ms)"""
+
+    def __init__(self):
+        self.marks = {}
+        self.connections = 0
+
+    def event(self, name):
+        name = name.split(".", 1)[-1]   # 去掉 connection. / http11. / http2. 前綴
+        if name == "connect_tcp.complete":
+            self.connections += 1
+        if name in TRACE_PHASES:
+            self.marks[TRACE_PHASES[name]] = time.perf_counter()
+
+    def phases(self):
+        result = {}
+        for phase in PHASES:
+            start, end = self.marks.get((phase, 0)), self.marks.get((phase, 1))
+            result[phase] = (end - start) * 1000 if start is not None and end is not None else 0.0
+        return result
+
+
+def _empty_stats():
+    return {"requests": 0, "retries": 0, "errors": 0, "connections": 0, "wire_bytes": 0, "bytes": 0,
+            "status": {}, "ms": dict.fromkeys(PHASES, 0.0)}
+
+
+class ClientStats:
+    def __init__(self):
+        self.total = _empty_stats()
+        self.hosts = {}
+
+    def _targets(self, url):
+        host = urlsplit(str(url)).netloc
+        return self.total, self.hosts.setdefault(host, _empty_stats())
+
+    def record(self, url, timing, response=None, size=None):
+        """size：解壓後的內容大小；串流請求不會整個讀進 response.content，由呼叫端傳入"""
+        for stats in self._targets(url):
+            stats["requests"] += 1
+            stats["connections"] += timing.connections
+            for phase, ms in timing.phases().items():
+                stats["ms"][phase] += ms
+            if response is None:
+                stats["errors"] += 1
+                continue
+            stats["status"][response.status_code] = stats["status"].get(response.status_code, 0) + 1
+            stats["wire_bytes"] += response.num_bytes_downloaded
+            stats["bytes"] += len(response.content) if size is None else size
+
+    def retried(self, url):
+        for stats in self._targets(url):
+            stats["retries"] += 1
+
+    def snapshot(self):
+        def rounded(stats):
+            return {**stats, "status": dict(stats["status"]), "ms": {k: round(v, 1) for k, v in stats["ms"].items()}}
+        return {**rounded(self.total), "hosts": {host: rounded(s) for host, s in self.hosts.items()}}
+
+
+def _client_kwargs(headers, timeout, http2, max_connections, max_keepalive, cookies):
+    return {
+        "headers": headers,
+        "cookies": cookies,
+        "timeout": timeout,
+        "follow_redirects": True,
+        "http2": (env.CRAWL_HTTP2 if http2 is None else http2) and http2_available(),
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+    }
+
+
+# ==========================================
+# 同步版 (舊的逐頁爬蟲 services/crawlers.py)
+# ==========================================
+class HttpClient:
+    """httpx.Client 在第一次請求時才建立 (import 本模組不會建立 SSL context)"""
+
+    def __init__(self, headers=None, timeout=10, http2=None, max_connections=20, max_keepalive=10, retry=None,
+                 cookies=None):
+        self._kwargs = _client_kwargs(headers, timeout, http2, max_connections, max_keepalive, cookies)
+        self.retry = retry or RetryPolicy()
+        self.stats = ClientStats()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.Client(**self._kwargs)
+        return self._client
+
+    def get(self, url, **kwargs):
+        attempt = 0
+        while True:
+            timing = RequestTiming()
+            try:
+                resp = self.client.get(url, extensions={"trace": lambda name, info: timing.event(name)}, **kwargs)
+            except RETRY_EXCEPTIONS:
+                self.stats.record(url, timing)
+                if attempt >= self.retry.max_retries:
+                    raise
+                resp = None
+            else:
+                self.stats.record(url, timing, resp)
+                if resp.status_code not in self.retry.statuses or attempt >= self.retry.max_retries:
+                    return resp
+            time.sleep(self.retry.delay(attempt, resp))
+            self.stats.retried(url)
+            attempt += 1
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==========================================
+# 非同步版 (CrawlEngine)
+# ==========================================
+class AsyncHttpClient:
+    def __init__(self, headers=None, timeout=10, http2=None, max_connections=50, max_keepalive=20, retry=None,
+                 cookies=None):
+        kwargs = _client_kwargs(headers, timeout, http2, max_connections, max_keepalive, cookies)
+        self.http2 = kwargs["http2"]
+        self._client = httpx.AsyncClient(**kwargs)
+        self.retry = retry or RetryPolicy()
+        self.stats = ClientStats()
+
+    @staticmethod
+    def _trace(timing):
+        async def trace(name, info):
+            timing.event(name)
+        return trace
+
+    async def get(self, url, **kwargs):
+        attempt = 0
+        while True:
+            timing = RequestTiming()
+            try:
+                resp = await self._client.get(url, extensions={"trace": self._trace(timing)}, **kwargs)
+            except RETRY_EXCEPTIONS:
+                self.stats.record(url, timing)
+                if attempt >= self.retry.max_retries:
+                    raise
+                resp = None
+            else:
+                self.stats.record(url, timing, resp)
+                if resp.status_code not in self.retry.statuses or attempt >= self.retry.max_retries:
+                    return resp
+            await asyncio.sleep(self.retry.delay(attempt, resp))
+            self.stats.retried(url)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """串流讀取 (不重試：body 可能已讀了一半)；bytes 以實際從網路讀到的量計算"""
+        timing = RequestTiming()
+        try:
+            async with self._client.stream(method, url, extensions={"trace": self._trace(timing)}, **kwargs) as resp:
+                yield resp
+        except httpx.HTTPError:
+            self.stats.record(url, timing)
+            raise
+        self.stats.record(url, timing, resp, size=resp.num_bytes_downloaded)
+
+    async def aclose(self):
+        await self._client.aclose()
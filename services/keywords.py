@@ -0,0 +1,129 @@
+import re
+
+# ==========================================
+# 健康與藥品關鍵字 (依分類)
+# ==========================================
+HEALTH_KEYWORD_CATEGORIES = {
+    "疾病症狀": [
+        "感冒", "發燒", "咳嗽", "流感", "腸病毒", "過敏", "氣喘", "鼻炎", "喉嚨痛", "頭痛",
+        "腹瀉", "便秘", "腸胃", "胃痛", "噁心", "嘔吐", "疲勞", "失眠", "焦慮", "憂鬱",
+        "高血壓", "糖尿病", "癌症", "腫瘤", "中風", "心臟", "肝炎", "腎臟", "痛風", "骨質疏鬆",
+        "關節炎", "皮膚炎", "濕疹", "蕁麻疹", "痘痘", "粉刺", "異位性", "紅疹", "癢",
+        "懷孕", "產檢", "產後", "哺乳", "母乳", "嬰兒", "幼兒", "兒童", "寶寶",
+        "疫情", "確診", "染疫", "隔離", "快篩", "PCR", "疫苗", "施打", "副作用",
+    ],
+    "藥品相關": [
+        "藥", "藥物", "藥品", "用藥", "吃藥", "藥局", "藥師", "處方", "慢性處方",
+        "止痛藥", "消炎藥", "抗生素", "退燒藥", "感冒藥", "胃藥", "止咳", "化痰",
+        "維他命", "維生素", "保健食品", "營養品", "益生菌", "魚油", "鈣片", "葉黃素",
+        "普拿疼", "斯斯", "伏冒", "克流感", "類固醇", "安眠藥", "降血壓", "降血糖",
+        "藥膏", "藥水", "藥粉", "軟膏", "眼藥水", "噴劑", "貼布", "酸痛貼布",
+    ],
+    "健康照護": [
+        "健康", "醫療", "醫院", "診所", "看診", "就醫", "掛號", "急診", "住院",
+        "醫生", "醫師", "護理師", "檢查", "體檢", "健檢", "抽血", "X光", "超音波",
+        "治療", "復健", "手術", "開刀", "化療", "放療",
+        "身體", "健康檢查", "預防", "養生", "保養", "調理", "體質",
+    ],
+}
+
+HEALTH_KEYWORDS = [kw for keywords in HEALTH_KEYWORD_CATEGORIES.values() for kw in keywords]
+
+# Dashboard 輿情標籤：標籤 -> 觸發字
+INSIGHT_TAG_RULES = {
+    "流感": ["感冒", "流感"],
+    "缺貨": ["缺"],
+    "用藥諮詢": ["藥"],
+    "兒童": ["寶寶", "小孩"],
+}
+
+
+class KeywordMatch:
+    def __init__(self, keywords, categories, tags):
+        self.keywords = keywords        # 命中的健康關鍵字
+        self.categories = categories    # 命中的健康分類
+        self.tags = tags                # 命中的 Dashboard 標籤
+
+    @property
+    def is_health_related(self):
+        return bool(self.keywords)
+
+
+def trie_pattern(words):
+    """
+    把關鍵字清單編成前綴樹形式的 regex，例如 ["藥", "藥局", "藥師"] -> 藥(?:局|師)?
+    每個位置先依第一個字分流，不必逐一嘗試 150 個選項；量詞為貪婪，因此總是先匹配最長的詞。
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        end = node.get("", False)
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and len(branches[0]) == 1 else "(?:" + "|".join(branches) + ")"
+        return body + "?" if end else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    多關鍵字比對器：所有關鍵字編成一個前綴樹 regex，掃描文字一次就找出全部命中的關鍵字。
+
+    作法：regex 直接跳到下一個可能命中的位置並取「最長」的關鍵字，
+    再把該關鍵字內含的較短關鍵字一併算入 (預先算好)。
+    例如命中「感冒藥」時，「感冒」與「藥」也算命中，結果與逐一 `in` 檢查完全相同。
+    """
+
+    def __init__(self, categories, tag_rules):
+        self.category_order = list(categories)
+        self.tag_order = list(tag_rules)
+        self.keyword_categories = {}
+        for category, keywords in categories.items():
+            for kw in keywords:
+                self.keyword_categories.setdefault(kw, set()).add(category)
+        self.keyword_tags = {}
+        for tag, words in tag_rules.items():
+            for word in words:
+                self.keyword_tags.setdefault(word, set()).add(tag)
+
+        terms = sorted(set(self.keyword_categories) | set(self.keyword_tags))
+        self._any = re.compile(trie_pattern(self.keyword_categories))
+        self._all = re.compile(trie_pattern(terms))
+        # 每個詞內含的所有詞 (包含自己)
+        self._contained = {t: [u for u in terms if u in t] for t in terms}
+
+    def is_health_related(self, text):
+        """只需要判斷有沒有命中時，search 找到第一個就停"""
+        return bool(text) and self._any.search(text) is not None
+
+    def match(self, text):
+        if not text:
+            return KeywordMatch([], [], [])
+        found = set()
+        search = self._all.search
+        m = search(text)
+        while m is not None:
+            found.update(self._contained[m.group()])
+            # 從下一個字繼續找，才不會漏掉重疊的關鍵字
+            m = search(text, m.start() + 1)
+        if not found:
+            return KeywordMatch([], [], [])
+
+        keywords = sorted(t for t in found if t in self.keyword_categories)
+        matched_categories = {c for t in keywords for c in self.keyword_categories[t]}
+        matched_tags = {g for t in found if t in self.keyword_tags for g in self.keyword_tags[t]}
+        # 分類與標籤維持宣告時的順序
+        categories = [c for c in self.category_order if c in matched_categories]
+        tags = [g for g in self.tag_order if g in matched_tags]
+        return KeywordMatch(keywords, categories, tags)
+
+
+# import 時建立一次，爬蟲與 Dashboard 共用
+keyword_matcher = KeywordMatcher(HEALTH_KEYWORD_CATEGORIES, INSIGHT_TAG_RULES)
@@ -0,0 +1,256 @@
+from datetime import date as date_type, datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from db.mongo import db, get_async_db
+
+# ==========================================
+# KPI 預先彙總 (kpi_rollups 集合)
+#   daily:<store_id>:<YYYY-MM-DD>   單日營收 / 毛利 / 毛利率 / 營收最高分類 (+ 各分類小計)
+#   weekly:<store_id>:<YYYY-Www>    ISO 週加總，由該週的 daily 文件再彙總
+#
+# 增量更新：daily_category_summary 有新資料時，只對受影響的 (門市, 日期) 重算，
+# 再重算這些日期所在的 ISO 週；兩段都用 $merge 直接寫回，資料不經過 App。
+# summary 由 ERP 在 App 之外寫入，因此由排程 (get_rollup_scheduler，KPI_ROLLUP_SCHEDULER_ENABLED) 每 ROLLUP_INTERVAL 秒檢查一次：
+# 依 _id (ObjectId 內含寫入時間) 找出上次檢查之後新增的資料列，檢查時間記在 rollup_state。
+# 原地修改既有資料列 (_id 不變) 不會被偵測到，需呼叫 POST /api/dashboard/rollups/refresh。
+# Dashboard 只讀一份 weekly 文件 (見 dashboard_queries.store_snapshot_pipeline)，
+# 不論門市數或天數多少都是一次 _id 查詢。
+#
+# 注意：某天的 summary 資料整個被刪除時不會清掉對應的 daily 文件，需要 refresh_rollups() 全量重建。
+# ==========================================
+ROLLUP_COLLECTION = "kpi_rollups"
+ROLLUP_STATE_COLLECTION = "rollup_state"
+ROLLUP_INTERVAL = 10 * 60   # 秒
+# ObjectId 的時間由寫入端產生 (時鐘誤差、寫入途中的批次)：每次往回多看一段時間 (重算是冪等的)
+ROLLUP_WATERMARK_OVERLAP = 5 * 60   # 秒
+
+MARGIN_EXPR = {"$cond": [
+    {"$gt": ["$revenue", 0]},
+    {"$round": [{"$multiply": [{"$divide": ["$gross_profit", "$revenue"]}, 100]}, 1]},
+    0,
+]}
+
+# "2025-10-30" -> "2025-W44" (%G / %V 是 ISO 年 / 週)
+ISO_WEEK_EXPR = {"$dateToString": {
+    "format": "%G-W%V",
+    "date": {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d"}},
+}}
+
+KPI_PROJECTION = {"_id": 0, "key": 1, "revenue": 1, "gross_profit": 1, "margin": 1, "top_category": 1}
+
+
+def iso_week(date):
+    year, week, _ = date_type.fromisoformat(date).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_dates(date):
+    """date 所在 ISO 週的七天 (週一到週日)"""
+    day = date_type.fromisoformat(date)
+    monday = day - timedelta(days=day.weekday())
+    return [(monday + timedelta(days=i)).isoformat() for i in range(7)]
+
+
+def rollup_id(period, store_id, key):
+    return f"{period}:{store_id}:{key}"
+
+
+def weekly_rollup_id(store_id, date):
+    return rollup_id("weekly", store_id, iso_week(date))
+
+
+def _totals_stages(keys):
+    """
+    先依 keys + 分類加總，再依 keys 加總並取營收最高的分類
+    ($sort 之後的 $first 保證拿到排序後的第一筆)
+    """
+    return [
+        {"$group": {
+            "_id": {**keys, "category": "$category"},
+            "revenue": {"$sum": "$revenue"},
+            "gross_profit": {"$sum": "$gross_profit"},
+        }},
+        {"$sort": {"revenue": -1}},
+        {"$group": {
+            "_id": {k: f"$_id.{k}" for k in keys},
+            "revenue": {"$sum": "$revenue"},
+            "gross_profit": {"$sum": "$gross_profit"},
+            "top_category": {"$first": "$_id.category"},
+            "categories": {"$push": {"category": "$_id.category", "revenue": "$revenue", "gross_profit": "$gross_profit"}},
+        }},
+        {"$set": {"margin": MARGIN_EXPR}},
+    ]
+
+
+def _merge_stage():
+    return {"$merge": {"into": ROLLUP_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+
+def daily_rollup_pipeline(store_ids=None, dates=None):
+    """在 daily_category_summary 上執行：重算指定門市 / 日期的 daily 文件 (None = 全部)"""
+    match = {}
+    if dates is not None:
+        match["date"] = {"$in": list(dates)}
+    if store_ids is not None:
+        match["store_id"] = {"$in": list(store_ids)}
+    return [
+        {"$match": match},
+        {"$set": {"week": ISO_WEEK_EXPR}},
+        *_totals_stages({"store_id": "$store_id", "date": "$date", "week": "$week"}),
+        {"$project": {
+            "_id": {"$concat": ["daily:", "$_id.store_id", ":", "$_id.date"]},
+            "period": "daily",
+            "store_id": "$_id.store_id",
+            "key": "$_id.date",
+            "week": "$_id.week",
+            "revenue": 1, "gross_profit": 1, "margin": 1, "top_category": 1, "categories": 1,
+            "updated_at": "$$NOW",
+        }},
+        _merge_stage(),
+    ]
+
+
+def weekly_rollup_pipeline(store_ids=None, weeks=None):
+    """在 kpi_rollups 上執行：由 daily 文件重算指定門市 / ISO 週的 weekly 文件"""
+    match = {"period": "daily"}
+    if weeks is not None:
+        match["week"] = {"$in": list(weeks)}
+    if store_ids is not None:
+        match["store_id"] = {"$in": list(store_ids)}
+    return [
+        {"$match": match},
+        {"$unwind": "$categories"},
+        {"$replaceWith": {
+            "store_id": "$store_id",
+            "week": "$week",
+            "category": "$categories.category",
+            "revenue": "$categories.revenue",
+            "gross_profit": "$categories.gross_profit",
+        }},
+        *_totals_stages({"store_id": "$store_id", "week": "$week"}),
+        {"$project": {
+            "_id": {"$concat": ["weekly:", "$_id.store_id", ":", "$_id.week"]},
+            "period": "weekly",
+            "store_id": "$_id.store_id",
+            "key": "$_id.week",
+            "revenue": 1, "gross_profit": 1, "margin": 1, "top_category": 1, "categories": 1,
+            "updated_at": "$$NOW",
+        }},
+        _merge_stage(),
+    ]
+
+
+def refresh_rollups(store_ids=None, dates=None, database=None):
+    """
+    重算 daily 與 weekly 彙總；不帶參數時全量重建。
+    ERP 匯入新的 daily_category_summary 後，傳入這批資料涵蓋的門市與日期即可。
+    """
+    database = database if database is not None else db
+    database.daily_category_summary.aggregate(daily_rollup_pipeline(store_ids, dates))
+    weeks = sorted({iso_week(d) for d in dates}) if dates is not None else None
+    database[ROLLUP_COLLECTION].aggregate(weekly_rollup_pipeline(store_ids, weeks))
+    print(f"✅ [Rollup] KPI 彙總已更新 (門市: {store_ids or '全部'}，日期: {dates or '全部'})")
+
+
+def refresh_new_rows(database=None):
+    """
+    只重算上次檢查之後新寫入的 summary 資料列涵蓋的門市與日期；第一次執行時全量重建。
+    回傳 {"full": 是否全量重建, "stores": 門市數, "dates": 日期數}
+    """
+    database = database if database is not None else db
+    summary = database.daily_category_summary
+    checked_at = datetime.now(timezone.utc)
+    state = database[ROLLUP_STATE_COLLECTION].find_one({"_id": "daily_category_summary"})
+    if state is None:
+        if summary.find_one({}, {"_id": 1}) is None:
+            return {"full": False, "stores": 0, "dates": 0}
+        refresh_rollups(database=database)
+        counts = {"full": True, "stores": len(summary.distinct("store_id")), "dates": len(summary.distinct("date"))}
+    else:
+        since = state["checked_at"] - timedelta(seconds=ROLLUP_WATERMARK_OVERLAP)
+        changed = next(summary.aggregate([
+            {"$match": {"_id": {"$gt": ObjectId.from_datetime(since)}}},
+            {"$group": {"_id": None, "store_ids": {"$addToSet": "$store_id"}, "dates": {"$addToSet": "$date"}}},
+        ]), None)
+        counts = {"full": False, "stores": 0, "dates": 0}
+        if changed and changed["store_ids"]:
+            refresh_rollups(sorted(changed["store_ids"]), sorted(changed["dates"]), database)
+            counts.update(stores=len(changed["store_ids"]), dates=len(changed["dates"]))
+
+    database[ROLLUP_STATE_COLLECTION].update_one(
+        {"_id": "daily_category_summary"}, {"$set": {"checked_at": checked_at}}, upsert=True,
+    )
+    return counts
+
+
+async def refresh_new_rows_job(sources=()):
+    """CrawlScheduler 的 runner 介面；有重算時清除週報快照 (report_cache 依賴本模組，因此延後 import)"""
+    counts = refresh_new_rows()
+    if counts["stores"]:
+        from services.report_cache import report_cache
+        report_cache.invalidate()
+    return counts
+
+
+_rollup_scheduler = None
+
+
+def get_rollup_scheduler():
+    """
+    與爬蟲共用 lease / 退避機制 (crawl_schedule 集合的 "kpi_rollups" 文件)，多個 worker 只會有一個在重算。
+    第一次呼叫時才建立，import 本模組時不載入排程器。
+    """
+    global _rollup_scheduler
+    if _rollup_scheduler is None:
+        from services.scheduler import CrawlScheduler
+        _rollup_scheduler = CrawlScheduler(intervals={"kpi_rollups": ROLLUP_INTERVAL}, tick=60,
+                                           runner=refresh_new_rows_job)
+    return _rollup_scheduler
+
+
+# ==========================================
+# 讀取
+# ==========================================
+def live_kpi_pipeline(store_id, date):
+    """rollup 還沒建好時的備援：直接加總該週的 daily_category_summary"""
+    return [
+        {"$match": {"date": {"$in": week_dates(date)}, "store_id": store_id}},
+        *_totals_stages({"store_id": "$store_id"}),
+        {"$set": {"key": iso_week(date)}},
+        {"$project": KPI_PROJECTION},
+    ]
+
+
+def fetch_live_kpi(store_id, date, database=None):
+    database = database if database is not None else db
+    return next(database.daily_category_summary.aggregate(live_kpi_pipeline(store_id, date)), None)
+
+
+async def fetch_live_kpi_async(store_id, date, database=None):
+    database = database if database is not None else get_async_db()
+    cursor = await database.daily_category_summary.aggregate(live_kpi_pipeline(store_id, date))
+    return await anext(cursor, None)
+
+
+def live_kpis_pipeline(store_ids, date):
+    """多門市版本的備援加總 (一次 $in)，每個門市一份文件，帶 store_id"""
+    return [
+        {"$match": {"date": {"$in": week_dates(date)}, "store_id": {"$in": list(store_ids)}}},
+        *_totals_stages({"store_id": "$store_id"}),
+        {"$set": {"key": iso_week(date), "store_id": "$_id.store_id"}},
+        {"$project": {**KPI_PROJECTION, "store_id": 1}},
+    ]
+
+
+def fetch_live_kpis(store_ids, date, database=None):
+    """回傳 {store_id: kpi}"""
+    database = database if database is not None else db
+    return {doc.pop("store_id"): doc for doc in database.daily_category_summary.aggregate(live_kpis_pipeline(store_ids, date))}
+
+
+async def fetch_live_kpis_async(store_ids, date, database=None):
+    """回傳 {store_id: kpi}"""
+    database = database if database is not None else get_async_db()
+    cursor = await database.daily_category_summary.aggregate(live_kpis_pipeline(store_ids, date))
+    return {doc.pop("store_id"): doc async for doc in cursor}
@@ -0,0 +1,121 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from pymongo import monitoring
+
+# ==========================================
+# 熱路徑量測 (Prometheus 格式，GET /metrics)
+#   medipoint_stage_seconds{component, stage, source}
+#       dashboard：kpi / feed (警示 + 輿情查詢) / suggestions / llm / alerts / insights / report (整份週報)
+#       crawler：  fetch / parse / persist / flush，source 為 PTT / CDC / GoogleNews / Dcard
+#   medipoint_mongo_command_seconds{command, collection}   pymongo CommandListener 回報的每個指令耗時
+#   medipoint_http_request_seconds{method, route, status}  API 請求 (route 為路由樣板，不含參數值)
+#
+# 用法：
+#   with stage_timer("dashboard", "kpi"): ...
+#   @stage_timer("dashboard", "alerts")     (同步函式)
+#   await timed_await("dashboard", "llm", coro)
+# ==========================================
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "medipoint_stage_seconds", "各處理階段耗時", ["component", "stage", "source"], buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "medipoint_mongo_command_seconds", "Mongo 指令耗時 (CommandListener)", ["command", "collection"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "medipoint_mongo_command_failures_total", "失敗的 Mongo 指令", ["command", "collection"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "medipoint_http_request_seconds", "API 請求耗時", ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+
+
+def stage_timer(component, stage, source=""):
+    """context manager / 同步函式 decorator"""
+    return STAGE_SECONDS.labels(component, stage, source).time()
+
+
+async def timed_await(component, stage, awaitable, source=""):
+    """量測一個 awaitable (asyncio.gather 裡的各個查詢分開計時)"""
+    with stage_timer(component, stage, source):
+        return await awaitable
+
+
+def observe_request(method, route, status, seconds):
+    HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+
+
+def render_metrics():
+    """回傳 (body, content_type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ==========================================
+# Mongo 指令耗時
+#   started 事件才有指令內容 (collection 名稱)，先依 request_id 記下，succeeded / failed 時取出
+#   getMore / killCursors 的 collection 在 "collection" 欄位；其餘指令的值就是 collection 名稱
+# ==========================================
+IGNORED_COMMANDS = frozenset({"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"})
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        target = event.command.get("collection") if event.command_name in ("getMore", "killCursors") \
+            else event.command.get(event.command_name)
+        with self._lock:
+            self._collections[self._key(event)] = target if isinstance(target, str) else ""
+
+    def _pop(self, event):
+        with self._lock:
+            return self._collections.pop(self._key(event), None)
+
+    def succeeded(self, event):
+        collection = self._pop(event)
+        if collection is not None:
+            MONGO_COMMAND_SECONDS.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._pop(event)
+        if collection is not None:
+            MONGO_COMMAND_SECONDS.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+# ==========================================
+# 取樣 profiler (選用，PROFILING_ENABLED=true 才會生效)
+#   帶 X-Profile: 1 且通過 /docs 帳密驗證的請求，回傳 pyinstrument 的 HTML 報告取代原本的回應。
+#   取樣的是 event loop 所在的 thread：同時間其他請求的工作也會出現在報告裡，
+#   丟到 threadpool 的同步查詢只會看到等待的時間。
+# ==========================================
+@contextmanager
+def request_profiler(interval=0.001):
+    from pyinstrument import Profiler   # 只有開啟 profiling 時才需要安裝
+
+    profiler = Profiler(interval=interval, async_mode="disabled")
+    profiler.start()
+    started = time.perf_counter()
+    report = {}
+    try:
+        yield report
+    finally:
+        profiler.stop()
+        report["seconds"] = time.perf_counter() - started
+        report["html"] = profiler.output_html()
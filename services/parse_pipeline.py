@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+from util.config import env
+
+# ==========================================
+# 爬蟲解析階段：fetch -> parse -> filter -> persist
+#   fetch 在 event loop 上 (httpx)，抓回來的原始 bytes 交給這裡解析，
+#   解析 (BeautifulSoup / lxml) 是 CPU 密集的工作，
+#   workers > 0 時送到 ProcessPoolExecutor，不受 GIL 限制，也不卡住 event loop。
+#
+# 背壓：同時最多 max_pending 頁在「抓取中、等待解析或解析中」。
+#       CrawlEngine 在 fetch 之前先用 reserve() 佔一個名額，拿到頁面後在同一個名額內 run()；
+#       解析跟不上時名額用完，新的 fetch 就停下來等，不會一直抓、把原始頁面堆在記憶體裡。
+#       沒有先 reserve() 的 run() (例如 benchmark 直接丟頁面) 自己佔一個名額。
+#
+# process pool 依 worker 數各建一個並共用 (不同 worker 數的 ParseStage 不會拿到別人的 pool)。
+#
+# 解析函式必須是模組層級的純函式 (要能 pickle 到子 process)。
+# ==========================================
+DEFAULT_MAX_PENDING = 16
+
+_pools = {}     # workers -> ProcessPoolExecutor
+_pool_lock = threading.Lock()
+# 目前的 task 已經在哪個 ParseStage 佔了名額 (reserve() 內的 run() 不再重複佔)
+_reserved = contextvars.ContextVar("parse_reserved", default=None)
+
+
+def get_process_pool(workers):
+    """同樣 worker 數的 pool 整個 process 共用 (啟動子 process 很貴，不要每次爬取都建)"""
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # 用 spawn：fork 會把 event loop / Mongo 連線池的狀態一起複製過去
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def shutdown_process_pool():
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ParseStage:
+    """
+    workers=0：在 thread 解析 (預設；單核機器上開 process 沒有好處)
+    workers>0：在共用的 process pool 解析
+    """
+
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING):
+        self.workers = env.CRAWL_PARSE_WORKERS if workers is None else workers
+        self._slots = asyncio.Semaphore(max_pending)
+        self.stats = {"pages": 0, "bytes": 0, "seconds": 0.0}
+
+    @asynccontextmanager
+    async def reserve(self):
+        """fetch 之前呼叫：名額用完 (解析跟不上) 時在這裡等，區塊內的 run() 使用同一個名額"""
+        if _reserved.get() is self:
+            yield
+            return
+        async with self._slots:
+            token = _reserved.set(self)
+            try:
+                yield
+            finally:
+                _reserved.reset(token)
+
+    async def run(self, func, content, *args):
+        async with self.reserve():
+            started = time.perf_counter()
+            if self.workers > 0:
+                loop = asyncio.get_running_loop()
+                pool = get_process_pool(self.workers)
+                result = await loop.run_in_executor(pool, functools.partial(func, content, *args))
+            else:
+                result = await asyncio.to_thread(func, content, *args)
+            self.stats["pages"] += 1
+            self.stats["bytes"] += len(content)
+            self.stats["seconds"] += time.perf_counter() - started
+            return result
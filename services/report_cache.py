@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+from services.dashboard import get_weekly_dashboard_data_async, uses_default_talking_point
+from services.dashboard_queries import fetch_data_version_async
+
+# ==========================================
+# 週報快照快取 (in-process LRU + TTL)
+#   key: (store_id, date)
+#   value: 已序列化好的 JSON bytes + ETag，命中時直接回傳，不再查 DB / 呼叫 Gemini
+#   話術生成逾時而帶著預設話術的快照只保留 FALLBACK_SNAPSHOT_TTL 秒：
+#   背景的生成完成後，下一次重建就會拿到真正的話術 (不會把預設話術凍結整個 TTL)
+#   輿情 / 警示 (爬蟲跑完) 與 KPI 彙總 (重算後) 由寫入端呼叫 invalidate()；
+#   庫存與 summary 由 ERP 直接寫入 Mongo，因此快照記下建置時的資料版本
+#   (dashboard_queries.fetch_data_version_async)，命中時每 VERSION_CHECK_SECONDS 秒重新查一次，
+#   版本不同就重建，不必等 TTL 到期
+#
+# 注意：快取存在各 worker 自己的記憶體，invalidate 只影響目前這個 process，
+#       其他 worker 最晚在 TTL 到期後重建。
+# ==========================================
+SNAPSHOT_TTL = 300      # 秒
+SNAPSHOT_MAXSIZE = 256  # 最多保留幾個 (store_id, date) 快照
+FALLBACK_SNAPSHOT_TTL = 10  # 秒
+VERSION_CHECK_SECONDS = 15  # 秒，命中時最多隔多久確認一次資料版本
+
+
+class ReportSnapshot:
+    def __init__(self, report, ttl=SNAPSHOT_TTL, version=None):
+        self.report = report
+        self.ttl = ttl
+        self.version = version
+        self.body = json.dumps(jsonable_encoder(report), ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.built_at = time.monotonic()
+        self.checked_at = self.built_at
+
+
+class SnapshotCache:
+    def __init__(self, ttl=SNAPSHOT_TTL, maxsize=SNAPSHOT_MAXSIZE, builder=get_weekly_dashboard_data_async,
+                 fallback_ttl=FALLBACK_SNAPSHOT_TTL, versioner=fetch_data_version_async,
+                 version_check=VERSION_CHECK_SECONDS):
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.maxsize = maxsize
+        self.builder = builder
+        self.versioner = versioner
+        self.version_check = version_check
+        self._entries = OrderedDict()
+        # _entries 也會被爬蟲 thread 呼叫 invalidate()，因此用 threading.Lock 保護
+        self._lock = threading.Lock()
+        # 每個 key 一把建置鎖，避免同時大量 miss 時重複計算 (cache stampede)
+        # key -> [asyncio.Lock, 等待中的請求數]；沒有人在等時就移除，不會隨著各種 store_id / date 無限成長
+        self._build_locks = {}
+        # invalidate() 每次加一；建置開始後若有變動，結果就不寫入快取 (避免舊資料蓋掉剛清除的快照)
+        self._generation = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                return None
+            if time.monotonic() - snapshot.built_at > snapshot.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    async def _is_current(self, store_id, date, snapshot):
+        """距離上次確認超過 version_check 秒時重新查資料版本；同時間的其他請求直接沿用快照"""
+        now = time.monotonic()
+        if now - snapshot.checked_at < self.version_check:
+            return True
+        snapshot.checked_at = now
+        if await self.versioner(store_id, date) == snapshot.version:
+            return True
+        with self._lock:
+            if self._entries.get((store_id, date)) is snapshot:
+                del self._entries[(store_id, date)]
+        return False
+
+    async def get(self, store_id, date):
+        key = (store_id, date)
+        snapshot = self._lookup(key)
+        if snapshot is not None and await self._is_current(store_id, date, snapshot):
+            return snapshot
+
+        entry = self._build_locks.get(key)
+        if entry is None:
+            entry = self._build_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # 等鎖期間可能已經有人建好了
+                snapshot = self._lookup(key)
+                if snapshot is not None:
+                    return snapshot
+                return await self.rebuild(store_id, date)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._build_locks.pop(key, None)
+
+    async def rebuild(self, store_id, date):
+        generation = self._generation
+        # 先取版本再建置：建置途中的寫入會讓下一次確認時版本不同而重建
+        version = await self.versioner(store_id, date)
+        report = await self.builder(store_id=store_id, date=date)
+        ttl = self.fallback_ttl if uses_default_talking_point(report) else self.ttl
+        snapshot = ReportSnapshot(report, ttl, version)
+        with self._lock:
+            if generation != self._generation:
+                return snapshot     # 建置期間被 invalidate：這次照樣回傳，但不放進快取
+            self._entries[(store_id, date)] = snapshot
+            self._entries.move_to_end((store_id, date))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, store_id=None, date=None):
+        """清除快照；不帶參數時全部清除 (例如爬蟲剛跑完，輿情/警示都變了)"""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                if (store_id is None or key[0] == store_id) and (date is None or key[1] == date):
+                    del self._entries[key]
+
+
+report_cache = SnapshotCache()
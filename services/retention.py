@@ -0,0 +1,221 @@
+from datetime import date as date_type, datetime, time as time_type, timedelta
+
+from db.mongo import db
+from services.scheduler import CrawlScheduler
+from util.config import env
+
+# ==========================================
+# 爬蟲資料保存分層 (raw_articles / alerts)
+#   熱層 (hot)     原本的集合：Dashboard 最新 N 筆、upsert、去重、change stream 都讀這裡。
+#                  某天封存後才在當天的文件蓋上 expires_at (= 當天結束 + HOT_RETENTION_DAYS)，
+#                  由 TTL index (expires_at_ttl) 自動刪除；還沒封存的文件沒有 expires_at，不會被刪。
+#                  重爬到的文件會在 upsert 時清掉 expires_at (services/crawlers.py 的 RECRAWL_UNSET)，
+#                  等它新的 crawled_at 那天封存時再重新蓋上。
+#   歷史層 (history)  crawl_history time-series 集合 (timeField crawled_at，metaField {collection, source, board})
+#                  只留標題 / 網址 / 關鍵字等精簡欄位，Mongo 依 meta + 時間分桶壓縮；
+#                  HISTORY_RETENTION_DAYS 後由集合本身的 expireAfterSeconds 刪除 (設 0 則不寫歷史層)。
+#   彙總層 (summary)  crawl_daily_summary 每 (集合, kind, term, 日期) 一份，永久保留：
+#                  {_id: "raw_articles:keyword:流感:2025-10-30", collection, kind, term, day,
+#                   total: 12, sources: {"PTT": 9, "GoogleNews": 3}}
+#
+# 封存 (roll_day) 以「日」為單位依序進行，進度記在 retention_state 的 rolled_through：
+#   歷史層 -> 彙總層 ($merge 取代，可重跑) -> 蓋 expires_at -> 推進 rolled_through
+# 中途失敗時下次從同一天重來；歷史層若當天已有資料就略過 (time-series 集合不支援 upsert)。
+#
+# 熱層只保留最近 HOT_RETENTION_DAYS 天，文件數與索引大小只跟「這段期間的不重複文章數」有關
+# (同一篇重爬是 upsert)，不會因為爬取頻率提高或時間拉長而無限成長。
+# 注意：crawled_at 是最後一次爬到的時間，重爬會往後移；某篇文章只會計入它在封存當天所屬的日期。
+# ==========================================
+HOT_COLLECTIONS = ("raw_articles", "alerts")
+HISTORY_COLLECTION = "crawl_history"
+SUMMARY_COLLECTION = "crawl_daily_summary"
+STATE_COLLECTION = "retention_state"
+RETENTION_INTERVAL = 6 * 60 * 60     # 秒，排程多久檢查一次有沒有可封存的日期
+ARCHIVE_BATCH = 5000
+
+# 彙總的維度：kind -> 欄位 (陣列欄位會展開成多個 term，同一篇內重複的 term 只算一次)
+SUMMARY_TERMS = {
+    "raw_articles": {"source": "$source", "board": "$board", "keyword": "$keywords", "category": "$categories"},
+    "alerts": {"agency": "$agency", "risk_level": "$risk_level"},
+}
+# sources 細項依哪個欄位拆分
+SUMMARY_SOURCE = {"raw_articles": "$source", "alerts": "$agency"}
+
+HISTORY_FIELDS = {
+    "raw_articles": ("title", "url", "keywords", "categories"),
+    "alerts": ("title", "url", "type", "risk_level"),
+}
+
+
+def day_bounds(day):
+    start = datetime.combine(date_type.fromisoformat(day), time_type.min)
+    return start, start + timedelta(days=1)
+
+
+def day_filter(day):
+    start, end = day_bounds(day)
+    return {"crawled_at": {"$gte": start, "$lt": end}}
+
+
+# ==========================================
+# 歷史層
+# ==========================================
+def ensure_history_collection(database=None):
+    """建立 time-series 集合 (已存在就略過)；HISTORY_RETENTION_DAYS=0 時不建立"""
+    database = database if database is not None else db
+    if env.HISTORY_RETENTION_DAYS <= 0 or database.list_collection_names(filter={"name": HISTORY_COLLECTION}):
+        return False
+    database.create_collection(
+        HISTORY_COLLECTION,
+        timeseries={"timeField": "crawled_at", "metaField": "meta", "granularity": "hours"},
+        expireAfterSeconds=env.HISTORY_RETENTION_DAYS * 24 * 60 * 60,
+    )
+    return True
+
+
+def history_doc(name, doc):
+    source = doc.get("source") if name == "raw_articles" else doc.get("agency")
+    return {
+        "crawled_at": doc["crawled_at"],
+        "meta": {"collection": name, "source": source, "board": doc.get("board")},
+        **{field: doc[field] for field in HISTORY_FIELDS[name] if doc.get(field) is not None},
+    }
+
+
+def archive_day(database, name, day):
+    """把某天的熱層文件精簡後寫進歷史層，回傳筆數"""
+    if env.HISTORY_RETENTION_DAYS <= 0:
+        return 0
+    history = database[HISTORY_COLLECTION]
+    if history.find_one({"meta.collection": name, **day_filter(day)}, {"_id": 1}) is not None:
+        return 0    # 上次跑到一半已寫過這天
+    projection = {"_id": 0, "crawled_at": 1, "source": 1, "agency": 1, "board": 1,
+                  **dict.fromkeys(HISTORY_FIELDS[name], 1)}
+    batch, archived = [], 0
+    for doc in database[name].find(day_filter(day), projection).batch_size(ARCHIVE_BATCH):
+        batch.append(history_doc(name, doc))
+        if len(batch) >= ARCHIVE_BATCH:
+            history.insert_many(batch, ordered=False)
+            archived, batch = archived + len(batch), []
+    if batch:
+        history.insert_many(batch, ordered=False)
+        archived += len(batch)
+    return archived
+
+
+# ==========================================
+# 彙總層
+# ==========================================
+def _term_set(field):
+    """陣列欄位去重；單值欄位包成一個元素的陣列 (缺值記為 unknown)"""
+    return {"$cond": [{"$isArray": field}, {"$setUnion": [field]}, [{"$ifNull": [field, "unknown"]}]]}
+
+
+def summary_pipeline(name, day):
+    """在熱層集合上執行：重算某天的每個 (kind, term) 彙總並 $merge 取代"""
+    return [
+        {"$match": day_filter(day)},
+        {"$project": {
+            "_id": 0,
+            "source": {"$toString": {"$ifNull": [SUMMARY_SOURCE[name], "unknown"]}},
+            "terms": {"$concatArrays": [
+                {"$map": {"input": _term_set(field), "in": {"kind": kind, "term": {"$toString": "$$this"}}}}
+                for kind, field in SUMMARY_TERMS[name].items()
+            ]},
+        }},
+        {"$unwind": "$terms"},
+        {"$group": {"_id": {"kind": "$terms.kind", "term": "$terms.term", "source": "$source"}, "n": {"$sum": 1}}},
+        {"$group": {
+            "_id": {"kind": "$_id.kind", "term": "$_id.term"},
+            "total": {"$sum": "$n"},
+            "sources": {"$push": {"k": "$_id.source", "v": "$n"}},
+        }},
+        {"$project": {
+            "_id": {"$concat": [f"{name}:", "$_id.kind", ":", "$_id.term", f":{day}"]},
+            "collection": {"$literal": name},
+            "kind": "$_id.kind",
+            "term": "$_id.term",
+            "day": {"$literal": day},
+            "total": 1,
+            "sources": {"$arrayToObject": "$sources"},
+            "rolled_at": "$$NOW",
+        }},
+        {"$merge": {"into": SUMMARY_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+# ==========================================
+# 封存流程
+# ==========================================
+def roll_day(database, name, day):
+    """封存一天：歷史層 -> 彙總層 -> 蓋 expires_at -> 推進進度"""
+    archived = archive_day(database, name, day)
+    database[name].aggregate(summary_pipeline(name, day))
+    expires_at = day_bounds(day)[1] + timedelta(days=env.HOT_RETENTION_DAYS)
+    stamped = database[name].update_many(
+        {**day_filter(day), "expires_at": {"$exists": False}}, {"$set": {"expires_at": expires_at}},
+    ).modified_count
+    database[STATE_COLLECTION].update_one(
+        {"_id": name}, {"$set": {"rolled_through": day, "updated_at": datetime.now()}}, upsert=True,
+    )
+    return {"archived": archived, "expiring": stamped}
+
+
+def days_to_roll(database, name, today=None):
+    """從上次封存的隔天 (第一次則從最舊的文件) 到 today - ROLLUP_AFTER_DAYS"""
+    today = today or date_type.today()
+    last = today - timedelta(days=max(env.ROLLUP_AFTER_DAYS, 1))
+    state = database[STATE_COLLECTION].find_one({"_id": name})
+    if state:
+        first = date_type.fromisoformat(state["rolled_through"]) + timedelta(days=1)
+    else:
+        oldest = database[name].find_one({"crawled_at": {"$type": "date"}}, {"_id": 0, "crawled_at": 1},
+                                         sort=[("crawled_at", 1)])
+        if oldest is None:
+            return []
+        first = oldest["crawled_at"].date()
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def run_retention(database=None, today=None, collections=HOT_COLLECTIONS, verbose=False):
+    """封存所有到期的日期，回傳 {集合: {"days", "archived", "expiring", "rolled_through"}}"""
+    database = database if database is not None else db
+    ensure_history_collection(database)
+    results = {}
+    for name in collections:
+        counts = {"days": 0, "archived": 0, "expiring": 0, "rolled_through": None}
+        for day in days_to_roll(database, name, today):
+            rolled = roll_day(database, name, day)
+            counts["days"] += 1
+            counts["archived"] += rolled["archived"]
+            counts["expiring"] += rolled["expiring"]
+            counts["rolled_through"] = day
+            if verbose:
+                print(f"   {name} {day}: 歷史層 {rolled['archived']} 筆，{rolled['expiring']} 筆蓋上 expires_at")
+        results[name] = counts
+    print(f"✅ [Retention] 封存完成: {results}")
+    return results
+
+
+def retention_status(database=None):
+    """各熱層集合的封存進度與熱層保留天數"""
+    database = database if database is not None else db
+    states = {doc["_id"]: doc for doc in database[STATE_COLLECTION].find({"_id": {"$in": list(HOT_COLLECTIONS)}})}
+    return {
+        "hot_retention_days": env.HOT_RETENTION_DAYS,
+        "history_retention_days": env.HISTORY_RETENTION_DAYS,
+        "rollup_after_days": env.ROLLUP_AFTER_DAYS,
+        "collections": {name: {"rolled_through": states.get(name, {}).get("rolled_through"),
+                               "updated_at": states.get(name, {}).get("updated_at")}
+                        for name in HOT_COLLECTIONS},
+        "schedule": retention_scheduler.status(),
+    }
+
+
+async def run_retention_job(sources=()):
+    """CrawlScheduler 的 runner 介面 (排程器已在獨立 thread 的 event loop 裡呼叫，直接跑同步版)"""
+    return run_retention()
+
+
+# 與爬蟲共用 lease / 退避機制 (crawl_schedule 集合的 "retention" 文件)，多個 worker 只會有一個在封存
+retention_scheduler = CrawlScheduler(intervals={"retention": RETENTION_INTERVAL}, tick=60, runner=run_retention_job)
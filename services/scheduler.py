@@ -0,0 +1,207 @@
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from db.mongo import db
+
+# ==========================================
+# 爬蟲排程器
+#   - 各來源有自己的間隔 (秒)
+#   - 每個來源同時只跑一個 (single-flight)：
+#     process 內看 _active，跨 uvicorn worker 用 crawl_schedule 集合裡的 lease 文件
+#     (執行中定期續約，爬蟲 thread 真正結束後才釋放；thread 無法取消，逾時只記錄警告)
+#   - 失敗時指數退避並加上隨機抖動
+#   - 狀態 (上次執行、耗時、筆數、下次執行) 也存在 lease 文件裡，任何 worker 都能查
+# ==========================================
+CRAWL_INTERVALS = {
+    "cdc": 10 * 60,
+    "news": 10 * 60,
+    "ptt": 5 * 60,
+    "dcard": 30 * 60,
+}
+SCHEDULER_TICK = 15             # 秒，多久檢查一次是否有來源到期
+LEASE_SECONDS = 15 * 60         # lease 過期時間：worker 掛掉時，其他 worker 最晚等這麼久接手
+LEASE_RENEW_SECONDS = 60        # 執行中多久續約一次
+MAX_BACKOFF_SECONDS = 60 * 60
+
+
+async def run_crawlers(**kwargs):
+    """爬蟲引擎 (bs4 / lxml / httpx...) 等排程第一次執行時才 import"""
+    from services.crawl_engine import run_all_crawlers_async
+    return await run_all_crawlers_async(**kwargs)
+
+
+def next_delay(interval, failures):
+    """成功：約 interval 秒後；失敗：interval * 2^failures (上限一小時)，皆加 ±20% 抖動"""
+    base = interval if failures == 0 else min(interval * 2 ** failures, MAX_BACKOFF_SECONDS)
+    return base * random.uniform(0.8, 1.2)
+
+
+class CrawlScheduler:
+    def __init__(self, intervals=None, database=None, tick=SCHEDULER_TICK, runner=run_crawlers):
+        self.intervals = intervals if intervals is not None else CRAWL_INTERVALS
+        self.collection = (database if database is not None else db)["crawl_schedule"]
+        self.tick = tick
+        self.runner = runner
+        # 每個 worker 一個獨一無二的 owner id
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task = None
+        self._active = {}   # source -> 執行中的 task (process 內的 single-flight，也避免 task 被 GC)
+
+    # ------------------------------------------
+    # 生命週期 (由 FastAPI lifespan 呼叫)
+    # ------------------------------------------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            print(f"⏰ [Scheduler] 啟動 (owner={self.owner})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            for source in self.intervals:
+                self.spawn(source)
+            await asyncio.sleep(self.tick)
+
+    def spawn(self, source, force=False):
+        """在背景啟動一個來源；該來源已在執行中時回傳 False"""
+        if source in self._active:
+            return False
+        task = asyncio.create_task(self.run_source(source, force))
+        self._active[source] = task
+        task.add_done_callback(lambda _: self._active.pop(source, None))
+        return True
+
+    # ------------------------------------------
+    # 執行
+    # ------------------------------------------
+    async def trigger(self, sources=None):
+        """手動觸發 (不等到期)；已在執行中的來源會略過。回傳 {source: 是否啟動}"""
+        return {source: self.spawn(source, force=True) for source in sources or list(self.intervals)}
+
+    async def run_source(self, source, force=False):
+        lease = await asyncio.to_thread(self._acquire, source, force)
+        if lease is None:
+            return None  # 還沒到期，或其他 worker 正在跑
+
+        started = time.monotonic()
+        counts, error = {}, None
+        try:
+            # 爬蟲會解析 HTML、呼叫同步的 pymongo，放到獨立 thread + event loop，不卡住 API
+            counts = await self._run_with_lease(source, asyncio.to_thread(asyncio.run, self.runner(sources=(source,))))
+            if counts.get("errors"):
+                error = "; ".join(f"{k}: {v}" for k, v in counts["errors"].items())
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        await asyncio.to_thread(self._release, source, lease, time.monotonic() - started, counts, error)
+        return counts
+
+    async def _run_with_lease(self, source, work):
+        """
+        等待 work 完成，期間每 LEASE_RENEW_SECONDS 續約一次。
+        thread 內的爬蟲無法中途取消，因此不設逾時：lease 一直保留到它真的結束，其他 worker 不會重疊執行
+        """
+        work = asyncio.ensure_future(work)
+        started = time.monotonic()
+        warned = False
+        while True:
+            done, _ = await asyncio.wait({work}, timeout=LEASE_RENEW_SECONDS)
+            if done:
+                return work.result()
+            if not await asyncio.to_thread(self._renew, source):
+                print(f"⚠️ [Scheduler] {source} 的 lease 已被其他 worker 取得")
+            if not warned and time.monotonic() - started > LEASE_SECONDS:
+                warned = True
+                print(f"⚠️ [Scheduler] {source} 已執行超過 {LEASE_SECONDS}s，仍在等待完成")
+
+    # ------------------------------------------
+    # lease (跨 worker 互斥)
+    # ------------------------------------------
+    def _acquire(self, source, force):
+        now = datetime.now()
+        filter = {"_id": source, "lease_expires_at": {"$not": {"$gt": now}}}
+        if not force:
+            filter["next_run_at"] = {"$not": {"$gt": now}}
+        try:
+            return self.collection.find_one_and_update(
+                filter,
+                {"$set": {
+                    "owner": self.owner,
+                    "running": True,
+                    "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                    "last_started_at": now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # 文件存在但條件不符 (未到期或 lease 仍有效)，upsert 撞到同一個 _id
+            return None
+
+    def _renew(self, source):
+        result = self.collection.update_one(
+            {"_id": source, "owner": self.owner},
+            {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=LEASE_SECONDS)}},
+        )
+        return result.matched_count == 1
+
+    def _release(self, source, lease, duration, counts, error):
+        failures = lease.get("failures", 0) + 1 if error else 0
+        now = datetime.now()
+        next_run_at = now + timedelta(seconds=next_delay(self.intervals[source], failures))
+        self.collection.update_one({"_id": source, "owner": self.owner}, {"$set": {
+            "running": False,
+            "lease_expires_at": now,
+            "last_finished_at": now,
+            "last_duration": round(duration, 3),
+            "last_counts": {k: v for k, v in counts.items() if k != "errors"},
+            "last_error": error,
+            "failures": failures,
+            "next_run_at": next_run_at,
+        }})
+        if error:
+            print(f"❌ [Scheduler] {source} 失敗 (連續 {failures} 次)，{next_run_at:%H:%M:%S} 重試: {error}")
+        else:
+            print(f"✅ [Scheduler] {source} 完成，耗時 {duration:.1f}s，下次 {next_run_at:%H:%M:%S}")
+
+    # ------------------------------------------
+    # 狀態
+    # ------------------------------------------
+    def status(self):
+        docs = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": list(self.intervals)}})}
+        result = []
+        for source, interval in self.intervals.items():
+            doc = docs.get(source, {})
+            result.append({
+                "source": source,
+                "interval_seconds": interval,
+                "running": doc.get("running", False),
+                "owner": doc.get("owner"),
+                "last_started_at": doc.get("last_started_at"),
+                "last_finished_at": doc.get("last_finished_at"),
+                "last_duration": doc.get("last_duration"),
+                "last_counts": doc.get("last_counts"),
+                "last_error": doc.get("last_error"),
+                "failures": doc.get("failures", 0),
+                "next_run_at": doc.get("next_run_at"),
+            })
+        return result
+
+
+crawl_scheduler = CrawlScheduler()
@@ -0,0 +1,453 @@
+import base64
+import copy
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import ReturnDocument, UpdateOne
+
+from db.mongo import db
+from util.config import env
+
+# ==========================================
+# 輿情全文檢索 (raw_articles 的標題 + 內文)
+#   斷詞：NFKC + 小寫後，連續的中日韓文字切成字元 bigram (「普拿疼」-> 普拿、拿疼)，
+#         英數整段當一個詞 (BNT、covid19)；單一中文字不建索引。
+#   倒排索引 (search_postings)：每個 term 一串 bucket 文件，追加寫入，每個 bucket 最多 BUCKET_SIZE 筆；
+#       查詢端以 LRU 快取解碼後的 bucket (n 沒變就不重讀)
+#       {term: "缺貨", n: 3, d: [文件編號...], f: [詞頻...], updated_at}
+#   文件表 (search_docs)：{_id: 文件編號, a: raw_articles._id, s: 來源, t: crawled_at, l: 文件長度}
+#       文件編號由 search_state 的計數器分配 (遞增整數)；查詢端整份載入記憶體 (numpy 陣列)，
+#       之後每 REFRESH_SECONDS 秒只讀編號較大的新文件，來源 / 日期篩選與 BM25 的文件長度都不必再查 DB。
+#
+# 寫入：爬蟲 BulkWriteBuffer.on_insert 的新文章先在記憶體斷詞，一輪爬取結束時 flush() 一次寫回
+#       (重爬同一篇是 update，不會重複建索引)。
+# 查詢：讀回各查詢詞的 postings -> 交集 (全部 term 都要出現) -> 篩選 -> BM25 排序
+#       -> keyset 分頁 (score, 文件編號)，最後才依 _id 讀回這一頁的文章。
+# 保留：search_docs 與 search_postings 以 TTL 跟著熱層過期 (HOT_RETENTION_DAYS + 封存延遲 + 1 天)；
+#       postings bucket 的文件編號是遞增的，最後一次追加也超過保留期時，整個 bucket 裡的文件都已過期。
+# ==========================================
+POSTINGS_COLLECTION = "search_postings"
+DOCS_COLLECTION = "search_docs"
+STATE_COLLECTION = "search_state"
+BUCKET_SIZE = 20000
+CONTENT_CHARS = 2000        # 內文只取前 N 字建索引 (深度爬取的長文不會讓 postings 暴增)
+TITLE_BOOST = 2             # 標題的詞頻加權
+MAX_TF = 255
+K1, B = 1.2, 0.75
+REFRESH_SECONDS = 5
+TAIL_OVERLAP = 10000        # 補讀時往回多看的編號數 (其他 worker 較晚寫入、編號較小的文件)
+MAX_PAGE_SIZE = 100
+POSTINGS_CACHE_SIZE = 20_000_000    # 查詢端快取的 postings 筆數上限 (約 100MB)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+SEARCH_PROJECTION = {"_id": 1, "source": 1, "board": 1, "title": 1, "url": 1, "crawled_at": 1, "cluster_id": 1,
+                     "content": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, 60]}}
+
+
+def retention_seconds():
+    """索引保留期：比熱層多留封存延遲 + 1 天，文章還在時索引一定還在"""
+    return (env.HOT_RETENTION_DAYS + env.ROLLUP_AFTER_DAYS + 1) * 24 * 60 * 60
+
+
+def tokenize(text):
+    """回傳 term 列表 (可重複)"""
+    terms = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if run.isascii():
+            if len(run) > 1:
+                terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def query_terms(query):
+    """查詢字串 -> 不重複的 term (保留順序)"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def doc_terms(article):
+    """文章 -> Counter(term -> 詞頻)；標題加權，內文與標題相同時 (PTT 列表、新聞) 不重複計算"""
+    title = article.get("title") or ""
+    content = (article.get("content") or "")[:CONTENT_CHARS]
+    counts = Counter()
+    for term in tokenize(title):
+        counts[term] += TITLE_BOOST
+    if content and content != title:
+        counts.update(tokenize(content))
+    return counts
+
+
+def encode_cursor(key, docno):
+    return base64.urlsafe_b64encode(f"{key!r}:{docno}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """無效的 cursor 丟 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        key, docno = raw.rsplit(":", 1)
+        return float(key), int(docno)
+    except Exception as e:
+        raise ValueError(f"無效的 cursor: {cursor}") from e
+
+
+def merge_chunks(chunks):
+    """各 bucket 的 postings 接成一串並依文件編號排序 (通常本來就有序，只有多個 worker 交錯寫入時才需要排序)"""
+    if not chunks:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint8)
+    chunks = sorted(chunks, key=lambda c: c[0][0] if len(c[0]) else 0)
+    docnos = np.concatenate([c[0] for c in chunks])
+    tfs = np.concatenate([c[1] for c in chunks])
+    if len(docnos) > 1 and not np.all(docnos[1:] > docnos[:-1]):
+        docnos, first = np.unique(docnos, return_index=True)
+        tfs = tfs[first]
+    return docnos, tfs
+
+
+def locate(sorted_docnos, docnos):
+    """
+    docnos (已排序) 在 sorted_docnos 裡的位置，回傳 (是否出現, 位置)。
+    候選遠少於 postings 時二分搜尋；差不多多時改用文件編號區間的稠密對照表 (兩邊各掃一次)
+    """
+    if len(docnos) * 16 < len(sorted_docnos):
+        pos = np.minimum(np.searchsorted(sorted_docnos, docnos), len(sorted_docnos) - 1)
+        return sorted_docnos[pos] == docnos, pos
+    low = int(min(sorted_docnos[0], docnos[0]))
+    lookup = np.full(int(max(sorted_docnos[-1], docnos[-1])) - low + 1, -1, dtype=np.int32)
+    lookup[sorted_docnos.astype(np.int64) - low] = np.arange(len(sorted_docnos), dtype=np.int32)
+    pos = lookup[docnos.astype(np.int64) - low]
+    return pos >= 0, pos
+
+
+class DocTable:
+    """文件編號 -> (raw_articles._id, 來源代碼, crawled_at 秒數, 長度)，以編號 - base 為陣列索引"""
+
+    def __init__(self):
+        self.base = None
+        self.size = 0
+        self.ids = np.empty(0, dtype=object)
+        self.times = np.zeros(0, dtype=np.int64)
+        self.sources = np.zeros(0, dtype=np.uint8)
+        self.lengths = np.zeros(0, dtype=np.uint32)     # 0 = 不存在 (未載入或已過期)
+        self.source_codes = {}
+        self.count = 0
+        self.total_length = 0
+        self.max_docno = 0
+
+    def _grow(self, needed, shift=0):
+        """
+        擴充到至少 needed 格；shift > 0 時既有資料往後移 shift 格 (base 往下延伸)。
+        一律換成新陣列、不在原陣列上搬移，已取出的 snapshot() 仍對應自己的 base。
+        """
+        capacity = max(needed, len(self.lengths) * 2, 1024)
+        for name in ("ids", "times", "sources", "lengths"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=object) if name == "ids" else np.zeros(capacity, dtype=old.dtype)
+            new[shift:shift + len(old)] = old
+            setattr(self, name, new)
+
+    def snapshot(self):
+        """
+        查詢用的快照 (呼叫端持有 SearchIndex._lock)：base / size / 計數固定在當下，陣列共用。
+        之後的 add() 只會填入快照範圍外或長度為 0 的格子，擴充或往下延伸則換成新陣列。
+        """
+        view = copy.copy(self)
+        view.source_codes = dict(self.source_codes)
+        return view
+
+    def source_code(self, source):
+        return self.source_codes.setdefault(source, len(self.source_codes) + 1)
+
+    def add(self, docno, article_id, source, crawled_at, length):
+        if length <= 0:
+            return
+        if self.base is None:
+            self.base = docno
+        index = docno - self.base
+        if index < 0:
+            # 其他 worker 較早配到、較晚寫入的編號：base 往下延伸，不丟掉這篇
+            self._grow(len(self.lengths) - index, shift=-index)
+            self.size -= index
+            self.base = docno
+            index = 0
+        if index >= len(self.lengths):
+            self._grow(index + 1)
+        if self.lengths[index]:
+            return      # 已載入
+        self.ids[index] = article_id
+        self.times[index] = int(crawled_at.timestamp())
+        self.sources[index] = self.source_code(source)
+        self.lengths[index] = length
+        self.size = max(self.size, index + 1)
+        self.count += 1
+        self.total_length += length
+        self.max_docno = max(self.max_docno, docno)
+
+
+class SearchIndex:
+    """
+    database 可傳入測試用的 Database；persist=False 時 postings 與文件表只存在記憶體
+    (CrawlEngine(persist=False) 與 benchmark 使用)
+    """
+
+    def __init__(self, database=None, persist=True):
+        database = database if database is not None else db
+        self.persist = persist
+        self.postings = database[POSTINGS_COLLECTION] if persist else None
+        self.docs = database[DOCS_COLLECTION] if persist else None
+        self.state = database[STATE_COLLECTION] if persist else None
+        self.table = DocTable()
+        self._memory = {}       # persist=False：term -> [(docnos, tfs)]
+        self._next_docno = 1    # persist=False 的編號
+        self._pending = []      # (article_id, source, crawled_at, Counter)
+        self._cache = OrderedDict()     # Mongo bucket _id -> (n, docnos, tfs)，LRU
+        self._cached_postings = 0
+        self._lock = threading.Lock()
+        self.loaded = not persist
+        self._refreshed_at = 0.0
+
+    def __len__(self):
+        return self.table.count
+
+    # ------------------------------------------
+    # 寫入 (爬蟲)
+    # ------------------------------------------
+    def index_inserted(self, docs):
+        """BulkWriteBuffer.on_insert 的 raw_articles 新文件：先斷詞，flush() 時寫回"""
+        pending = []
+        for doc in docs:
+            counts = doc_terms(doc)
+            if counts:
+                pending.append((doc["_id"], doc.get("source", ""), doc.get("crawled_at") or datetime.now(), counts))
+        with self._lock:
+            self._pending.extend(pending)
+
+    def _allocate(self, n):
+        if not self.persist:
+            start, self._next_docno = self._next_docno, self._next_docno + n
+            return start
+        state = self.state.find_one_and_update({"_id": "docno"}, {"$inc": {"next": n}}, upsert=True,
+                                               return_document=ReturnDocument.AFTER)
+        return state["next"] - n + 1
+
+    def flush(self):
+        """寫回累積的文件與 postings，回傳建立索引的文章數"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        start = self._allocate(len(pending))
+        postings = {}   # term -> ([docno], [tf])
+        docs = []
+        for docno, (article_id, source, crawled_at, counts) in enumerate(pending, start):
+            length = sum(counts.values())
+            docs.append({"_id": docno, "a": article_id, "s": source, "t": crawled_at, "l": length})
+            for term, tf in counts.items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(docno)
+                entry[1].append(min(tf, MAX_TF))
+
+        if self.persist:
+            now = datetime.now()
+            self.docs.insert_many(docs, ordered=False)
+            self.postings.bulk_write([
+                UpdateOne({"term": term, "n": {"$lt": BUCKET_SIZE}},
+                          {"$push": {"d": {"$each": docnos}, "f": {"$each": tfs}},
+                           "$inc": {"n": len(docnos)}, "$set": {"updated_at": now}},
+                          upsert=True)
+                for term, (docnos, tfs) in postings.items()
+            ], ordered=False)
+        else:
+            for term, (docnos, tfs) in postings.items():
+                self._memory.setdefault(term, []).append(
+                    (np.array(docnos, dtype=np.uint32), np.array(tfs, dtype=np.uint8)))
+        if self.loaded:
+            # 還沒載入時不加 (load() 只讀保留期內的文件)，由 load() / refresh() 從 DB 讀到
+            with self._lock:
+                for doc in docs:
+                    self.table.add(doc["_id"], doc["a"], doc["s"], doc["t"], doc["l"])
+        return len(docs)
+
+    # ------------------------------------------
+    # 載入 (查詢端)
+    # ------------------------------------------
+    def load(self):
+        """App 啟動時在背景 thread 呼叫：讀入保留期內的文件表"""
+        if not self.persist:
+            return
+        since = datetime.now() - timedelta(seconds=retention_seconds())
+        self._load({"t": {"$gte": since}})
+        self.loaded = True
+        print(f"✅ [Search] 載入 {len(self)} 篇文章的索引")
+
+    def _load(self, filter):
+        cursor = self.docs.find(filter, {"a": 1, "s": 1, "t": 1, "l": 1}).sort("_id", 1).batch_size(10000)
+        with self._lock:
+            for doc in cursor:
+                self.table.add(doc["_id"], doc["a"], doc["s"], doc["t"], doc["l"])
+        self._refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """載入其他 worker (或爬蟲 process) 新寫入的文件"""
+        if not self.persist:
+            return
+        if not self.loaded:
+            self.load()
+            return
+        if time.monotonic() - self._refreshed_at >= REFRESH_SECONDS:
+            self._load({"_id": {"$gt": max(self.table.max_docno - TAIL_OVERLAP, 0)}})
+
+    def _read_postings(self, terms):
+        """
+        term -> [(docnos, tfs), ...] (各 bucket 一段，不保證順序)
+        Mongo 版先只讀 bucket 的 _id / n (索引 term_n_id 涵蓋)，n 沒變的 bucket 直接用快取：
+        裝滿的 bucket 不會再變，通常只有每個 term 最後一個 bucket 需要重讀。
+        """
+        chunks = {term: [] for term in terms}
+        if not self.persist:
+            for term in terms:
+                chunks[term] = list(self._memory.get(term, ()))
+            return chunks
+
+        buckets = list(self.postings.find({"term": {"$in": terms}}, {"_id": 1, "term": 1, "n": 1}))
+        found = {}
+        with self._lock:
+            for bucket in buckets:
+                cached = self._cache.get(bucket["_id"])
+                if cached is not None and cached[0] == bucket["n"]:
+                    self._cache.move_to_end(bucket["_id"])
+                    found[bucket["_id"]] = cached[1:]
+        stale = [bucket["_id"] for bucket in buckets if bucket["_id"] not in found]
+        if stale:
+            for doc in self.postings.find({"_id": {"$in": stale}}, {"n": 1, "d": 1, "f": 1}):
+                found[doc["_id"]] = (np.array(doc["d"], dtype=np.uint32), np.array(doc["f"], dtype=np.uint8))
+                self._cache_put(doc["_id"], doc["n"], *found[doc["_id"]])
+        for bucket in buckets:
+            if bucket["_id"] in found:
+                chunks[bucket["term"]].append(found[bucket["_id"]])
+        return chunks
+
+    def _cache_put(self, bucket_id, n, docnos, tfs):
+        with self._lock:
+            old = self._cache.pop(bucket_id, None)
+            if old is not None:
+                self._cached_postings -= len(old[1])
+            self._cache[bucket_id] = (n, docnos, tfs)
+            self._cached_postings += len(docnos)
+            while self._cached_postings > POSTINGS_CACHE_SIZE and len(self._cache) > 1:
+                _, (_, evicted, _) = self._cache.popitem(last=False)
+                self._cached_postings -= len(evicted)
+
+    # ------------------------------------------
+    # 查詢
+    # ------------------------------------------
+    def search(self, query, sources=None, since=None, until=None, limit=20, cursor=None, sort="relevance"):
+        """
+        回傳 {"total", "hits": [{"docno", "article_id", "score", "crawled_at"}], "next_cursor"}
+        sort："relevance" (BM25，同分依新到舊) 或 "date" (crawled_at 新到舊)
+        查詢沒有可用的 term (例如只有單一中文字) 時丟 ValueError
+        """
+        terms = query_terms(query)
+        if not terms:
+            raise ValueError("查詢至少要有兩個連續中文字或一個英數詞")
+        after = decode_cursor(cursor) if cursor else None
+        self.refresh()
+
+        postings = {term: merge_chunks(chunks) for term, chunks in self._read_postings(terms).items()}
+        # refresh() / flush() 可能同時在其他 thread 擴充文件表：base、size 與陣列要取自同一時間點
+        with self._lock:
+            table = self.table.snapshot()
+        if table.base is None or any(len(docnos) == 0 for docnos, _ in postings.values()):
+            return {"total": 0, "hits": [], "next_cursor": None}
+
+        # 由最少的 term 開始，逐一確認候選是否也出現在其他 term 並取出詞頻
+        terms.sort(key=lambda t: len(postings[t][0]))
+        docnos, first_tfs = postings[terms[0]]
+        tfs = [first_tfs]
+        for term in terms[1:]:
+            other, other_tfs = postings[term]
+            hit, pos = locate(other, docnos)
+            docnos, pos = docnos[hit], pos[hit]
+            tfs = [tf[hit] for tf in tfs] + [other_tfs[pos]]
+
+        # 篩選：文件表裡要有 (未過期)、保留期內、來源、日期
+        index = docnos.astype(np.int64) - table.base
+        inside = (index >= 0) & (index < table.size)
+        index, docnos, tfs = index[inside], docnos[inside], [tf[inside] for tf in tfs]
+        times = table.times[index]
+        keep = (table.lengths[index] > 0) & (times >= time.time() - retention_seconds())
+        if sources:
+            keep &= np.isin(table.sources[index], [table.source_codes[s] for s in sources if s in table.source_codes])
+        if since is not None:
+            keep &= times >= int(since.timestamp())
+        if until is not None:
+            keep &= times < int(until.timestamp())
+        index, docnos, times = index[keep], docnos[keep].astype(np.int64), times[keep]
+        total = len(index)
+
+        if sort == "date":
+            keys = times.astype(np.float64)
+        else:
+            n_docs = max(table.count, 1)
+            norm = K1 * (1 - B + B * table.lengths[index] / (table.total_length / n_docs))
+            keys = np.zeros(total)
+            for term, tf in zip(terms, tfs):
+                df = len(postings[term][0])
+                idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                tf = tf[keep].astype(np.float64)
+                keys += idf * tf * (K1 + 1) / (tf + norm)
+            keys = np.round(keys, 6)
+
+        # keyset：(key, docno) 由大到小，只取 cursor 之後的
+        if after is not None:
+            page = (keys < after[0]) | ((keys == after[0]) & (docnos < after[1]))
+            docnos, index, keys, times = docnos[page], index[page], keys[page], times[page]
+        remaining = len(keys)
+        if remaining > limit:
+            # 先用 partition 縮小到 >= 第 limit 名分數的集合，再完整排序
+            threshold = -np.partition(-keys, limit - 1)[limit - 1]
+            top = keys >= threshold
+            docnos, index, keys, times = docnos[top], index[top], keys[top], times[top]
+        order = np.lexsort((-docnos, -keys))[:limit]
+
+        hits = [{"docno": int(docnos[i]), "article_id": table.ids[index[i]],
+                 "score": float(keys[i]) if sort == "relevance" else None,
+                 "crawled_at": datetime.fromtimestamp(int(times[i]))} for i in order]
+        next_cursor = None
+        if remaining > limit:
+            last = order[-1]
+            next_cursor = encode_cursor(float(keys[last]), int(docnos[last]))
+        return {"total": total, "hits": hits, "next_cursor": next_cursor}
+
+
+# API 與爬蟲共用的 singleton (爬蟲寫入後同一個 process 的查詢立刻看得到)
+search_index = SearchIndex()
+
+
+def search_articles(query, sources=None, since=None, until=None, limit=20, cursor=None, sort="relevance",
+                    index=None, database=None):
+    """查詢並依 _id 讀回這一頁的文章 (已被 TTL 刪除的略過)"""
+    index = index if index is not None else search_index
+    database = database if database is not None else db
+    started = time.perf_counter()
+    result = index.search(query, sources, since, until, limit, cursor, sort)
+    ids = [hit["article_id"] for hit in result["hits"]]
+    articles = {doc["_id"]: doc for doc in database.raw_articles.find({"_id": {"$in": ids}}, SEARCH_PROJECTION)}
+    items = []
+    for hit in result["hits"]:
+        article = articles.get(hit["article_id"])
+        if article is None:
+            continue
+        article["id"] = str(article.pop("_id"))
+        if article.get("cluster_id") is not None:
+            article["cluster_id"] = str(article["cluster_id"])
+        items.append({**article, "score": hit["score"]})
+    return {"query": query, "terms": query_terms(query), "total": result["total"], "items": items,
+            "next_cursor": result["next_cursor"], "took_ms": round((time.perf_counter() - started) * 1000, 1)}
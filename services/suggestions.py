@@ -0,0 +1,167 @@
+import numpy as np
+
+from services.keywords import keyword_matcher
+
+# ==========================================
+# 補貨 / 促銷建議引擎
+#   輸入：門市每個 SKU 的最新庫存、售價、成本與銷售窗口，
+#         以欄位式 dict 傳入 (見 dashboard_queries.sku_window_stages)，直接轉成 NumPy 陣列
+#   對全部 SKU 一次向量化計算：
+#     velocity      每日銷量 = 窗口銷量 / 窗口天數
+#     demand        velocity x 輿情需求加成 (該分類最近被討論的程度)
+#     days_of_cover 庫存可賣幾天 = on_hand / demand
+#     margin        (售價 - 成本) / 售價，缺資料時用 DEFAULT_MARGIN
+#   再用 argpartition 取前 k 名，不必整個排序。
+#
+# inventory 文件欄位：sku_id, closing_on_hand 必有；
+#   sold_qty (當日銷量)、unit_price、unit_cost、name、category 為選填。
+#   沒有銷量資料的 SKU 退回舊規則 (庫存 < 30 補貨、> 100 促銷)，排在有銷量依據的 SKU 之後。
+# ==========================================
+LOW_STOCK_THRESHOLD = 30
+HIGH_STOCK_THRESHOLD = 100
+RESTOCK_COVER_DAYS = 7      # 庫存撐不到 7 天 -> 補貨
+CRITICAL_COVER_DAYS = 3
+PROMO_COVER_DAYS = 45       # 庫存超過 45 天的量 -> 促銷去化
+DEFAULT_MARGIN = 0.3
+LIFT_WEIGHT = 1.0           # 某分類佔全部輿情的比例 x 權重 = 需求加成
+
+# SKU 分類 -> 輿情關鍵字 (SKU 沒有 category 欄位時，依 sku_id 是否包含分類名稱判斷)
+SKU_CATEGORY_TERMS = {
+    "感冒": ["感冒", "流感", "發燒", "咳嗽", "喉嚨痛", "感冒藥", "退燒藥", "止咳", "化痰"],
+    "保健": ["維他命", "維生素", "保健食品", "營養品", "益生菌", "魚油", "鈣片", "葉黃素"],
+    "婦嬰": ["懷孕", "產後", "哺乳", "母乳", "嬰兒", "幼兒", "兒童", "寶寶"],
+    "腸胃": ["腹瀉", "便秘", "腸胃", "胃痛", "胃藥", "噁心", "嘔吐"],
+    "皮膚": ["過敏", "皮膚炎", "濕疹", "蕁麻疹", "痘痘", "粉刺", "紅疹", "癢", "藥膏", "軟膏"],
+    "痠痛": ["頭痛", "止痛藥", "消炎藥", "貼布", "酸痛貼布", "關節炎"],
+}
+
+
+def sku_category(sku_id, category=None):
+    if category:
+        return category
+    for name in SKU_CATEGORY_TERMS:
+        if name in sku_id:
+            return name
+    return None
+
+
+def demand_lift(titles, weight=LIFT_WEIGHT):
+    """
+    各 SKU 分類的輿情需求加成：1 + weight x (提到該分類的文章比例)
+    回傳 {category: lift}
+    """
+    titles = [t for t in titles if t]
+    if not titles:
+        return {}
+    counts = dict.fromkeys(SKU_CATEGORY_TERMS, 0)
+    for title in titles:
+        found = set(keyword_matcher.match(title).keywords)
+        for category, terms in SKU_CATEGORY_TERMS.items():
+            if found.intersection(terms):
+                counts[category] += 1
+    return {category: 1 + weight * n / len(titles) for category, n in counts.items()}
+
+
+class SkuArrays:
+    """欄位式 SKU 資料轉成 NumPy 陣列 (只轉一次，評分全部在陣列上做)"""
+
+    def __init__(self, columns, lift=None):
+        self.columns = columns
+        self.on_hand = np.asarray(columns["on_hand"], dtype=float)
+        self.sold = np.asarray(columns["sold"], dtype=float)
+        price = np.asarray(columns["unit_price"], dtype=float)
+        cost = np.asarray(columns["unit_cost"], dtype=float)
+        # 0 代表沒有資料
+        self.price = np.where(price > 0, price, np.nan)
+        self.cost = np.where(cost > 0, cost, np.nan)
+        self.lift = self._lift(columns, lift or {})
+
+    @staticmethod
+    def _lift(columns, lift):
+        # 分類通常只有幾十種：先對不同的 (sku_id 推斷的) 分類查表，再用 map 展開
+        categories = columns["category"]
+        if not all(categories):
+            categories = [c or sku_category(sku_id) for sku_id, c in zip(columns["sku_id"], categories)]
+        table = {c: lift.get(c, 1.0) for c in set(categories)}
+        return np.fromiter(map(table.__getitem__, categories), float, len(categories))
+
+
+class SkuScores:
+    def __init__(self, arrays, window_days):
+        a = arrays
+        self.velocity = a.sold / window_days
+        self.demand = self.velocity * a.lift
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cover = np.where(self.demand > 0, a.on_hand / self.demand, np.inf)
+            margin = (a.price - a.cost) / a.price
+        self.margin = np.where(np.isfinite(margin), margin, DEFAULT_MARGIN)
+
+        has_sales = self.demand > 0
+        # 補貨：庫存撐不到 RESTOCK_COVER_DAYS 天，越急、賣越快、毛利越高越優先
+        urgent = has_sales & (self.cover < RESTOCK_COVER_DAYS)
+        with np.errstate(invalid="ignore"):     # 沒有銷量：inf x 0，結果由下面的 where 排除
+            restock = (1 - self.cover / RESTOCK_COVER_DAYS) * self.demand * (0.5 + self.margin)
+        # 沒有銷量資料：庫存低於門檻者排在最後，依庫存多寡與輿情加成排序
+        fallback = ~has_sales & (a.on_hand < LOW_STOCK_THRESHOLD)
+        fallback_score = (1 - a.on_hand / LOW_STOCK_THRESHOLD) * a.lift * 1e-6
+        self.restock = np.where(urgent, restock, np.where(fallback, fallback_score, -np.inf))
+
+        # 促銷：超過 PROMO_COVER_DAYS 天銷量的庫存，積壓的金額越大越優先；有人討論 (lift) 的更好推
+        excess = a.on_hand - self.demand * PROMO_COVER_DAYS
+        unit_value = np.where(np.isfinite(a.cost), a.cost, 1.0)
+        overstock = (excess > 0) & (a.on_hand > HIGH_STOCK_THRESHOLD)
+        self.promotion = np.where(overstock, excess * unit_value * a.lift, -np.inf)
+
+
+def top_k(scores, k):
+    """分數最高的 k 個索引 (由高到低)；-inf 視為不列入"""
+    candidates = np.flatnonzero(np.isfinite(scores))
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+# 沒有 name 欄位時的顯示名稱：sku_id 包含關鍵字 -> 名稱
+RESTOCK_DISPLAY_NAMES = {"保健": "綜合感冒藥", "婦嬰": "兒童退燒水"}
+
+
+def _display_name(arrays, i, default, overrides=None):
+    if arrays.columns["name"][i]:
+        return arrays.columns["name"][i]
+    sku_id = arrays.columns["sku_id"][i]
+    name = next((v for k, v in (overrides or {}).items() if k in sku_id), default)
+    return f"{name} ({sku_id[-3:]})"
+
+
+def _item(arrays, scores, i, status, name):
+    cover = scores.cover[i]
+    return {
+        "sku_id": arrays.columns["sku_id"][i],
+        "name": name,
+        "stock": int(arrays.on_hand[i]),
+        "margin": round(float(scores.margin[i]) * 100, 1),
+        "sales_7d": int(arrays.sold[i]),
+        "days_of_cover": round(float(cover), 1) if np.isfinite(cover) else None,
+        "demand_lift": round(float(arrays.lift[i]), 2),
+        "status": status,
+    }
+
+
+def suggest(columns, lift=None, window_days=7, restock_k=5, promotion_k=3):
+    """
+    對門市全部 SKU 評分，回傳 (補貨清單, 促銷清單)，格式與週報 suggestions.items 相同
+    """
+    if not columns["sku_id"]:
+        return [], []
+    arrays = SkuArrays(columns, lift)
+    scores = SkuScores(arrays, window_days)
+
+    restock = []
+    for i in top_k(scores.restock, restock_k):
+        status = "Critical" if scores.cover[i] < CRITICAL_COVER_DAYS or arrays.on_hand[i] == 0 else "Low"
+        restock.append(_item(arrays, scores, i, status, _display_name(arrays, i, "熱銷藥品", RESTOCK_DISPLAY_NAMES)))
+    promotion = [
+        _item(arrays, scores, i, "Safe", _display_name(arrays, i, "維他命/噴劑"))
+        for i in top_k(scores.promotion, promotion_k)
+    ]
+    return restock, promotion
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from db.mongo import db
+from util.gemini import DEFAULT_TALKING_POINT, build_talking_point_prompt, get_model
+
+# ==========================================
+# 藥師話術服務 (把 Gemini 呼叫移出 Dashboard 請求路徑)
+#   - 內容定址快取：key = sha256(topic, products, reason)
+#     記憶體 LRU 在前，Mongo talking_point_cache 集合在後 (TTL index 自動淘汰，見 db/indexes.py)
+#   - 同樣的 prompt 同時被要求時只打一次 Gemini (request coalescing)
+#   - 超過 timeout 就回傳預設話術；背景的呼叫繼續跑完並寫入快取
+#   - 爬蟲跑完可呼叫 pregenerate() 先把話術生好
+# ==========================================
+TALKING_POINT_TTL = 24 * 3600   # 秒
+TALKING_POINT_TIMEOUT = 3.0     # 秒
+MEMORY_CACHE_SIZE = 512
+
+
+def talking_point_key(topic, products, reason):
+    payload = json.dumps([topic, list(products), reason], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TalkingPointService:
+    """
+    所有呼叫都在自己的背景 event loop thread 上執行，
+    因此同步 (threadpool) 與非同步呼叫端共用同一份 in-flight 表與快取。
+
+    model_factory 需回傳具備 async generate_content_async(prompt) 的物件
+    (預設為 Gemini；離線測試可傳入假的 model)。
+    database=None 時使用 db.mongo；persist=False 則只用記憶體快取。
+    """
+
+    def __init__(self, model_factory=get_model, database=None, persist=True,
+                 timeout=TALKING_POINT_TIMEOUT, ttl=TALKING_POINT_TTL, maxsize=MEMORY_CACHE_SIZE):
+        self.model_factory = model_factory
+        self.collection = (database if database is not None else db)["talking_point_cache"] if persist else None
+        self.timeout = timeout
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._memory = OrderedDict()    # key -> (text, expires_at)
+        self._inflight = {}             # key -> asyncio.Task
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # ------------------------------------------
+    # 背景 event loop
+    # ------------------------------------------
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="talking-points", daemon=True).start()
+            return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+
+    # ------------------------------------------
+    # 對外 API
+    # ------------------------------------------
+    async def generate(self, topic, products, reason):
+        """非同步取得話術 (任何 event loop 皆可 await)，超時回傳預設話術"""
+        future = self._submit(self._get_or_generate(topic, list(products), reason))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except Exception:
+            return DEFAULT_TALKING_POINT
+
+    def generate_sync(self, topic, products, reason):
+        """同步版本，給 threadpool 內的同步程式碼使用"""
+        future = self._submit(self._get_or_generate(topic, list(products), reason))
+        try:
+            return future.result(self.timeout)
+        except Exception:
+            return DEFAULT_TALKING_POINT
+
+    def pregenerate(self, prompts):
+        """
+        背景預先生成話術 (不等待結果)。
+        prompts: [(topic, products, reason), ...]
+        """
+        for topic, products, reason in prompts:
+            self._submit(self._get_or_generate(topic, list(products), reason))
+
+    # ------------------------------------------
+    # 內部實作 (只在背景 loop 上執行)
+    # ------------------------------------------
+    async def _get_or_generate(self, topic, products, reason):
+        key = talking_point_key(topic, products, reason)
+
+        text = self._memory_get(key)
+        if text is not None:
+            return text
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_or_call(key, topic, products, reason))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：呼叫端超時取消時，不影響正在進行的生成
+        return await asyncio.shield(task)
+
+    async def _load_or_call(self, key, topic, products, reason):
+        if self.collection is not None:
+            doc = await asyncio.to_thread(self._store_get, key)
+            if doc is not None:
+                self._memory_set(key, doc["text"])
+                return doc["text"]
+
+        # 第一次建立 model 時才 import Gemini SDK (約 1 秒)，丟到 thread 避免卡住 event loop
+        model = await asyncio.to_thread(self.model_factory)
+        response = await model.generate_content_async(build_talking_point_prompt(topic, products, reason))
+        text = response.text.strip()
+
+        self._memory_set(key, text)
+        if self.collection is not None:
+            await asyncio.to_thread(self._store_set, key, text, topic, products, reason)
+        return text
+
+    def _memory_get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        text, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return text
+
+    def _memory_set(self, key, text):
+        self._memory[key] = (text, time.monotonic() + self.ttl)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _store_get(self, key):
+        return self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+
+    def _store_set(self, key, text, topic, products, reason):
+        now = datetime.now(timezone.utc)
+        self.collection.update_one({"_id": key}, {"$set": {
+            "text": text,
+            "topic": topic,
+            "products": products,
+            "reason": reason,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }}, upsert=True)
+
+
+talking_points = TalkingPointService()
@@ -0,0 +1,142 @@
+import threading
+from collections import Counter
+from datetime import date as date_type, datetime, timedelta
+
+from pymongo import UpdateOne
+
+from db.mongo import db, get_async_db
+
+# ==========================================
+# 話題熱度時間序列 (topic_heat 集合)
+#   每個 (kind, term, 日期) 一份文件，內含當日總數與 24 小時分桶：
+#     {_id: "keyword:流感:2025-10-30", kind: "keyword", term: "流感", day: "2025-10-30",
+#      total: 12, hours: {"09": 3, "14": 9}}
+#   kind = "keyword" (HEALTH_KEYWORDS 命中的關鍵字) 或 "category" (健康分類)
+#
+# 爬蟲寫入時累加：只計算「新插入」的文章 (BulkWriteBuffer.on_insert)，重爬同一篇不會重複計算；
+# 一輪爬取結束時一次 $inc 寫回。
+# 趨勢查詢只讀 (kind, term, day) 索引上的 N 份日文件，成本是 O(天數)，不必掃描 raw_articles。
+# ==========================================
+HEAT_COLLECTION = "topic_heat"
+SPARKLINE_DAYS = 14
+KINDS = ("keyword", "category")
+
+
+def heat_id(kind, term, day):
+    return f"{kind}:{term}:{day}"
+
+
+def day_range(end_day, days):
+    end = date_type.fromisoformat(end_day)
+    return [(end - timedelta(days=days - 1 - i)).isoformat() for i in range(days)]
+
+
+class TopicHeatCounter:
+    """在記憶體累加各 (kind, term, 日, 時) 的提及次數，flush() 時寫回"""
+
+    def __init__(self, database=None, persist=True):
+        self.collection = (database if database is not None else db)[HEAT_COLLECTION] if persist else None
+        self._counts = Counter()    # (kind, term, day, hour) -> n
+        self._lock = threading.Lock()
+
+    def count_inserted(self, docs):
+        """BulkWriteBuffer.on_insert 的 raw_articles 文件 (帶 keywords / categories / crawled_at)"""
+        with self._lock:
+            for doc in docs:
+                seen = doc.get("crawled_at") or datetime.now()
+                day, hour = seen.date().isoformat(), f"{seen.hour:02d}"
+                for kind, field in (("keyword", "keywords"), ("category", "categories")):
+                    for term in set(doc.get(field) or ()):
+                        self._counts[(kind, term, day, hour)] += 1
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        merged = {}
+        for (kind, term, day, hour), n in counts.items():
+            inc = merged.setdefault((kind, term, day), {"total": 0})
+            inc["total"] += n
+            inc[f"hours.{hour}"] = inc.get(f"hours.{hour}", 0) + n
+        ops = [
+            UpdateOne({"_id": heat_id(kind, term, day)},
+                      {"$inc": inc, "$setOnInsert": {"kind": kind, "term": term, "day": day}}, upsert=True)
+            for (kind, term, day), inc in merged.items()
+        ]
+        if self.collection is not None and ops:
+            self.collection.bulk_write(ops, ordered=False)
+        return len(ops)
+
+
+# ==========================================
+# 查詢
+# ==========================================
+def heat_filter(kind, terms, end_day, days=SPARKLINE_DAYS):
+    """一次讀回多個 term 在 [end_day - days + 1, end_day] 的日文件 (走 kind_term_day 索引)；WoW 至少要 14 天"""
+    dates = day_range(end_day, days)
+    return {"kind": kind, "term": {"$in": list(terms)}, "day": {"$gte": dates[0], "$lte": dates[-1]}}
+
+
+HEAT_PROJECTION = {"_id": 0, "kind": 1, "term": 1, "day": 1, "total": 1, "hours": 1}
+
+
+def heat_stages(kind, terms, end_day, days=SPARKLINE_DAYS):
+    return [{"$match": heat_filter(kind, terms, end_day, days)}, {"$project": HEAT_PROJECTION}]
+
+
+def wow_delta(this_week, last_week):
+    """週對週變化 (%)；上週為 0 時無法計算，回傳 None"""
+    if not last_week:
+        return None
+    return round((this_week - last_week) / last_week * 100, 1)
+
+
+def trend(docs, end_day, days=SPARKLINE_DAYS, granularity="day"):
+    """
+    同一 term 的日文件 -> 趨勢：
+      sparkline   每日 (或每小時，granularity="hour" 時為最後一天起算的 24 x days 小時) 的提及次數
+      this_week / last_week  最近 7 天 / 再往前 7 天的總數
+      wow         週對週變化 (%)
+    """
+    totals = {doc["day"]: doc.get("total", 0) for doc in docs}
+    dates = day_range(end_day, max(days, 14))
+    daily = [totals.get(d, 0) for d in dates]
+    this_week, last_week = sum(daily[-7:]), sum(daily[-14:-7])
+    if granularity == "hour":
+        hours = {doc["day"]: doc.get("hours") or {} for doc in docs}
+        sparkline = [hours.get(d, {}).get(f"{h:02d}", 0) for d in dates[-days:] for h in range(24)]
+    else:
+        sparkline = daily[-days:]
+    return {"sparkline": sparkline, "this_week": this_week, "last_week": last_week,
+            "wow": wow_delta(this_week, last_week)}
+
+
+def shape_trends(docs, terms, end_day, days=SPARKLINE_DAYS, granularity="day"):
+    """回傳 {term: trend}，沒有資料的 term 也會有一筆 (全部為 0)"""
+    by_term = {term: [] for term in terms}
+    for doc in docs:
+        by_term.setdefault(doc["term"], []).append(doc)
+    return {term: trend(items, end_day, days, granularity) for term, items in by_term.items()}
+
+
+def combined_trend(docs, end_day, days=SPARKLINE_DAYS):
+    """多個關鍵字合計的趨勢 (例如某 SKU 分類底下的全部關鍵字)"""
+    merged = Counter()
+    for doc in docs:
+        merged[doc["day"]] += doc.get("total", 0)
+    return trend([{"day": d, "total": n} for d, n in merged.items()], end_day, days)
+
+
+def fetch_heat_trends(kind, terms, end_day=None, days=SPARKLINE_DAYS, granularity="day", database=None):
+    database = database if database is not None else db
+    end_day = end_day or date_type.today().isoformat()
+    docs = database[HEAT_COLLECTION].find(heat_filter(kind, terms, end_day, max(days, 14)),
+                                          HEAT_PROJECTION)
+    return shape_trends(list(docs), terms, end_day, days, granularity)
+
+
+async def fetch_heat_trends_async(kind, terms, end_day=None, days=SPARKLINE_DAYS, granularity="day", database=None):
+    database = database if database is not None else get_async_db()
+    end_day = end_day or date_type.today().isoformat()
+    cursor = database[HEAT_COLLECTION].find(heat_filter(kind, terms, end_day, max(days, 14)),
+                                            HEAT_PROJECTION)
+    return shape_trends([doc async for doc in cursor], terms, end_day, days, granularity)
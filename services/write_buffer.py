@@ -0,0 +1,99 @@
+import threading
+import time
+
+from pymongo import UpdateOne
+
+from db.mongo import db
+
+
+class BulkWriteBuffer:
+    """
+    爬蟲寫入緩衝區：把 upsert 先收集起來，
+    達到筆數 (max_ops) 或時間 (max_delay 秒) 門檻時，
+    以 unordered bulk_write 一次送出，取代逐筆 update_one。
+    時間門檻在 upsert() 時檢查，另外由 flush_if_due() 定時檢查
+    (CrawlEngine 爬取期間每 max_delay / 2 秒呼叫)，來源很久沒有下一筆時也不會一直留在緩衝區。
+
+    - 同一個 collection + filter 的 upsert 會合併 (後寫入的欄位覆蓋前者)
+    - unset：同時要清除的欄位 (例如重爬時清掉保存分層蓋上的 expires_at)
+    - 依 source 統計 inserted / modified / unchanged 筆數
+    - database 可傳入 mongomock 或本機 mongod 的 Database 方便測試
+    - on_insert(collection, docs)：每批寫入後以「新插入」的文件呼叫 (即時推播用)
+    """
+
+    def __init__(self, database=None, max_ops=500, max_delay=2.0, on_insert=None):
+        self.database = database if database is not None else db
+        self.on_insert = on_insert
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self.stats = {}
+        # (collection, source) -> {filter_key: (filter, $set 內容, $unset 欄位)}
+        self._pending = {}
+        self._pending_count = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def upsert(self, collection, filter, doc, source="unknown", unset=()):
+        with self._lock:
+            group = self._pending.setdefault((collection, source), {})
+            key = tuple(sorted(filter.items()))
+            if key in group:
+                group[key][1].update(doc)
+                group[key][2].update(unset)
+            else:
+                group[key] = (dict(filter), dict(doc), set(unset))
+                self._pending_count += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+            due = (self._pending_count >= self.max_ops
+                   or time.monotonic() - self._oldest >= self.max_delay)
+            if due:
+                self._flush_locked()
+
+    def flush_if_due(self):
+        """最舊的一筆已經等了 max_delay 秒以上時送出，回傳是否有送出"""
+        with self._lock:
+            if self._oldest is None or time.monotonic() - self._oldest < self.max_delay:
+                return False
+            self._flush_locked()
+            return True
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+        return self.stats
+
+    def _flush_locked(self):
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        self._oldest = None
+
+        for (collection, source), group in pending.items():
+            items = list(group.values())
+            ops = [UpdateOne(f, self._update(d, u), upsert=True) for f, d, u in items]
+            result = self.database[collection].bulk_write(ops, ordered=False)
+            if self.on_insert is not None and result.upserted_ids:
+                # upserted_ids: {ops 中的位置: 新文件 _id}
+                self.on_insert(collection, [{**items[i][0], **items[i][1], "_id": _id}
+                                            for i, _id in result.upserted_ids.items()])
+
+            counts = self.stats.setdefault(source, {"inserted": 0, "modified": 0, "unchanged": 0})
+            counts["inserted"] += result.upserted_count
+            counts["modified"] += result.modified_count
+            counts["unchanged"] += result.matched_count - result.modified_count
+
+    @staticmethod
+    def _update(doc, unset):
+        update = {"$set": doc}
+        # 同一欄位不能同時 $set 又 $unset
+        unset = sorted(unset - doc.keys())
+        if unset:
+            update["$unset"] = dict.fromkeys(unset, "")
+        return update
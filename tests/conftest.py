@@ -0,0 +1,57 @@
+import functools
+import os
+
+# db.mongo 只在第一次使用時連線；測試一律注入 mongomock，不會真的連到這個位址
+os.environ.setdefault("MongoDB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_TLS", "false")
+
+import mongomock
+import pytest
+from mongomock.collection import BulkOperationBuilder
+
+
+def _drop_sort(method):
+    """pymongo >= 4.13 的 UpdateOne / ReplaceOne 一律帶 sort=None 給 bulk builder，mongomock 4.x 不認得這個參數"""
+    def wrapper(self, *args, sort=None, **kwargs):
+        if sort is not None:
+            raise NotImplementedError("mongomock 不支援 bulk 更新的 sort")
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _track_op_index(execute):
+    """記下目前執行到第幾個操作，給下面的 upserted 彙總使用"""
+    def wrapper(self, *args, **kwargs):
+        def tagged(index, func):
+            @functools.wraps(func)  # execute() 依 __name__ 判斷操作種類
+            def run():
+                self._op_index = index
+                return func()
+            return run
+        self.executors = [tagged(i, f) for i, f in enumerate(self.executors)]
+        return execute(self, *args, **kwargs)
+    return wrapper
+
+
+_aggregate = BulkOperationBuilder._BulkOperationBuilder__aggregate_operation_result
+
+
+def _aggregate_upserted(self, total_result, key, value):
+    """mongomock 的 upserted index 是「第幾筆 upsert」，真正的 MongoDB 是「第幾個操作」(BulkWriteBuffer.on_insert 依賴這個)"""
+    if key == "upserted":
+        total_result[key].append({"index": self._op_index, "_id": value})
+    else:
+        _aggregate(self, total_result, key, value)
+
+
+if not getattr(BulkOperationBuilder, "_pymongo_patched", False):
+    BulkOperationBuilder.add_update = _drop_sort(BulkOperationBuilder.add_update)
+    BulkOperationBuilder.add_replace = _drop_sort(BulkOperationBuilder.add_replace)
+    BulkOperationBuilder.execute = _track_op_index(BulkOperationBuilder.execute)
+    BulkOperationBuilder._BulkOperationBuilder__aggregate_operation_result = _aggregate_upserted
+    BulkOperationBuilder._pymongo_patched = True
+
+
+@pytest.fixture
+def mongo_db():
+    return mongomock.MongoClient()["medipoint_test"]
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from services import crawl_engine
+from services.crawl_engine import CrawlEngine
+from services.crawl_state import CrawlStateStore
+from stub_server import StubServer
+
+# stub server 的內容經過健康關鍵字過濾後的筆數
+CDC_ALERTS, NEWS_ARTICLES, PTT_ARTICLES = 5, 4, 9
+
+
+@pytest.fixture
+def server():
+    with StubServer(latency=0) as server:
+        yield server
+
+
+def crawl(server, state, sources, boards=("Health",)):
+    async def run():
+        policies = {server.host: {"concurrency": 8, "rate": 1000.0, "burst": 8}}
+        async with CrawlEngine(ptt_base_url=server.url, cdc_base_url=server.url,
+                               news_rss_url=server.url + "/rss/search", policies=policies,
+                               persist=False, incremental=True, state=state, parse_workers=0) as engine:
+            return await engine.run(list(boards), 1, sources)
+    return asyncio.run(run())
+
+
+def fail_once(monkeypatch, name):
+    original = getattr(crawl_engine, name)
+    calls = []
+
+    def parse(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ValueError("版面改了")
+        return original(*args)
+
+    monkeypatch.setattr(crawl_engine, name, parse)
+
+
+def test_unchanged_pages_are_skipped(server):
+    state = CrawlStateStore(persist=False)
+    first = crawl(server, state, ("cdc", "news", "ptt"))
+    assert (first["cdc"], first["news"], first["ptt"]) == (CDC_ALERTS, NEWS_ARTICLES, PTT_ARTICLES)
+
+    second = crawl(server, state, ("cdc", "news", "ptt"))
+    assert second["http"]["not_modified"] == 3
+    assert (second["cdc"], second["news"], second["ptt"]) == (0, 0, 0)
+
+
+def test_cdc_parse_failure_is_retried_next_run(server, monkeypatch):
+    fail_once(monkeypatch, "parse_cdc_bulletins")
+    state = CrawlStateStore(persist=False)
+
+    first = crawl(server, state, ("cdc",))
+    assert "cdc" in first["errors"] and first["cdc"] == 0
+
+    second = crawl(server, state, ("cdc",))
+    assert second["errors"] == {}
+    assert second["cdc"] == CDC_ALERTS
+    assert second["http"]["not_modified"] == 0
+
+
+def test_news_parse_failure_is_retried_next_run(server, monkeypatch):
+    fail_once(monkeypatch, "parse_google_news")
+    state = CrawlStateStore(persist=False)
+
+    assert "news" in crawl(server, state, ("news",))["errors"]
+    assert crawl(server, state, ("news",))["news"] == NEWS_ARTICLES
+
+
+def test_ptt_failure_does_not_advance_state(server):
+    state = CrawlStateStore(persist=False)
+    failed = {"n": 0}
+
+    async def run(fail):
+        policies = {server.host: {"concurrency": 8, "rate": 1000.0, "burst": 8}}
+        async with CrawlEngine(ptt_base_url=server.url, cdc_base_url=server.url, policies=policies,
+                               persist=False, incremental=True, state=state, parse_workers=0) as engine:
+            if fail:
+                def broken(*args):
+                    failed["n"] += 1
+                    raise ValueError("版面改了")
+                engine.parse_ptt_index = broken
+            return await engine.run(["Health"], 1, ("ptt",))
+
+    assert "ptt:Health" in asyncio.run(run(fail=True))["errors"]
+    assert failed["n"] == 1
+    assert state.newest_ptt_id("Health") is None
+    assert asyncio.run(run(fail=False))["ptt"] == PTT_ARTICLES
+    assert state.newest_ptt_id("Health") is not None
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import dashboard
+from util import auth
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth, "DOCS_USERNAME", "admin")
+    monkeypatch.setattr(auth, "DOCS_PASSWORD", "secret")
+    refreshed = []
+    monkeypatch.setattr(dashboard, "refresh_rollups", lambda store_ids, dates: refreshed.append((store_ids, dates)))
+    app = FastAPI()
+    app.include_router(dashboard.router)
+    client = TestClient(app)
+    client.refreshed = refreshed
+    return client
+
+
+@pytest.mark.parametrize("path", ["/api/dashboard/cache/invalidate", "/api/dashboard/rollups/refresh"])
+def test_admin_endpoints_require_credentials(client, path):
+    assert client.post(path).status_code == 401
+    assert client.post(path, auth=("admin", "wrong")).status_code == 401
+    assert client.post(path, auth=("admin", "secret")).status_code == 200
+
+
+def test_rollup_refresh_without_credentials_does_not_rebuild(client):
+    client.post("/api/dashboard/rollups/refresh")
+    assert client.refreshed == []
+    client.post("/api/dashboard/rollups/refresh", params={"store_id": "S001"}, auth=("admin", "secret"))
+    assert client.refreshed == [(["S001"], None)]
@@ -0,0 +1,17 @@
+from services.dashboard import TARGET_DATE, build_heat
+from services.dashboard_queries import feed_pipeline
+from services.topic_heat import day_range
+
+
+def test_heat_trend_ends_at_report_date():
+    days = day_range(TARGET_DATE, 14)
+    heat = [{"kind": "keyword", "term": "退燒藥", "day": d, "total": 1 if i < 7 else 3} for i, d in enumerate(days)]
+    trend = build_heat({"heat": heat}, TARGET_DATE)["restock"]
+    assert (trend["last_week"], trend["this_week"], trend["wow"]) == (7, 21, 200.0)
+    assert trend["sparkline"][-1] == 3
+
+
+def test_feed_reads_heat_up_to_report_date():
+    pipeline = feed_pipeline(["PTT"], heat_terms={"keyword": ["退燒藥"]}, heat_end_day=TARGET_DATE)
+    heat = [stage["$unionWith"] for stage in pipeline if stage.get("$unionWith", {}).get("coll") == "topic_heat"]
+    assert heat and TARGET_DATE in repr(heat[0]["pipeline"][0]["$match"])
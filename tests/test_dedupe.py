@@ -0,0 +1,45 @@
+from services.dedupe import TitleIndex, minhash, normalize_title, shingles, similarity
+
+
+def signature(title):
+    return minhash(shingles(normalize_title(title)))
+
+
+def test_normalize_strips_board_tags_and_media_suffix():
+    assert normalize_title("Re: [問卦] 流感疫苗開打了？") == "流感疫苗開打了"
+    assert normalize_title("流感疫苗今起開打 65歲以上優先 - 聯合新聞網") == "流感疫苗今起開打65歲以上優先"
+
+
+def test_near_duplicate_titles_share_a_cluster_and_distinct_ones_do_not():
+    index = TitleIndex(persist=False)
+    articles = [
+        {"title": "流感疫苗今起開打 65歲以上長者優先 - 聯合新聞網", "source": "GoogleNews"},
+        {"title": "[新聞] 流感疫苗今起開打 65歲以上長者優先", "source": "PTT"},
+        {"title": "Re: [新聞] 流感疫苗今起開打　65歲以上長者優先！", "source": "PTT"},
+        {"title": "流感疫苗今天開打 65歲以上長者優先施打 - 自由時報", "source": "GoogleNews"},
+        {"title": "腸病毒疫情升溫 幼兒園停課", "source": "Dcard"},
+        {"title": "藥局口罩實名制明起上路", "source": "GoogleNews"},
+    ]
+    index.assign(articles)
+
+    ids = [a["cluster_id"] for a in articles]
+    assert len(set(ids[:4])) == 1
+    assert len({ids[0], ids[4], ids[5]}) == 3
+    assert index._clusters[ids[0]].sources == {"GoogleNews", "PTT"}
+
+
+def test_estimated_similarity_tracks_jaccard():
+    a = shingles(normalize_title("流感疫苗今起開打 65歲以上長者優先"))
+    b = shingles(normalize_title("流感疫苗今天開打 65歲以上長者優先施打"))
+    jaccard = len(a & b) / len(a | b)
+    assert abs(similarity(minhash(a), minhash(b)) - jaccard) < 0.15
+    assert similarity(signature("流感疫苗開打"), signature("腸病毒幼兒園停課")) < 0.1
+
+
+def test_count_inserted_only_counts_new_rows_once():
+    index = TitleIndex(persist=False)
+    articles = [{"title": "流感疫苗今起開打", "source": "PTT"}, {"title": "[新聞] 流感疫苗今起開打", "source": "PTT"}]
+    index.assign(articles)
+    index.count_inserted(articles[:1])
+    cluster = index._clusters[articles[0]["cluster_id"]]
+    assert cluster.mentions == 1 and index._increments == {cluster.id: 1}
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+from routers import dashboard as dashboard_router
+from services.event_stream import EventHub
+
+ARTICLE = {"source": "PTT", "board": "Health", "title": "流感疫苗開打", "url": "https://example.com/1"}
+
+
+def drain(sub):
+    items = []
+    while not sub.queue.empty():
+        items.append(sub.queue.get_nowait())
+    return items
+
+
+def test_fanout_serializes_once_for_every_subscriber():
+    async def run():
+        hub = EventHub(use_change_stream=False)
+        subs = [hub.subscribe() for _ in range(3)]
+        hub.publish("raw_articles", ARTICLE)
+        hub.publish("alerts", {"title": "警示", "agency": "CDC"})
+        hub.publish("crawl_state", {"title": "不推播"})
+        return hub, [drain(sub) for sub in subs]
+
+    hub, received = asyncio.run(run())
+    first = received[0]
+    assert len(first) == 2
+    assert first[0].startswith(b"id: 1\nevent: insight\ndata: ") and "流感疫苗開打".encode() in first[0]
+    assert first[1].startswith(b"id: 2\nevent: alert\n")
+    assert all(r[0] is first[0] for r in received)     # 同一份 bytes
+    assert hub.stats["published"] == 2
+
+
+def test_slow_subscriber_is_dropped_without_blocking_others():
+    async def run():
+        hub = EventHub(queue_size=2, use_change_stream=False)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        received = []
+        for i in range(3):
+            hub.publish("raw_articles", {**ARTICLE, "title": f"流感 {i}"})
+            received += drain(fast)
+        return hub, slow, fast, received
+
+    hub, slow, fast, received = asyncio.run(run())
+    assert slow.dropped and drain(slow) == [None]      # 只剩結束標記
+    assert not fast.dropped and len(received) == 3
+    assert hub.subscriber_count == 1 and hub.stats["dropped_subscribers"] == 1
+
+
+def test_reconnect_replays_events_after_last_event_id_and_caps_subscribers():
+    async def run():
+        hub = EventHub(max_subscribers=2, use_change_stream=False)
+        for i in range(3):
+            hub.publish("raw_articles", {**ARTICLE, "title": f"流感 {i}"})
+        replayed = drain(hub.subscribe(last_event_id=1))
+        return hub, replayed, hub.subscribe(), hub.subscribe()
+
+    hub, replayed, second, third = asyncio.run(run())
+    assert [p.split(b"\n")[0] for p in replayed] == [b"id: 2", b"id: 3"]
+    assert second is not None and third is None
+
+
+def test_crawler_thread_publish_reaches_the_hub_loop():
+    async def run():
+        hub = EventHub(use_change_stream=False)
+        hub.start()
+        sub = hub.subscribe()
+        await asyncio.to_thread(hub.publish_inserted, "raw_articles", [ARTICLE, ARTICLE])
+        payloads = [await asyncio.wait_for(sub.queue.get(), 1) for _ in range(2)]
+        await hub.stop()
+        return payloads, drain(sub)
+
+    payloads, rest = asyncio.run(run())
+    assert len(payloads) == 2 and rest == [None]       # stop() 讓連線結束
+
+
+def test_sse_disconnect_unsubscribes(monkeypatch):
+    hub = EventHub(use_change_stream=False)
+    monkeypatch.setattr(dashboard_router, "event_hub", hub)
+
+    async def run():
+        request = SimpleNamespace(headers={})
+        response = await dashboard_router.stream_events(request)
+        body = response.body_iterator
+        first = await anext(body)
+        assert hub.subscriber_count == 1
+        hub.publish("raw_articles", ARTICLE)
+        event = await anext(body)
+        await body.aclose()     # 前端關閉分頁：Starlette 關掉產生器
+        return first, event
+
+    first, event = asyncio.run(run())
+    assert first == b"retry: 5000\n\n"
+    assert event.startswith(b"id: 1\nevent: insight\n")
+    assert hub.subscriber_count == 0
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services.http_client import AsyncHttpClient, HttpClient, RetryPolicy
+
+URL = "https://www.ptt.cc/bbs/Health/index.html"
+
+
+def scripted(statuses, calls):
+    """依序回應 statuses；ConnectError 代表連線失敗，最後一個狀態會一直重複"""
+    def handler(request):
+        calls.append(request.url)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        if status is httpx.ConnectError:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(status, text=f"status {status}")
+    return httpx.MockTransport(handler)
+
+
+def sync_client(statuses, calls, max_retries=2):
+    client = HttpClient(retry=RetryPolicy(max_retries=max_retries, backoff=0.001))
+    client._client = httpx.Client(transport=scripted(statuses, calls))
+    return client
+
+
+def async_get(statuses, calls, max_retries=2):
+    async def run():
+        client = AsyncHttpClient(retry=RetryPolicy(max_retries=max_retries, backoff=0.001))
+        await client._client.aclose()
+        client._client = httpx.AsyncClient(transport=scripted(statuses, calls))
+        try:
+            return await client.get(URL), client.stats.snapshot()
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    calls = []
+    with sync_client([429, 503, 200], calls) as client:
+        resp = client.get(URL)
+        stats = client.stats.snapshot()
+    assert resp.status_code == 200 and len(calls) == 3
+    assert stats["retries"] == 2 and stats["status"] == {429: 1, 503: 1, 200: 1}
+    assert stats["hosts"]["www.ptt.cc"]["requests"] == 3
+
+
+def test_gives_up_after_max_retries_and_returns_last_response():
+    calls = []
+    with sync_client([502], calls) as client:
+        resp = client.get(URL)
+    assert resp.status_code == 502 and len(calls) == 3     # 1 次 + 重試 2 次
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+    with sync_client([404], calls) as client:
+        assert client.get(URL).status_code == 404
+    assert len(calls) == 1
+
+
+def test_connection_errors_retry_then_raise():
+    calls = []
+    with sync_client([httpx.ConnectError], calls, max_retries=1) as client:
+        with pytest.raises(httpx.ConnectError):
+            client.get(URL)
+        assert client.stats.snapshot()["errors"] == 2
+    assert len(calls) == 2
+
+
+def test_async_client_retries_the_same_way():
+    calls = []
+    resp, stats = async_get([httpx.ConnectError, 500, 200], calls)
+    assert resp.status_code == 200 and len(calls) == 3
+    assert stats["retries"] == 2 and stats["errors"] == 1
+
+    calls = []
+    resp, _ = async_get([429], calls, max_retries=1)
+    assert resp.status_code == 429 and len(calls) == 2
+
+
+def test_delay_prefers_retry_after_and_caps_backoff():
+    policy = RetryPolicy(max_retries=3, backoff=1.0, max_backoff=8.0)
+    assert policy.delay(0, httpx.Response(429, headers={"Retry-After": "2"})) == 2
+    assert policy.delay(0, httpx.Response(503, headers={"Retry-After": "120"})) == 8.0
+    assert 0.75 <= policy.delay(0) <= 1.25
+    assert 3.0 <= policy.delay(2) <= 5.0
+    assert policy.delay(10) == 8.0
@@ -0,0 +1,15 @@
+import os
+
+from bench_import_time import LAZY_MODULES, measure
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+
+def test_app_import_stays_within_budget_and_lazy():
+    # 取最快的一次 (第一次可能還沒有 .pyc / 檔案快取)
+    runs = [measure() for _ in range(3)]
+    modules, client_created = min(runs, key=lambda run: run[0]["app"][0])
+
+    assert modules["app"][0] / 1000 <= IMPORT_BUDGET_MS
+    assert [name for name in LAZY_MODULES if name in modules] == []
+    assert not client_created
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import orjson
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import dashboard
+from routers.dashboard import InsightsPage
+from services.dashboard_queries import (
+    INSIGHTS_SORT, _shape_insights_page, decode_insights_cursor, encode_insights_cursor, insights_filter,
+)
+
+
+def make_docs(total):
+    now = datetime(2025, 10, 30, 12, 0, 0)
+    return [{"_id": ObjectId(), "source": "PTT", "board": "Health", "title": f"標題{i}", "content": "內文" * 10,
+             "url": f"https://example.com/{i}", "crawled_at": now - timedelta(seconds=i // 2),   # 每 2 篇同一秒
+             "cluster_id": ObjectId(), "keywords": ["流感"]} for i in range(total)]
+
+
+def test_shaped_page_matches_documented_model():
+    page = _shape_insights_page(make_docs(6), 5)
+    assert InsightsPage.model_validate(page).model_dump(mode="json") == orjson.loads(orjson.dumps(page))
+    assert page["next_cursor"] is not None
+
+
+def test_cursor_round_trip():
+    doc = make_docs(1)[0]
+    assert decode_insights_cursor(encode_insights_cursor(doc)) == (doc["crawled_at"], doc["_id"])
+
+
+def test_route_documents_insights_page_and_rejects_bad_cursor():
+    app = FastAPI()
+    app.include_router(dashboard.router)
+    client = TestClient(app)
+    schema = client.get("/openapi.json").json()
+    response = schema["paths"]["/api/dashboard/insights"]["get"]["responses"]["200"]
+    assert response["content"]["application/json"]["schema"]["$ref"].endswith("/InsightsPage")
+    assert client.get("/api/dashboard/insights", params={"cursor": "不是 cursor"}).status_code == 422
+
+
+def test_filter_skips_rows_without_crawled_at(mongo_db):
+    docs = make_docs(3)
+    legacy = [{"_id": ObjectId(), "source": "PTT", "title": "舊資料"}, {"_id": ObjectId(), "source": "PTT", "crawled_at": None}]
+    mongo_db.raw_articles.insert_many(docs + legacy)
+    expected = [d["_id"] for d in sorted(docs, key=lambda d: (d["crawled_at"], d["_id"]), reverse=True)]
+
+    # 舊資料排在最後 (沒有 crawled_at)；不排除的話，頁尾落在它身上時產生 cursor 會 KeyError
+    first = list(mongo_db.raw_articles.find(insights_filter(["PTT"])).sort(INSIGHTS_SORT).limit(len(docs) + 1))
+    assert [d["_id"] for d in first] == expected
+    page = _shape_insights_page(first[:3], 2)
+    rest = list(mongo_db.raw_articles.find(insights_filter(["PTT"], page["next_cursor"])).sort(INSIGHTS_SORT))
+    assert [d["_id"] for d in rest] == expected[2:]
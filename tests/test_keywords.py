@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from services.keywords import HEALTH_KEYWORD_CATEGORIES, HEALTH_KEYWORDS, INSIGHT_TAG_RULES, keyword_matcher
+
+
+def naive_match(text):
+    """逐一 `in` 檢查的舊做法"""
+    keywords = sorted({kw for kw in HEALTH_KEYWORDS if kw in text})
+    categories = [c for c, kws in HEALTH_KEYWORD_CATEGORIES.items() if any(kw in keywords for kw in kws)]
+    tags = [tag for tag, words in INSIGHT_TAG_RULES.items() if any(w in text for w in words)]
+    return keywords, categories, tags
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "今天天氣真好",
+    "感冒藥",               # 前綴：感冒 / 感冒藥，內含：藥
+    "腸胃藥",               # 重疊：腸胃 與 胃藥
+    "喉嚨痛風",             # 重疊：喉嚨痛 與 痛風
+    "降血壓藥與高血壓",
+    "慢性處方箋",           # 處方 是 慢性處方 的後綴
+    "眼藥水和酸痛貼布",
+    "健康檢查抽血X光",
+    "寶寶發燒缺退燒藥",     # Dashboard 標籤：兒童、缺貨、用藥諮詢
+    "藥藥藥局藥師",
+])
+def test_matches_naive_scan(text):
+    result = keyword_matcher.match(text)
+    assert (result.keywords, result.categories, result.tags) == naive_match(text)
+    assert keyword_matcher.is_health_related(text) == bool(naive_match(text)[0])
+
+
+def test_matches_naive_scan_on_random_keyword_runs():
+    rng = random.Random(0)
+    filler = "今天大家晚餐吃什麼有沒有八卦問卦"
+    pieces = HEALTH_KEYWORDS + [w for words in INSIGHT_TAG_RULES.values() for w in words] + list(filler)
+    for _ in range(2000):
+        # 關鍵字直接相接，製造跨詞的重疊與前綴
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 8)))
+        result = keyword_matcher.match(text)
+        assert (result.keywords, result.categories, result.tags) == naive_match(text), text
+        assert keyword_matcher.is_health_related(text) == bool(result.keywords)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from services import kpi_rollups
+from services.kpi_rollups import ROLLUP_STATE_COLLECTION, refresh_new_rows
+
+
+def row(store_id, date, age_minutes=0):
+    """_id 的時間戳 = 寫入時間 (往前 age_minutes 分鐘)"""
+    created = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(minutes=age_minutes))
+    return {"_id": ObjectId(created.binary[:4] + ObjectId().binary[4:]), "store_id": store_id, "date": date}
+
+
+def test_refresh_new_rows_is_incremental(mongo_db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(kpi_rollups, "refresh_rollups",
+                        lambda store_ids=None, dates=None, database=None: calls.append((store_ids, dates)))
+
+    assert refresh_new_rows(mongo_db) == {"full": False, "stores": 0, "dates": 0}
+
+    # 第一次：全量重建
+    mongo_db.daily_category_summary.insert_many([row("S001", "2025-10-01", 60), row("S002", "2025-10-02", 60)])
+    assert refresh_new_rows(mongo_db) == {"full": True, "stores": 2, "dates": 2}
+    assert calls == [(None, None)]
+
+    # 沒有新資料列
+    assert refresh_new_rows(mongo_db)["stores"] == 0
+    assert len(calls) == 1
+
+    # 只重算新資料列涵蓋的門市與日期
+    mongo_db.daily_category_summary.insert_many([row("S003", "2025-10-30"), row("S001", "2025-10-29")])
+    assert refresh_new_rows(mongo_db) == {"full": False, "stores": 2, "dates": 2}
+    assert calls[-1] == (["S001", "S003"], ["2025-10-29", "2025-10-30"])
+    assert mongo_db[ROLLUP_STATE_COLLECTION].find_one({"_id": "daily_category_summary"})["checked_at"]
+
+
+def test_scheduler_is_opt_in_and_not_loaded_on_import():
+    code = ("import sys, services.kpi_rollups; from util.config import Env; "
+            "print(Env.KPI_ROLLUP_SCHEDULER_ENABLED, 'services.scheduler' in sys.modules)")
+    environ = {k: v for k, v in os.environ.items() if k != "KPI_ROLLUP_SCHEDULER_ENABLED"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=environ)
+    assert result.stdout.split() == ["False", "False"]
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from services.parse_pipeline import ParseStage, get_process_pool, shutdown_process_pool
+
+
+def slow_parse(content):
+    time.sleep(0.01)
+    return len(content)
+
+
+def test_pools_are_keyed_on_worker_count():
+    try:
+        one, two = get_process_pool(1), get_process_pool(2)
+        assert one is not two
+        assert get_process_pool(1) is one
+        assert (one._max_workers, two._max_workers) == (1, 2)
+    finally:
+        shutdown_process_pool()
+    assert get_process_pool(1) is not one
+    shutdown_process_pool()
+
+
+def test_reserve_pauses_fetches_while_parse_is_saturated():
+    stage = ParseStage(workers=0, max_pending=2)
+    in_flight, peak = 0, 0
+
+    async def fetch_and_parse(i):
+        nonlocal in_flight, peak
+        async with stage.reserve():
+            in_flight += 1      # 已開始抓取、還沒解析完的頁面
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            result = await stage.run(slow_parse, b"x" * i)     # 沿用 reserve() 的名額，不會卡住
+            in_flight -= 1
+            return result
+
+    async def run():
+        return await asyncio.gather(*(fetch_and_parse(i) for i in range(10)))
+
+    assert asyncio.run(run()) == list(range(10))
+    assert peak == 2
+    assert stage.stats["pages"] == 10
+
+
+def test_run_without_reserve_takes_its_own_slot():
+    stage = ParseStage(workers=0, max_pending=1)
+
+    async def run():
+        return await asyncio.gather(*(stage.run(slow_parse, b"ab") for _ in range(3)))
+
+    assert asyncio.run(run()) == [2, 2, 2]
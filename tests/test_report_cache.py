@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from services.report_cache import SnapshotCache
+from util.gemini import DEFAULT_TALKING_POINT
+
+
+async def no_version(store_id, date):
+    return None
+
+
+def make_builder(talking_point="話術"):
+    calls = []
+
+    async def builder(store_id, date):
+        calls.append((store_id, date))
+        return {"report_date": date, "suggestions": [{"action": "Restock", "talking_points": talking_point}]}
+
+    return builder, calls
+
+
+def test_snapshot_with_real_talking_point_is_cached_for_full_ttl():
+    builder, calls = make_builder()
+    cache = SnapshotCache(ttl=300, fallback_ttl=0.05, builder=builder, versioner=no_version)
+
+    first = asyncio.run(cache.get("S001", "2025-10-30"))
+    time.sleep(0.1)
+    assert asyncio.run(cache.get("S001", "2025-10-30")) is first
+    assert len(calls) == 1
+
+
+def test_snapshot_with_default_talking_point_expires_quickly():
+    builder, calls = make_builder(DEFAULT_TALKING_POINT)
+    cache = SnapshotCache(ttl=300, fallback_ttl=0.05, builder=builder, versioner=no_version)
+
+    first = asyncio.run(cache.get("S001", "2025-10-30"))
+    assert asyncio.run(cache.get("S001", "2025-10-30")) is first
+    time.sleep(0.1)
+    asyncio.run(cache.get("S001", "2025-10-30"))
+    assert len(calls) == 2
+
+
+def test_build_locks_are_released_after_build():
+    builder, calls = make_builder()
+    cache = SnapshotCache(builder=builder, versioner=no_version)
+
+    async def run():
+        await asyncio.gather(*[cache.get(f"S{i:03d}", "2025-10-30") for i in range(50)])
+        await asyncio.gather(*[cache.get("S001", "2025-10-30") for _ in range(10)])
+
+    asyncio.run(run())
+    assert cache._build_locks == {}
+    assert len(calls) == 50
+
+
+def test_concurrent_misses_build_once():
+    builder, calls = make_builder()
+    cache = SnapshotCache(builder=builder, versioner=no_version)
+
+    async def run():
+        return await asyncio.gather(*[cache.get("S001", "2025-10-30") for _ in range(10)])
+
+    snapshots = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(s is snapshots[0] for s in snapshots)
+
+
+def test_invalidate_during_build_is_not_overwritten():
+    started, release = asyncio.Event(), asyncio.Event()
+    calls = []
+
+    async def slow_builder(store_id, date):
+        calls.append(store_id)
+        started.set()
+        await release.wait()
+        return {"report_date": date, "suggestions": []}
+
+    cache = SnapshotCache(builder=slow_builder, versioner=no_version)
+
+    async def run():
+        task = asyncio.create_task(cache.get("S001", "2025-10-30"))
+        await started.wait()
+        cache.invalidate()          # 例如爬蟲剛寫入新資料
+        release.set()
+        await task
+        await cache.get("S001", "2025-10-30")
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_new_inventory_rows_rebuild_the_snapshot():
+    builder, calls = make_builder()
+    versions = {"S001": 1}
+    checks = []
+
+    async def versioner(store_id, date):
+        checks.append(store_id)
+        return versions[store_id]
+
+    cache = SnapshotCache(builder=builder, versioner=versioner, version_check=0.05)
+
+    first = asyncio.run(cache.get("S001", "2025-10-30"))
+    assert asyncio.run(cache.get("S001", "2025-10-30")) is first
+    assert len(checks) == 1     # 建置時取一次；間隔內命中不再查
+
+    time.sleep(0.1)
+    assert asyncio.run(cache.get("S001", "2025-10-30")) is first     # 版本沒變
+    assert (len(calls), len(checks)) == (1, 2)
+
+    versions["S001"] = 2        # ERP 匯入了新的庫存列
+    time.sleep(0.1)
+    second = asyncio.run(cache.get("S001", "2025-10-30"))
+    assert second is not first and second.version == 2
+    assert len(calls) == 2
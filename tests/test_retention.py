@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta
+
+from services.crawlers import save_alerts, save_articles
+from services.write_buffer import BulkWriteBuffer
+
+
+def test_recrawl_clears_expires_at(mongo_db):
+    expires_at = datetime.now() + timedelta(days=1)
+    mongo_db.raw_articles.insert_one({"url": "https://example.com/a", "title": "舊", "source": "PTT",
+                                      "crawled_at": datetime.now() - timedelta(days=40), "expires_at": expires_at})
+    mongo_db.alerts.insert_one({"title": "警示", "agency": "CDC", "expires_at": expires_at})
+
+    with BulkWriteBuffer(mongo_db) as buffer:
+        save_articles([{"url": "https://example.com/a", "title": "新", "source": "PTT", "crawled_at": datetime.now()}],
+                      buffer)
+        save_alerts([{"title": "警示", "agency": "CDC", "crawled_at": datetime.now()}], buffer)
+
+    article = mongo_db.raw_articles.find_one({"url": "https://example.com/a"})
+    assert article["title"] == "新"
+    assert "expires_at" not in article
+    assert "expires_at" not in mongo_db.alerts.find_one({"title": "警示"})
+    assert buffer.stats["PTT"] == {"inserted": 0, "modified": 1, "unchanged": 0}
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from services import scheduler
+from services.scheduler import CrawlScheduler
+
+
+def make_runner(release, started):
+    async def runner(sources):
+        started.set()
+        release.wait(5)     # 模擬卡在 thread 裡、無法取消的爬蟲
+        return {source: 1 for source in sources}
+    return runner
+
+
+def test_lease_is_kept_and_renewed_until_the_crawl_finishes(mongo_db, monkeypatch):
+    monkeypatch.setattr(scheduler, "LEASE_SECONDS", 0.2)
+    monkeypatch.setattr(scheduler, "LEASE_RENEW_SECONDS", 0.05)
+    release, started = threading.Event(), threading.Event()
+    first = CrawlScheduler(intervals={"ptt": 60}, database=mongo_db, runner=make_runner(release, started))
+    second = CrawlScheduler(intervals={"ptt": 60}, database=mongo_db, runner=make_runner(release, started))
+
+    async def run():
+        task = asyncio.create_task(first.run_source("ptt", force=True))
+        await asyncio.to_thread(started.wait, 5)
+        # 超過原本的 lease 期限後，另一個 worker 仍然拿不到 lease
+        await asyncio.sleep(0.5)
+        assert second._acquire("ptt", force=True) is None
+        assert mongo_db.crawl_schedule.find_one({"_id": "ptt"})["lease_expires_at"] > datetime.now()
+        release.set()
+        return await task
+
+    assert asyncio.run(run()) == {"ptt": 1}
+    doc = mongo_db.crawl_schedule.find_one({"_id": "ptt"})
+    assert doc["running"] is False and doc["last_error"] is None
+    assert second._acquire("ptt", force=True) is not None
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from services.search import DocTable, SearchIndex
+
+
+def test_doc_table_extends_below_base():
+    table = DocTable()
+    now = datetime.now()
+    table.add(2000, "b", "PTT", now, 5)
+    table.add(3, "a", "Dcard", now, 7)      # 另一個 worker 較早配到、較晚寫入
+    assert table.base == 3
+    assert table.ids[2000 - table.base] == "b" and table.ids[0] == "a"
+    assert table.lengths[2000 - table.base] == 5 and table.lengths[0] == 7
+    assert table.count == 2 and table.size == 1998 and table.max_docno == 2000
+
+
+def test_late_lower_docno_is_searchable(mongo_db):
+    writer, reader = SearchIndex(database=mongo_db), SearchIndex(database=mongo_db)
+    reader.load()
+    assert reader.table.base is None
+
+    # writer 先配到編號，但 reader 較晚配到的文章先寫入
+    writer_start = writer._allocate(1)
+    writer._allocate = lambda n: writer_start
+    reader.index_inserted([{"_id": ObjectId(), "source": "PTT", "title": "流感快篩", "crawled_at": datetime.now()}])
+    reader.flush()
+    writer.index_inserted([{"_id": ObjectId(), "source": "PTT", "title": "流感疫苗", "crawled_at": datetime.now()}])
+    writer.flush()
+    reader._refreshed_at = 0
+    reader.refresh()
+
+    assert reader.table.base == writer_start
+    assert reader.search("流感")["total"] == 2
+
+
+def test_snapshot_is_unaffected_by_later_growth():
+    table = DocTable()
+    now = datetime.now()
+    table.add(500, "b", "PTT", now, 5)
+    view = table.snapshot()
+    table.add(3, "a", "Dcard", now, 7)      # 往下延伸：原表換成新陣列
+    table.add(5000, "c", "News", now, 2)    # 往上擴充
+    assert (view.base, view.size, view.count) == (500, 1, 1)
+    assert view.ids[0] == "b" and view.lengths[0] == 5
+    assert "Dcard" not in view.source_codes
+    assert table.ids[500 - table.base] == "b"
@@ -0,0 +1,41 @@
+import pytest
+
+from bench_suggestions import LIFT, WINDOW_DAYS, legacy_suggest, make_skus, to_columns
+from services.dashboard_queries import empty_sku_columns
+from services.suggestions import suggest
+
+
+def sku(sku_id, on_hand, sold, price=100, cost=70, category=""):
+    return {"sku_id": sku_id, "name": "", "category": category, "on_hand": on_hand, "sold": sold,
+            "unit_price": price, "unit_cost": cost}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_vectorized_picks_match_per_sku_loop(seed):
+    skus = make_skus(300, seed=seed)
+    restock, promotion = suggest(to_columns(skus), LIFT, window_days=WINDOW_DAYS)
+    legacy_restock, legacy_promotion = legacy_suggest(skus, LIFT)
+    assert [r["sku_id"] for r in restock] == [skus[i]["sku_id"] for i in legacy_restock]
+    assert [p["sku_id"] for p in promotion] == [skus[i]["sku_id"] for i in legacy_promotion]
+
+
+def test_small_fixture():
+    skus = [
+        sku("SKU-感冒-001", on_hand=5, sold=70),            # 每日 10 (x1.6)，撐不到 1 天
+        sku("SKU-保健-002", on_hand=40, sold=70),           # 每日 11 (x1.1)，約 3.6 天
+        sku("SKU-皮膚-003", on_hand=20, sold=0),            # 沒有銷量、庫存低 -> 排最後
+        sku("SKU-痠痛-004", on_hand=300, sold=7, cost=0),   # 積壓，沒有成本資料
+        sku("SKU-腸胃-005", on_hand=50, sold=14),           # 正常
+    ]
+    restock, promotion = suggest(to_columns(skus), LIFT, window_days=WINDOW_DAYS)
+    assert [(r["sku_id"], r["status"]) for r in restock] == [
+        ("SKU-感冒-001", "Critical"), ("SKU-保健-002", "Low"), ("SKU-皮膚-003", "Low"),
+    ]
+    assert restock[0]["days_of_cover"] == 0.3 and restock[0]["demand_lift"] == 1.6
+    assert restock[2]["days_of_cover"] is None
+    assert [p["sku_id"] for p in promotion] == ["SKU-痠痛-004"]
+    assert legacy_suggest(skus, LIFT) == ([0, 1, 2], [3])
+
+
+def test_empty_store():
+    assert suggest(empty_sku_columns(), LIFT) == ([], [])
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from services.talking_points import TalkingPointService, talking_point_key
+from util.gemini import DEFAULT_TALKING_POINT
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """回傳「話術:<prompt 的 topic>」並記錄呼叫次數"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        topic = prompt.split("情況：", 1)[1].split("\n", 1)[0]
+        return FakeResponse(f"  話術:{topic}  ")
+
+
+def make_service(model, **kwargs):
+    kwargs.setdefault("persist", False)
+    return TalkingPointService(model_factory=lambda: model, **kwargs)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待逾時"
+        time.sleep(0.01)
+
+
+def test_concurrent_identical_prompts_call_model_once():
+    model = FakeModel(latency=0.2)
+    service = make_service(model)
+
+    async def run():
+        return await asyncio.gather(*[service.generate("流感高峰", ["普拿疼"], "庫存告急") for _ in range(20)])
+
+    results = asyncio.run(run())
+    assert results == ["話術:流感高峰"] * 20
+    assert model.calls == 1
+
+
+def test_different_prompts_are_not_coalesced():
+    model = FakeModel()
+    service = make_service(model)
+
+    async def run():
+        return await asyncio.gather(service.generate("流感", ["A"], "r"), service.generate("過敏", ["A"], "r"))
+
+    assert asyncio.run(run()) == ["話術:流感", "話術:過敏"]
+    assert model.calls == 2
+
+
+def test_timeout_returns_default_and_caches_result_in_background():
+    model = FakeModel(latency=0.3)
+    service = make_service(model, timeout=0.05)
+
+    assert asyncio.run(service.generate("流感", ["A"], "r")) == DEFAULT_TALKING_POINT
+    assert service.generate_sync("流感", ["A"], "r") == DEFAULT_TALKING_POINT   # 仍在生成中，沿用同一個呼叫
+
+    key = talking_point_key("流感", ["A"], "r")
+    wait_until(lambda: key in service._memory)
+    assert service.generate_sync("流感", ["A"], "r") == "話術:流感"
+    assert model.calls == 1
+
+
+def test_memory_cache_evicts_least_recently_used():
+    model = FakeModel(latency=0)
+    service = make_service(model, maxsize=2)
+
+    service.generate_sync("A", [], "r")
+    service.generate_sync("B", [], "r")
+    service.generate_sync("A", [], "r")     # A 變成最近使用
+    service.generate_sync("C", [], "r")     # 淘汰 B
+    assert model.calls == 3
+    assert list(service._memory) == [talking_point_key("A", [], "r"), talking_point_key("C", [], "r")]
+
+    service.generate_sync("A", [], "r")
+    assert model.calls == 3
+    service.generate_sync("B", [], "r")
+    assert model.calls == 4
+
+
+def test_mongo_cache_hit_skips_model(mongo_db):
+    first = FakeModel(latency=0)
+    make_service(first, database=mongo_db, persist=True).generate_sync("流感", ["A"], "r")
+    key = talking_point_key("流感", ["A"], "r")
+    assert mongo_db.talking_point_cache.find_one({"_id": key})["text"] == "話術:流感"
+
+    # 新的 service (記憶體快取是空的) 從 Mongo 讀回
+    second = FakeModel(latency=0)
+    assert make_service(second, database=mongo_db, persist=True).generate_sync("流感", ["A"], "r") == "話術:流感"
+    assert second.calls == 0
+
+
+def test_mongo_cache_expired_entry_is_a_miss(mongo_db):
+    key = talking_point_key("流感", ["A"], "r")
+    mongo_db.talking_point_cache.insert_one({"_id": key, "text": "舊話術",
+                                             "expires_at": datetime.now(timezone.utc) - timedelta(minutes=1)})
+    model = FakeModel(latency=0)
+    service = make_service(model, database=mongo_db, persist=True)
+
+    assert service.generate_sync("流感", ["A"], "r") == "話術:流感"
+    assert model.calls == 1
+    assert mongo_db.talking_point_cache.find_one({"_id": key})["text"] == "話術:流感"
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import dashboard as dashboard_router
+from services import dashboard
+from services.dashboard import TARGET_SOURCES
+
+
+def skus(on_hand):
+    return {"sku_id": ["SKU-感冒-001"], "name": ["感冒藥"], "category": ["感冒"], "on_hand": [on_hand],
+            "sold": [70], "unit_price": [100], "unit_cost": [70]}
+
+
+class FakeTalkingPoints:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, topic, products, reason):
+        self.prompts.append((topic, tuple(products), reason))
+        return "話術"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fetch_stores(store_ids, date):
+        # S404 查不到 (例如門市代碼打錯)
+        return {s: {"kpi": None, "skus": skus(5)} for s in store_ids if s != "S404"}
+
+    async def fetch_feed(sources, heat_terms=None, heat_end_day=None):
+        return {"alerts": [], "articles": {s: [] for s in sources}, "heat": []}
+
+    talking_points = FakeTalkingPoints()
+    monkeypatch.setattr(dashboard, "fetch_stores_snapshot_async", fetch_stores)
+    monkeypatch.setattr(dashboard, "fetch_feed_async", fetch_feed)
+    monkeypatch.setattr(dashboard, "talking_points", talking_points)
+    app = FastAPI()
+    app.include_router(dashboard_router.router)
+    client = TestClient(app)
+    client.talking_points = talking_points
+    return client
+
+
+def post(client, store_ids):
+    response = client.post("/api/dashboard/weekly-report/batch", json={"store_ids": store_ids, "date": "2025-10-30"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_one_line_per_store_and_shared_prompt_generated_once(client):
+    lines = post(client, ["S001", "S002", "S001"])
+    assert sorted(line["store_id"] for line in lines) == ["S001", "S002"]
+    for line in lines:
+        assert line["report"]["suggestions"][0]["talking_points"] == "話術"
+    assert len(client.talking_points.prompts) == 1     # 兩間門市的 prompt 相同
+
+
+def test_failed_store_gets_an_error_line(client):
+    lines = {line["store_id"]: line for line in post(client, ["S001", "S404"])}
+    assert "report" in lines["S001"]
+    assert set(lines["S404"]) == {"store_id", "error"}
+
+
+def test_shared_query_failure_ends_with_an_error_line(client, monkeypatch):
+    async def broken_feed(*args, **kwargs):
+        raise RuntimeError("Mongo 連線中斷")
+
+    monkeypatch.setattr(dashboard, "fetch_feed_async", broken_feed)
+    assert post(client, ["S001"]) == [{"error": "Mongo 連線中斷"}]
+
+
+def test_feed_uses_all_target_sources(client, monkeypatch):
+    seen = []
+
+    async def fetch_feed(sources, heat_terms=None, heat_end_day=None):
+        seen.append((list(sources), heat_end_day))
+        return {"alerts": [], "articles": {s: [] for s in sources}, "heat": []}
+
+    monkeypatch.setattr(dashboard, "fetch_feed_async", fetch_feed)
+    post(client, ["S001", "S002"])
+    assert seen == [(TARGET_SOURCES, "2025-10-30")]     # 共用區塊只查一次
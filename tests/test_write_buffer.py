@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+from services.crawl_engine import CrawlEngine
+from services.write_buffer import BulkWriteBuffer
+
+
+def article(url, title, source="PTT"):
+    return {"url": url, "title": title, "source": source}
+
+
+def test_upserts_to_the_same_filter_are_merged(mongo_db):
+    with BulkWriteBuffer(mongo_db) as buffer:
+        buffer.upsert("raw_articles", {"url": "u1"}, {"title": "舊標題", "board": "Health"}, source="PTT")
+        buffer.upsert("raw_articles", {"url": "u1"}, {"title": "新標題"}, source="PTT")
+        assert buffer._pending_count == 1
+
+    doc = mongo_db.raw_articles.find_one({"url": "u1"})
+    assert (doc["title"], doc["board"]) == ("新標題", "Health")
+    assert mongo_db.raw_articles.count_documents({}) == 1
+
+
+def test_groups_are_kept_per_collection_and_source(mongo_db):
+    with BulkWriteBuffer(mongo_db) as buffer:
+        buffer.upsert("raw_articles", {"url": "u1"}, article("u1", "a"), source="PTT")
+        buffer.upsert("raw_articles", {"url": "u2"}, article("u2", "b", "GoogleNews"), source="GoogleNews")
+        buffer.upsert("alerts", {"title": "警示"}, {"agency": "CDC"}, source="CDC")
+        assert set(buffer._pending) == {("raw_articles", "PTT"), ("raw_articles", "GoogleNews"), ("alerts", "CDC")}
+
+    assert buffer.stats == {
+        "PTT": {"inserted": 1, "modified": 0, "unchanged": 0},
+        "GoogleNews": {"inserted": 1, "modified": 0, "unchanged": 0},
+        "CDC": {"inserted": 1, "modified": 0, "unchanged": 0},
+    }
+    assert mongo_db.alerts.count_documents({}) == 1
+
+
+def test_flushes_when_max_ops_is_reached(mongo_db):
+    buffer = BulkWriteBuffer(mongo_db, max_ops=3, max_delay=60)
+    for i in range(2):
+        buffer.upsert("raw_articles", {"url": f"u{i}"}, article(f"u{i}", "t"))
+    assert mongo_db.raw_articles.count_documents({}) == 0
+
+    buffer.upsert("raw_articles", {"url": "u2"}, article("u2", "t"))
+    assert mongo_db.raw_articles.count_documents({}) == 3
+    assert buffer._pending_count == 0
+
+
+def test_flushes_when_oldest_write_is_too_old(mongo_db):
+    buffer = BulkWriteBuffer(mongo_db, max_ops=1000, max_delay=0.05)
+    buffer.upsert("raw_articles", {"url": "u0"}, article("u0", "t"))
+    assert mongo_db.raw_articles.count_documents({}) == 0
+
+    time.sleep(0.06)
+    buffer.upsert("raw_articles", {"url": "u1"}, article("u1", "t"))
+    assert mongo_db.raw_articles.count_documents({}) == 2
+
+
+
+def test_flush_if_due_sends_an_idle_buffer(mongo_db):
+    buffer = BulkWriteBuffer(mongo_db, max_ops=1000, max_delay=0.05)
+    assert buffer.flush_if_due() is False     # 空的
+    buffer.upsert("raw_articles", {"url": "u0"}, article("u0", "t"))
+    assert buffer.flush_if_due() is False     # 還沒到時間
+    assert mongo_db.raw_articles.count_documents({}) == 0
+
+    time.sleep(0.06)                            # 之後沒有新的 upsert
+    assert buffer.flush_if_due() is True
+    assert mongo_db.raw_articles.count_documents({}) == 1
+    assert buffer._pending_count == 0
+
+
+def test_engine_flushes_idle_buffer_while_crawling(mongo_db):
+    engine = CrawlEngine(database=mongo_db, incremental=False)
+    engine.buffer.max_delay = 0.05
+
+    async def slow_source():
+        engine.buffer.upsert("raw_articles", {"url": "u0"}, article("u0", "t"))
+        await asyncio.sleep(0.2)                # 來源很久才有下一筆
+        return mongo_db.raw_articles.count_documents({})
+
+    async def run():
+        flusher = asyncio.create_task(engine._flush_due_writes())
+        try:
+            return await slow_source()
+        finally:
+            flusher.cancel()
+
+    assert asyncio.run(run()) == 1
+
+def test_stats_count_inserted_modified_and_unchanged(mongo_db):
+    with BulkWriteBuffer(mongo_db) as buffer:
+        buffer.upsert("raw_articles", {"url": "u1"}, article("u1", "a"), source="PTT")
+        buffer.upsert("raw_articles", {"url": "u2"}, article("u2", "b"), source="PTT")
+
+    with BulkWriteBuffer(mongo_db) as buffer:
+        buffer.upsert("raw_articles", {"url": "u1"}, article("u1", "a"), source="PTT")       # 相同
+        buffer.upsert("raw_articles", {"url": "u2"}, article("u2", "改過"), source="PTT")    # 修改
+        buffer.upsert("raw_articles", {"url": "u3"}, article("u3", "c"), source="PTT")       # 新增
+
+    assert buffer.stats == {"PTT": {"inserted": 1, "modified": 1, "unchanged": 1}}
+
+
+def test_on_insert_receives_only_new_documents_with_ids(mongo_db):
+    mongo_db.raw_articles.insert_one(article("u1", "舊"))
+    inserted = []
+    with BulkWriteBuffer(mongo_db, on_insert=lambda collection, docs: inserted.append((collection, docs))) as buffer:
+        buffer.upsert("raw_articles", {"url": "u1"}, article("u1", "舊"))
+        buffer.upsert("raw_articles", {"url": "u2"}, article("u2", "新"))
+
+    assert len(inserted) == 1
+    collection, docs = inserted[0]
+    assert collection == "raw_articles"
+    assert [d["url"] for d in docs] == ["u2"]
+    assert docs[0]["_id"] == mongo_db.raw_articles.find_one({"url": "u2"})["_id"]
@@ -0,0 +1,25 @@
+import secrets
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+
+from util.config import Env
+
+# 初始化 HTTPBasic 認證 (/docs、/metrics 與會改變狀態的管理端點共用)
+security = HTTPBasic()
+
+# 從環境變數讀取 /docs 帳密
+DOCS_USERNAME = Env.DOCS_USERNAME
+DOCS_PASSWORD = Env.DOCS_PASSWORD
+
+# 驗證函數
+def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
+    correct_username = secrets.compare_digest(credentials.username, DOCS_USERNAME)
+    correct_password = secrets.compare_digest(credentials.password, DOCS_PASSWORD)
+    if not (correct_username and correct_password):
+        raise HTTPException(
+            status_code=401,
+            detail="無效的憑證",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials
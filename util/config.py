@@ -10,7 +10,31 @@ class Env:
     DOCS_PASSWORD: str = os.getenv("DOCS_PASSWORD", "")
     DOCS_USERNAME: str = os.getenv("DOCS_USERNAME", "")
     MongoDB_URL: str = os.getenv("MongoDB_URL", "")
+    MONGO_TLS: bool = os.getenv("MONGO_TLS", "true").lower() == "true"   # 本機 mongod (benchmark) 設為 false
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_TIMEOUT_MS: int = int(os.getenv("MONGO_TIMEOUT_MS", 5000))               # 選擇 server / 建立連線 / 等待連線池
+    MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))  # 單次查詢
     HUGGINGFACE_TOKEN: str = os.getenv("HUGGINGFACE_TOKEN", "")
+    TALKING_POINT_PREGENERATE: bool = os.getenv("TALKING_POINT_PREGENERATE", "").lower() == "true"  # 爬蟲跑完後預先生成話術
+    CRAWL_SCHEDULER_ENABLED: bool = os.getenv("CRAWL_SCHEDULER_ENABLED", "").lower() == "true"  # 啟用定時爬蟲
+    CRAWL_PARSE_WORKERS: int = int(os.getenv("CRAWL_PARSE_WORKERS", 0))   # >0 時 HTML 解析改用 process pool
+    PTT_PARSER: str = os.getenv("PTT_PARSER", "bs4")    # PTT 列表解析器：bs4 / lxml
+    PTT_DEEP_CRAWL: bool = os.getenv("PTT_DEEP_CRAWL", "").lower() == "true"  # 額外抓 PTT 文章內文與推文數
+    PTT_ARTICLE_CONCURRENCY: int = int(os.getenv("PTT_ARTICLE_CONCURRENCY", 2))    # 每個看板同時抓幾篇文章
+    PTT_MAX_BODY_BYTES: int = int(os.getenv("PTT_MAX_BODY_BYTES", 256 * 1024))     # 單篇文章最多讀取的 bytes
+    CRAWL_HTTP2: bool = os.getenv("CRAWL_HTTP2", "").lower() == "true"     # 爬蟲啟用 HTTP/2 (需安裝 h2)
+    CRAWL_MAX_RETRIES: int = int(os.getenv("CRAWL_MAX_RETRIES", 3))          # 429 / 5xx / 連線錯誤最多重試次數
+    CRAWL_RETRY_BACKOFF: float = float(os.getenv("CRAWL_RETRY_BACKOFF", 0.5))  # 第一次重試前等待秒數 (之後每次加倍)
+    STREAM_CHANGE_STREAMS: bool = os.getenv("STREAM_CHANGE_STREAMS", "true").lower() == "true"  # SSE 優先使用 Mongo change stream
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "").lower() == "true"  # 允許以 X-Profile header 取得 pyinstrument 報告 (選用套件，開啟時需另外 pip install pyinstrument)
+    KPI_ROLLUP_SCHEDULER_ENABLED: bool = os.getenv("KPI_ROLLUP_SCHEDULER_ENABLED", "").lower() == "true"  # 定時重算新進 summary 的 KPI 彙總
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "").lower() == "true"  # 定時封存 raw_articles / alerts (先跑 db/migrate_retention.py)
+    HOT_RETENTION_DAYS: int = int(os.getenv("HOT_RETENTION_DAYS", 30))     # 熱層保留天數 (封存後由 TTL index 刪除)
+    HISTORY_RETENTION_DAYS: int = int(os.getenv("HISTORY_RETENTION_DAYS", 365))  # crawl_history 保留天數，0 = 不寫歷史層
+    ROLLUP_AFTER_DAYS: int = int(os.getenv("ROLLUP_AFTER_DAYS", 2))        # 幾天前的資料可以封存 (至少 1，當天還在寫入)
+    COMPRESS_MIN_BYTES: int = int(os.getenv("COMPRESS_MIN_BYTES", 4096))  # JSON 回應超過此大小才 gzip / br 壓縮
+    READY_TIMEOUT: float = float(os.getenv("READY_TIMEOUT", 2))  # /ready 檢查 Mongo ping 的逾時秒數
     RELOAD: bool = os.getenv("RELOAD", "").lower() == "true"
     PORT: int = int(os.getenv("PORT", 7860))    # Hugging Face Spaces 預設使用 7860 port
 
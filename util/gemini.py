@@ -1,26 +1,31 @@
 import json
+import threading
 from typing import Dict, Any, List
-import google.generativeai as genai
 from util.config import env
 
+MODEL_NAME = "gemini-2.0-flash" # 或使用最新的模型
 
-if not env.GEMINI_API_KEY:
-    pass
-else:
-    genai.configure(api_key=env.GEMINI_API_KEY)
+DEFAULT_TALKING_POINT = "建議依照過往銷量與目前庫存水位進行彈性調整。"
 
-MODEL_NAME = "gemini-2.0-flash" # 或使用最新的模型
+_model = None
+_model_lock = threading.Lock()
 
-def generate_talking_point(topic: str, products: List[str], reason: str) -> str:
+def get_model():
     """
-    專為 Dashboard 生成「藥師銷售話術」。
-    topic: 議題 (ex: 流感高峰)
-    products: 相關藥品名稱列表
-    reason: 系統判斷的原因 (ex: 庫存告急)
+    GenerativeModel 只建立一次，之後重複使用。
+    google.generativeai 載入要將近一秒，等第一次需要生成話術時才 import (不拖慢 App 啟動)
     """
-    try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        prompt = f"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import google.generativeai as genai
+            if env.GEMINI_API_KEY:
+                genai.configure(api_key=env.GEMINI_API_KEY)
+            _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+def build_talking_point_prompt(topic: str, products: List[str], reason: str) -> str:
+    return f"""
         你是一位資深藥局店長。
         情況：{topic}
         相關商品：{', '.join(products)}
@@ -29,7 +34,16 @@ def generate_talking_point(topic: str, products: List[str], reason: str) -> str:
         請生成一句「簡短、專業且具備商業說服力」的備貨或銷售建議話術給藥師看。
         限制：30字以內，繁體中文。
         """
-        response = model.generate_content(prompt)
+
+def generate_talking_point(topic: str, products: List[str], reason: str) -> str:
+    """
+    專為 Dashboard 生成「藥師銷售話術」。
+    topic: 議題 (ex: 流感高峰)
+    products: 相關藥品名稱列表
+    reason: 系統判斷的原因 (ex: 庫存告急)
+    """
+    try:
+        response = get_model().generate_content(build_talking_point_prompt(topic, products, reason))
         return response.text.strip()
     except Exception:
-        return "建議依照過往銷量與目前庫存水位進行彈性調整。"
\ No newline at end of file
+        return DEFAULT_TALKING_POINT
@@ -0,0 +1,69 @@
+import gzip
+
+import orjson
+from fastapi import Response
+
+from util.config import env
+
+# ==========================================
+# 大型 JSON 回應：orjson 序列化 + 依 Accept-Encoding 壓縮
+#   orjson 直接處理 datetime / 巢狀 dict，不需要先經過 jsonable_encoder (1k 筆的頁面快一個數量級)
+#   小於 COMPRESS_MIN_BYTES 的回應不壓縮 (省下的傳輸量抵不過 CPU 與 header)
+#   壓縮等級取「一頁 1k 筆約 10ms 內」的設定：同樣時間下 gzip 5 比 br 4 更小，
+#   因此 client 兩者都接受 (q 值相同) 時優先 gzip；brotli 沒安裝時只用 gzip
+# ==========================================
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# 伺服器偏好順序
+ENCODERS = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL),
+}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+def choose_encoding(accept_encoding):
+    """依 Accept-Encoding (含 q 值) 選出支援的編碼，都不接受時回 None"""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                continue
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress_body(body, accept_encoding, min_bytes=None):
+    """回傳 (body, content_encoding)；不壓縮時 content_encoding 為 None"""
+    min_bytes = env.COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    encoding = choose_encoding(accept_encoding) if len(body) >= min_bytes else None
+    if encoding is None:
+        return body, None
+    return ENCODERS[encoding](body), encoding
+
+
+def json_response(payload, accept_encoding=None, status_code=200, headers=None):
+    """
+    orjson 序列化 payload 並視需要壓縮。CPU 成本隨頁面大小成長，
+    大頁面請在 asyncio.to_thread 內呼叫，避免卡住 event loop。
+    """
+    body, encoding = compress_body(orjson.dumps(payload), accept_encoding)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)